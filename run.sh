@@ -2,19 +2,46 @@
 
 # Function to display usage information
 usage() {
-    echo "Usage: $0 <solver-type> <uld-file> <package-file> <output-dir>"
+    echo "Usage: $0 <solver-type> <uld-file> <package-file> <output-dir> [options]"
     echo ""
     echo "Supported Solver Types:"
     echo "  - BasicOverlap (no guarantee of 100% priority packing)"
     echo "  - BasicNonOverlap (no guarantee of 100% priority packing)"
     echo "  - Tree"
     echo "  - Preference"
+    echo "  - Layer (wall by wall, for loads of few kinds of packages)"
+    echo "  - ExtremePoint (fast, for large manifests)"
+    echo "  - HeightMap (stable stacking on height maps)"
+    echo "  - Genetic (slow, searches package orders for a lower cost)"
+    echo "  - Beam (beam search, time grows with the beam width)"
     echo "  - MixedTree (Buggy, does not work)"
+    echo ""
+    echo "Options:"
+    echo "  --timings <file>        Write a JSON report of the time spent in each phase"
+    echo "  --chrome-trace <file>   Write the phases in the Chrome trace event format"
+    echo "  --counters <file>       Write the hot-path counters of the solver as JSON"
+    echo "  --no-plot               Do not generate the 3D plots of the ULDs"
+    echo "  --gltf                  Write each ULD as a glTF binary scene (.glb)"
+    echo "  --solution-file <file>  Also write the solution as a binary .npz file"
+    echo "  --cache-dir <dir>       Reuse results of identical earlier runs cached in <dir>"
+    echo "  --cache-size <MB>       Size above which least recently used cached results are evicted"
+    echo "  --blocks                Pack identical packages as blocks (BasicOverlap and Preference)"
+    echo "  --occupancy-grid <res>  Search occupancy grids with cells of side <res> instead of the free spaces"
+    echo "  --search-mode <mode>    ULD search of Tree: first_fit (default) or global_best"
+    echo "  --priority-subset       Pack the priority packages in the fewest ULDs found to hold them (Preference)"
+    echo "  --economy-selection     Leave out the economy packages no ULD has the capacity left for (Preference)"
+    echo "  --beam-width <n>        Number of partial packings kept at every step by the Beam solver"
+    echo "  --generations <n>       Number of generations of the Genetic solver"
+    echo "  --population <n>        Number of plans per generation of the Genetic solver"
+    echo "  --time-budget <s>       Stop the Genetic solver after the generation running at <s> seconds"
+    echo "  --workers <n>           Number of processes of the Genetic and Beam solvers or priority subset tests"
+    echo "  --decoder-cache <MB>    Memory bound of the packing states cached per process by the Genetic solver"
+    echo "  --convergence <file>    Write the best and mean cost of every generation of the Genetic solver"
     exit 1
 }
 
 # Check if the correct number of arguments is provided
-if [ "$#" -ne 4 ]; then
+if [ "$#" -lt 4 ]; then
     usage
 fi
 
@@ -47,14 +74,15 @@ SOLVER_TYPE=$1
 ULD_FILE=$2
 PACKAGE_FILE=$3
 OUTPUT_DIR=$4
+OPTIONS=("${@:5}")
 
 mkdir -p "$OUTPUT_DIR"
 
 # Validate solver type
-if [[ "$SOLVER_TYPE" != "BasicOverlap" && "$SOLVER_TYPE" != "BasicNonOverlap" && "$SOLVER_TYPE" != "Tree" && "$SOLVER_TYPE" != "Preference" && "$SOLVER_TYPE" != "MixedTree" ]]; then
+if [[ "$SOLVER_TYPE" != "BasicOverlap" && "$SOLVER_TYPE" != "BasicNonOverlap" && "$SOLVER_TYPE" != "Tree" && "$SOLVER_TYPE" != "Preference" && "$SOLVER_TYPE" != "Layer" && "$SOLVER_TYPE" != "ExtremePoint" && "$SOLVER_TYPE" != "HeightMap" && "$SOLVER_TYPE" != "Genetic" && "$SOLVER_TYPE" != "Beam" && "$SOLVER_TYPE" != "MixedTree" ]]; then
     echo "Error: Invalid solver type '$SOLVER_TYPE'."
     usage
 fi
 
 # Run the main.py script with the provided arguments
-python3 src/main.py "$SOLVER_TYPE" "$ULD_FILE" "$PACKAGE_FILE" "$OUTPUT_DIR"
+python3 src/main.py "$SOLVER_TYPE" "$ULD_FILE" "$PACKAGE_FILE" "$OUTPUT_DIR" "${OPTIONS[@]}"
@@ -0,0 +1,164 @@
+"""
+Microbenchmarks for the free-space geometry primitives.
+
+Measures the time per call and the allocations per call of the primitives
+the solvers execute millions of times on large runs, in isolation from the
+rest of the packing loop. Allocations are measured with tracemalloc in a
+separate pass so that tracing does not distort the timings.
+
+Run from the src/ directory:
+
+    python -m benchmarks.primitives
+    python -m benchmarks.primitives --number 10000 --output primitives.json
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from helpers.instance_generator import generate_instance
+from solvers.ULDPackerBasicOverlap import ULDPackerBasicOverlap
+from solvers.structures.SpaceNode import SpaceNode
+
+
+def measure(name: str, func: Callable, setup: Optional[Callable] = None,
+            number: int = 10000, repeat: int = 5) -> Dict:
+    """
+    Measures a primitive.
+
+    :param name: Name of the primitive.
+    :param func: Callable executing the primitive once.
+    :param setup: Optional callable run before every call, excluded from the measurements.
+    :param number: Number of calls per repetition.
+    :param repeat: Number of repetitions, the fastest one is reported.
+    :return: Time per call (ns), and blocks / bytes retained and peak bytes per call.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is None:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            timings.append(time.perf_counter() - start)
+        else:
+            elapsed = 0.0
+            for _ in range(number):
+                setup()
+                start = time.perf_counter()
+                func()
+                elapsed += time.perf_counter() - start
+            timings.append(elapsed)
+
+    # Allocations: results are kept alive so that the snapshot difference
+    # counts every block a call hands back, the traced peak catches temporaries
+    n_alloc = min(number, 1000)
+    results = []
+    tracemalloc.start()
+    peak = 0
+    before = tracemalloc.take_snapshot()
+    for _ in range(n_alloc):
+        if setup is not None:
+            setup()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        results.append(func())
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    return {
+        "name": name,
+        "ns_per_call": min(timings) / number * 1e9,
+        "blocks_per_call": sum(s.count_diff for s in stats) / n_alloc,
+        "bytes_per_call": sum(s.size_diff for s in stats) / n_alloc,
+        "peak_bytes_per_call": peak,
+    }
+
+
+def _packed_state(seed: int, n_packed: int) -> ULDPackerBasicOverlap:
+    """
+    Builds a BasicOverlap packer with a single ULD part way through packing,
+    so the primitives run on a realistic free-space list.
+    """
+    ulds, packages = generate_instance(seed, n_packed, 1)
+    packer = ULDPackerBasicOverlap(ulds, packages, 5000)
+    packer.counters.enabled = False
+    packer.minimum_dimension = min(np.min(p.dimensions) for p in packages)
+    for package in packages:
+        packer._try_pack_package(package, ulds[0], space_find_policy="first_find", orientation_choose_policy="no_rot")
+    return packer
+
+
+def run_primitives(seed: int = 0, number: int = 2000, repeat: int = 5) -> List[Dict]:
+    """
+    Runs all primitive microbenchmarks.
+
+    :return: List of measurement records.
+    """
+    rng = np.random.default_rng(seed)
+    space = SpaceNode(np.array([0, 0, 0]), np.array([244, 318, 285]), 40)
+    inside = SpaceNode(np.array([20, 30, 40]), np.array([60, 70, 80]), 40)
+    apart = SpaceNode(np.array([300, 400, 500]), np.array([60, 70, 80]), 40)
+    box = SpaceNode(np.array([100, 100, 100]), np.array([60, 70, 80]), 40)
+
+    packer = _packed_state(seed, 40)
+    uld = packer.ulds[0]
+    spaces = list(packer.available_spaces[uld.id])
+    x, y, z, _, _, _ = spaces[int(rng.integers(len(spaces)))]
+    position = np.array([x, y, z])
+    orientation = (40, 40, 40)
+    too_big = (400, 400, 400)
+
+    def reset_spaces():
+        packer.available_spaces[uld.id] = list(spaces)
+        # Otherwise the boxes rejected by the first call are rejected by the cache without a scan
+        packer.negative_fits[uld.id].clear()
+
+    records = [
+        measure("SpaceNode.get_overlap (overlapping)", lambda: space.get_overlap(inside), number=number, repeat=repeat),
+        measure("SpaceNode.get_overlap (disjoint)", lambda: space.get_overlap(apart), number=number, repeat=repeat),
+        measure("SpaceNode.is_completely_inside", lambda: inside.is_completely_inside(space), number=number, repeat=repeat),
+        measure("SpaceNode.divide_into_subspaces", lambda: space.divide_into_subspaces(box), number=number, repeat=repeat),
+        measure(
+            f"BasicOverlap._update_available_spaces ({len(spaces)} spaces)",
+            lambda: packer._update_available_spaces(uld, position, orientation, None, 0),
+            setup=reset_spaces, number=number, repeat=repeat,
+        ),
+        measure(
+            f"BasicOverlap._find_available_space first fit ({len(spaces)} spaces)",
+            lambda: packer._find_available_space(uld, None, orientation, "first_find"),
+            setup=reset_spaces, number=number, repeat=repeat,
+        ),
+        measure(
+            f"BasicOverlap._find_available_space full scan ({len(spaces)} spaces)",
+            lambda: packer._find_available_space(uld, None, too_big, "first_find"),
+            setup=reset_spaces, number=number, repeat=repeat,
+        ),
+    ]
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the free-space geometry primitives")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the packed state")
+    parser.add_argument("--number", type=int, default=2000, help="Calls per repetition")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions, the fastest is reported")
+    parser.add_argument("--output", metavar="FILE", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    records = run_primitives(args.seed, args.number, args.repeat)
+
+    print(f"{'primitive':<62} {'ns/call':>10} {'blocks':>8} {'bytes':>8} {'peak B':>8}")
+    for r in records:
+        print(
+            f"{r['name']:<62} {r['ns_per_call']:>10.0f} {r['blocks_per_call']:>8.1f} "
+            f"{r['bytes_per_call']:>8.0f} {r['peak_bytes_per_call']:>8}"
+        )
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(records, file, indent=2)
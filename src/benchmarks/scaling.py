@@ -0,0 +1,229 @@
+"""
+Scaling benchmark for the solvers in src/solvers.
+
+Every solver is run on seeded synthetic instances of increasing size, each
+run in a fresh process so that wall time and peak memory are not affected
+by earlier runs. Results are written as JSON and can be compared against
+a stored baseline.
+
+Run from the src/ directory:
+
+    python -m benchmarks.scaling --packages 100 1000 --ulds 6 --output bench.json
+    python -m benchmarks.scaling --baseline bench.json
+"""
+import argparse
+import glob
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from helpers.instance_generator import FAMILIES, generate_instance
+
+SOLVERS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "solvers")
+
+# Slowdowns smaller than this (in seconds) are treated as noise
+MIN_TIME_DELTA = 0.05
+
+
+def discover_solvers() -> List[str]:
+    """
+    Finds every solver in src/solvers (the ULDPacker*.py modules except the base class).
+
+    :return: Sorted list of solver names, e.g. 'Tree' for ULDPackerTree.
+    """
+    names = []
+    for path in glob.glob(os.path.join(SOLVERS_DIR, "ULDPacker*.py")):
+        name = os.path.splitext(os.path.basename(path))[0][len("ULDPacker"):]
+        if name != "Base":
+            names.append(name)
+    return sorted(names)
+
+
+def load_solver(name: str):
+    """
+    Imports a solver class by name.
+
+    :param name: Solver name, e.g. 'Tree'.
+    :return: The solver class.
+    """
+    module = importlib.import_module(f"solvers.ULDPacker{name}")
+    return getattr(module, f"ULDPacker{name}")
+
+
+def _run_case(solver: str, seed: int, n_packages: int, n_ulds: int, family: str, results: multiprocessing.Queue):
+    """
+    Runs one benchmark case. Executed in a child process.
+    """
+    ulds, packages = generate_instance(seed, n_packages, n_ulds, family)
+    packer = load_solver(solver)(ulds, packages, 5000)
+
+    start = time.perf_counter()
+    _, packed_packages, _, _, total_cost = packer.pack()
+    wall_time = time.perf_counter() - start
+
+    results.put(
+        {
+            "wall_time": wall_time,
+            # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+            "peak_memory_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            // (1024 if sys.platform == "darwin" else 1),
+            "total_cost": float(total_cost),
+            "packed": len(packed_packages),
+        }
+    )
+
+
+def run_case(solver: str, seed: int, n_packages: int, n_ulds: int, family: str, timeout: float) -> Dict:
+    """
+    Runs one benchmark case in a fresh process.
+
+    :param solver: Solver name.
+    :param seed: Seed of the instance.
+    :param n_packages: Number of packages.
+    :param n_ulds: Number of ULDs.
+    :param family: Distribution family of the instance.
+    :param timeout: Seconds after which the case is aborted.
+    :return: The result record of the case.
+    """
+    record = {"solver": solver, "n_packages": n_packages, "n_ulds": n_ulds, "seed": seed, "family": family}
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_run_case, args=(solver, seed, n_packages, n_ulds, family, results))
+    process.start()
+
+    deadline = time.monotonic() + timeout
+    record["status"] = "timeout"
+    while time.monotonic() < deadline:
+        try:
+            record.update(results.get(timeout=0.1))
+            record["status"] = "ok"
+            break
+        except queue.Empty:
+            if not process.is_alive() and results.empty():
+                record["status"] = "error"
+                break
+
+    if process.is_alive():
+        process.terminate()
+    process.join()
+    return record
+
+
+def run_benchmarks(solvers: List[str], package_counts: List[int], uld_counts: List[int],
+                   seed: int, family: str, timeout: float) -> List[Dict]:
+    """
+    Runs every solver on every instance size, smallest first.
+    Once a solver fails or times out, larger instances are skipped for it.
+
+    :return: List of result records.
+    """
+    records = []
+    for solver in solvers:
+        failed_at = None
+        for n_ulds in sorted(uld_counts):
+            for n_packages in sorted(package_counts):
+                if failed_at is not None and n_packages >= failed_at[0] and n_ulds >= failed_at[1]:
+                    record = {"solver": solver, "n_packages": n_packages, "n_ulds": n_ulds,
+                              "seed": seed, "family": family, "status": "skipped"}
+                else:
+                    record = run_case(solver, seed, n_packages, n_ulds, family, timeout)
+                    if record["status"] != "ok":
+                        failed_at = (n_packages, n_ulds)
+                records.append(record)
+                print(_format_record(record), flush=True)
+    return records
+
+
+def compare_to_baseline(records: List[Dict], baseline: List[Dict], tolerance: float) -> List[str]:
+    """
+    Compares results against a baseline.
+
+    :param records: Current result records.
+    :param baseline: Baseline result records.
+    :param tolerance: Allowed slowdown / memory growth factor.
+    :return: List of regressions found.
+    """
+    key = lambda r: (r["solver"], r["n_packages"], r["n_ulds"], r["seed"], r.get("family", "uniform"))
+    reference = {key(r): r for r in baseline}
+    regressions = []
+    for record in records:
+        base = reference.get(key(record))
+        if base is None or base["status"] != "ok":
+            continue
+        name = f"{record['solver']} ({record['n_packages']} packages, {record['n_ulds']} ULDs)"
+        if record["status"] != "ok":
+            regressions.append(f"{name}: {record['status']}, baseline ran in {base['wall_time']:.2f}s")
+            continue
+        if (record["wall_time"] > tolerance * base["wall_time"]
+                and record["wall_time"] - base["wall_time"] > MIN_TIME_DELTA):
+            regressions.append(f"{name}: wall time {record['wall_time']:.2f}s vs {base['wall_time']:.2f}s")
+        if record["peak_memory_kb"] > tolerance * base["peak_memory_kb"]:
+            regressions.append(f"{name}: peak memory {record['peak_memory_kb']}KB vs {base['peak_memory_kb']}KB")
+        if record["total_cost"] > base["total_cost"]:
+            regressions.append(f"{name}: total cost {record['total_cost']} vs {base['total_cost']}")
+    return regressions
+
+
+def _format_record(record: Dict) -> str:
+    line = f"{record['solver']:<16} {record['n_packages']:>7} pkgs {record['n_ulds']:>4} ULDs  "
+    if record["status"] != "ok":
+        return line + record["status"]
+    return line + (
+        f"{record['wall_time']:9.3f}s {record['peak_memory_kb'] / 1024:8.1f}MB "
+        f"cost {record['total_cost']:>10.0f} packed {record['packed']}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scaling benchmark of the ULD packing solvers")
+    parser.add_argument("--solvers", nargs="+", default=None, help="Solvers to run (default: all)")
+    parser.add_argument("--packages", nargs="+", type=int, default=[100, 1000, 10000, 100000],
+                        help="Package counts")
+    parser.add_argument("--ulds", nargs="+", type=int, default=[1, 6, 50, 500], help="ULD counts")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic instances")
+    parser.add_argument("--family", choices=FAMILIES, default="uniform", help="Distribution family of the instances")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds per case")
+    parser.add_argument("--output", metavar="FILE", help="Write the results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="Compare the results against a stored JSON file")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="Allowed slowdown / memory growth factor against the baseline")
+    args = parser.parse_args()
+
+    records = run_benchmarks(args.solvers or discover_solvers(), args.packages, args.ulds, args.seed, args.family,
+                             args.timeout)
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "meta": {
+                        "python": platform.python_version(),
+                        "numpy": np.__version__,
+                        "platform": platform.platform(),
+                        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    },
+                    "results": records,
+                },
+                file,
+                indent=2,
+            )
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            regressions = compare_to_baseline(records, json.load(file)["results"], args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
@@ -0,0 +1,87 @@
+import json
+from typing import Any, Dict
+
+
+class Counters:
+    """
+    Hot-path counters of a packer.
+
+    Counting is done behind an `enabled` check at the call site, so that
+    turning collection off leaves a single attribute lookup:
+
+        if self.counters.enabled:
+            self.counters.add("spaces_scanned", scanned)
+
+    Counts are plain totals, per-ULD values keep the maximum seen per ULD.
+    """
+
+    def __init__(self, enabled: bool = True):
+        """
+        Initializes the Counters.
+
+        :param enabled: Whether counts are collected.
+        """
+        self.enabled = enabled
+        self.counts: Dict[str, int] = {}
+        self.per_uld: Dict[str, Dict[Any, int]] = {}
+
+    def add(self, name: str, value: int = 1):
+        """
+        Adds to a total.
+
+        :param name: Name of the counter.
+        :param value: Amount to add. Defaults to 1.
+        """
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def peak(self, name: str, uld_id, value: int):
+        """
+        Records a per-ULD value, keeping the maximum seen.
+
+        :param name: Name of the counter.
+        :param uld_id: ID of the ULD the value belongs to.
+        :param value: Observed value.
+        """
+        values = self.per_uld.setdefault(name, {})
+        if value > values.get(uld_id, 0):
+            values[uld_id] = value
+
+    def merge(self, other: "Counters"):
+        """
+        Adds the counts of another Counters instance to this one.
+
+        :param other: The counters to merge in.
+        """
+        for name, value in other.counts.items():
+            self.add(name, value)
+        for name, values in other.per_uld.items():
+            for uld_id, value in values.items():
+                self.peak(name, uld_id, value)
+
+    def reset(self):
+        """
+        Clears all counters.
+        """
+        self.counts = {}
+        self.per_uld = {}
+
+    def as_dict(self) -> dict:
+        """
+        Returns the counters, including fit checks per placement.
+
+        :return: A JSON serialisable dictionary of the counters.
+        """
+        counters = dict(self.counts)
+        if counters.get("placements"):
+            counters["fit_checks_per_placement"] = counters.get("fit_checks", 0) / counters["placements"]
+        counters.update({name: dict(values) for name, values in self.per_uld.items()})
+        return counters
+
+    def write_json(self, path: str):
+        """
+        Writes the counters to a JSON file.
+
+        :param path: Path of the output file.
+        """
+        with open(path, "w") as file:
+            json.dump(self.as_dict(), file, indent=2, default=str)
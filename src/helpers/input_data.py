@@ -0,0 +1,70 @@
+import csv
+from typing import Dict, Iterator, List
+
+from dataclass.Package import Package
+from dataclass.ULD import ULD
+
+
+def read_csv_rows(file_name: str) -> Iterator[Dict[str, str]]:
+    """
+    Reads the rows of a CSV file as dictionaries keyed by the header.
+    Everything after a '#' on a line is a comment, empty lines are skipped.
+
+    :param file_name: CSV file.
+    :return: An iterator of the rows.
+    """
+    with open(file_name, newline="") as file:
+        lines = (line.split("#", 1)[0] for line in file)
+        yield from csv.DictReader(line for line in lines if line.strip())
+
+
+def parse_number(value: str):
+    """
+    Parses a CSV field as an int if possible, as a float otherwise.
+    """
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def read_ulds(uld_file: str) -> List[ULD]:
+    """
+    Reads the ULDs of a ULD CSV file.
+
+    :param uld_file: ULD data file.
+    :return: List of ULDs.
+    """
+    return [
+        ULD(
+            id=row["ULD Identifier"],
+            length=parse_number(row["Length (cm)"]),
+            width=parse_number(row["Width (cm)"]),
+            height=parse_number(row["Height (cm)"]),
+            weight_limit=parse_number(row["Weight Limit (kg)"]),
+        )
+        for row in read_csv_rows(uld_file)
+    ]
+
+
+def read_packages(package_file: str) -> List[Package]:
+    """
+    Reads the packages of a package CSV file.
+
+    :param package_file: Package data file.
+    :return: List of packages.
+    """
+    return [
+        Package(
+            id=row["Package Identifier"],
+            length=parse_number(row["Length (cm)"]),
+            width=parse_number(row["Width (cm)"]),
+            height=parse_number(row["Height (cm)"]),
+            weight=parse_number(row["Weight (kg)"]),
+            is_priority=row["Type (P/E)"] == "Priority",
+            delay_cost=int(row["Cost of Delay"])
+            if row["Cost of Delay"].isdigit()
+            else 0,
+        )
+        for row in read_csv_rows(package_file)
+    ]
@@ -0,0 +1,313 @@
+"""
+Seeded synthetic instance generator.
+
+Generates ULD fleets and package lists resembling the reference data, for
+benchmarks and load tests. Packages are produced in fixed-size blocks, each
+drawn from its own seeded generator, so an instance only depends on the seed
+and family (not on how it is consumed) and can be streamed to disk without
+holding it in memory.
+
+Run from the src/ directory:
+
+    python -m helpers.instance_generator out/ --packages 1000000 --family clustered --seed 7
+    python -m helpers.instance_generator out/ --packages 400 --fleet "244x318x244:2800*4,224x318x162:2500*2"
+"""
+import argparse
+import csv
+import os
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from dataclass.Package import Package
+from dataclass.ULD import ULD
+from helpers.input_data import read_ulds
+
+# ULD types of the reference fleet: (length, width, height, weight limit)
+REFERENCE_ULD_TYPES = [
+    (224, 318, 162, 2500),
+    (244, 318, 244, 2800),
+    (244, 318, 285, 3500),
+]
+
+FAMILIES = ["uniform", "clustered", "heavy_tailed", "adversarial"]
+
+# Number of packages drawn from each block generator
+BLOCK_SIZE = 65536
+
+# Bounds of the reference data, see input/scripts/data_generator_2.py
+MIN_SIDE = 40
+MAX_SIDE = 110
+PRIORITY_RATIO = 0.25
+MIN_DELAY_COST = 60
+MAX_DELAY_COST = 140
+
+# Number of dimension classes of the clustered family
+N_CLUSTERS = 8
+
+PACKAGE_DTYPE = np.dtype(
+    [
+        ("length", np.int32),
+        ("width", np.int32),
+        ("height", np.int32),
+        ("weight", np.int32),
+        ("is_priority", np.bool_),
+        ("delay_cost", np.int32),
+    ]
+)
+
+ULD_HEADER = ["ULD Identifier", "Length (cm)", "Width (cm)", "Height (cm)", "Weight Limit (kg)"]
+PACKAGE_HEADER = [
+    "Package Identifier", "Length (cm)", "Width (cm)", "Height (cm)",
+    "Weight (kg)", "Type (P/E)", "Cost of Delay",
+]
+
+
+def make_fleet(n_ulds: int, uld_types: List[Tuple[int, int, int, int]] = REFERENCE_ULD_TYPES) -> List[ULD]:
+    """
+    Builds a fleet cycling through the given ULD types.
+
+    :param n_ulds: Number of ULDs.
+    :param uld_types: List of (length, width, height, weight limit) tuples.
+    :return: List of ULDs with IDs U1..Un.
+    """
+    ulds = []
+    for i in range(n_ulds):
+        length, width, height, weight_limit = uld_types[i % len(uld_types)]
+        ulds.append(ULD(f"U{i + 1}", length, width, height, weight_limit))
+    return ulds
+
+
+def parse_fleet(spec: str) -> List[ULD]:
+    """
+    Builds a fleet from a spec string such as "244x318x244:2800*4,224x318x162:2500*2"
+    (dimensions in cm, weight limit in kg, optional count), or from a ULD CSV file.
+
+    :param spec: Fleet spec or path of a ULD CSV file.
+    :return: List of ULDs.
+    """
+    if os.path.isfile(spec):
+        return read_ulds(spec)
+
+    ulds = []
+    for entry in spec.split(","):
+        entry, _, count = entry.strip().partition("*")
+        dimensions, _, weight_limit = entry.partition(":")
+        try:
+            length, width, height = (int(d) for d in dimensions.split("x"))
+            weight_limit = int(weight_limit)
+            count = int(count) if count else 1
+        except ValueError:
+            raise RuntimeError(f"Invalid ULD fleet entry '{entry}', expected LxWxH:WEIGHT[*COUNT]")
+        for _ in range(count):
+            ulds.append(ULD(f"U{len(ulds) + 1}", length, width, height, weight_limit))
+    return ulds
+
+
+def _volume_weights(rng: np.random.Generator, dimensions: np.ndarray) -> np.ndarray:
+    # Density between 100 and 300 kg per 1.2 m^3, as in the reference data
+    volumes = np.prod(dimensions, axis=1)
+    return volumes * rng.uniform(100, 300, size=len(dimensions)) / 1.2e6
+
+
+def _generate_block(seed: int, block: int, n: int, family: str, max_weight: int) -> np.ndarray:
+    """
+    Draws one block of packages.
+
+    :param seed: Seed of the instance.
+    :param block: Index of the block.
+    :param n: Number of packages in the block.
+    :param family: Distribution family.
+    :param max_weight: Weight limit of the largest ULD, caps heavy-tailed weights.
+    :return: Structured array of PACKAGE_DTYPE.
+    """
+    rng = np.random.default_rng([seed, block])
+    if family == "uniform":
+        dimensions = rng.integers(MIN_SIDE, MAX_SIDE + 1, size=(n, 3))
+        weights = _volume_weights(rng, dimensions)
+    elif family == "clustered":
+        # The classes come from the instance seed so that all blocks share them
+        classes = np.random.default_rng([seed]).integers(MIN_SIDE, MAX_SIDE + 1, size=(N_CLUSTERS, 3))
+        jitter = rng.integers(-3, 4, size=(n, 3))
+        dimensions = np.clip(classes[rng.integers(N_CLUSTERS, size=n)] + jitter, MIN_SIDE, MAX_SIDE)
+        weights = _volume_weights(rng, dimensions)
+    elif family == "heavy_tailed":
+        dimensions = rng.integers(MIN_SIDE, MAX_SIDE + 1, size=(n, 3))
+        # Pareto weights with the same scale as the reference data
+        weights = np.minimum((rng.pareto(1.5, size=n) + 1) * 20, max_weight)
+    elif family == "adversarial":
+        # Small packages with pairwise co-prime sides: their corners never line
+        # up, so every placement leaves many partially overlapping free spaces
+        # and the SpaceTree link count per placement grows quickly
+        dimensions = rng.choice(np.array([41, 43, 47, 53, 59, 61]), size=(n, 3))
+        weights = _volume_weights(rng, dimensions)
+    else:
+        raise RuntimeError(f"Invalid instance family '{family}', expected one of {FAMILIES}")
+
+    packages = np.empty(n, dtype=PACKAGE_DTYPE)
+    packages["length"] = dimensions[:, 0]
+    packages["width"] = dimensions[:, 1]
+    packages["height"] = dimensions[:, 2]
+    packages["weight"] = np.maximum(1, weights.astype(int))
+    packages["is_priority"] = rng.uniform(size=n) < PRIORITY_RATIO
+    packages["delay_cost"] = np.where(
+        packages["is_priority"], 0, rng.integers(MIN_DELAY_COST, MAX_DELAY_COST + 1, size=n)
+    )
+    return packages
+
+
+def generate_package_blocks(seed: int, n_packages: int, family: str = "uniform",
+                            ulds: List[ULD] = None) -> Iterator[np.ndarray]:
+    """
+    Generates packages block by block.
+
+    :param seed: Seed of the instance.
+    :param n_packages: Number of packages.
+    :param family: Distribution family, one of FAMILIES.
+    :param ulds: The fleet, used to cap heavy-tailed weights. Defaults to the reference fleet.
+    :return: Iterator of structured arrays of PACKAGE_DTYPE, of at most BLOCK_SIZE packages each.
+    """
+    if family not in FAMILIES:
+        raise RuntimeError(f"Invalid instance family '{family}', expected one of {FAMILIES}")
+    if ulds:
+        max_weight = max(uld.weight_limit for uld in ulds)
+    else:
+        max_weight = max(t[3] for t in REFERENCE_ULD_TYPES)
+
+    for block, start in enumerate(range(0, n_packages, BLOCK_SIZE)):
+        yield _generate_block(seed, block, min(BLOCK_SIZE, n_packages - start), family, max_weight)
+
+
+def packages_from_array(packages: np.ndarray, first_id: int = 1) -> List[Package]:
+    """
+    Converts a structured package array to Package objects.
+
+    :param packages: Structured array of PACKAGE_DTYPE.
+    :param first_id: Number of the first package, IDs are P-<number>.
+    :return: List of packages.
+    """
+    return [
+        Package(
+            id=f"P-{first_id + i}",
+            length=int(p["length"]),
+            width=int(p["width"]),
+            height=int(p["height"]),
+            weight=int(p["weight"]),
+            is_priority=bool(p["is_priority"]),
+            delay_cost=int(p["delay_cost"]),
+        )
+        for i, p in enumerate(packages)
+    ]
+
+
+def generate_instance(seed: int, n_packages: int, n_ulds: int = None, family: str = "uniform",
+                      fleet: str = None) -> Tuple[List[ULD], List[Package]]:
+    """
+    Generates an instance in memory.
+
+    :param seed: Seed of the instance.
+    :param n_packages: Number of packages.
+    :param n_ulds: Number of ULDs of the reference fleet. Ignored if `fleet` is given.
+    :param family: Distribution family, one of FAMILIES.
+    :param fleet: Fleet spec or ULD CSV file, see parse_fleet.
+    :return: A tuple of the ULDs and packages.
+    """
+    ulds = parse_fleet(fleet) if fleet is not None else make_fleet(n_ulds or len(REFERENCE_ULD_TYPES))
+    packages = []
+    for block in generate_package_blocks(seed, n_packages, family, ulds):
+        packages.extend(packages_from_array(block, len(packages) + 1))
+    return ulds, packages
+
+
+def write_ulds_csv(path: str, ulds: List[ULD]):
+    """
+    Writes a fleet in the ULD CSV format.
+
+    :param path: Path of the output file.
+    :param ulds: List of ULDs.
+    """
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(ULD_HEADER)
+        for uld in ulds:
+            writer.writerow([uld.id, *(int(d) for d in uld.dimensions), uld.weight_limit])
+
+
+def write_packages_csv(path: str, blocks: Iterator[np.ndarray]) -> int:
+    """
+    Streams packages to a file in the package CSV format.
+
+    :param path: Path of the output file.
+    :param blocks: Iterator of structured arrays of PACKAGE_DTYPE.
+    :return: Number of packages written.
+    """
+    n = 0
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(PACKAGE_HEADER)
+        for block in blocks:
+            writer.writerows(
+                (
+                    f"P-{n + i + 1}", length, width, height, weight,
+                    "Priority" if is_priority else "Economy",
+                    "-" if is_priority else delay_cost,
+                )
+                for i, (length, width, height, weight, is_priority, delay_cost) in enumerate(block.tolist())
+            )
+            n += len(block)
+    return n
+
+
+def write_packages_npy(path: str, blocks: Iterator[np.ndarray], n_packages: int) -> int:
+    """
+    Streams packages to a memory-mapped .npy file of PACKAGE_DTYPE.
+    Package i has the ID P-<i + 1>.
+
+    :param path: Path of the output file.
+    :param blocks: Iterator of structured arrays of PACKAGE_DTYPE.
+    :param n_packages: Total number of packages in `blocks`.
+    :return: Number of packages written.
+    """
+    output = np.lib.format.open_memmap(path, mode="w+", dtype=PACKAGE_DTYPE, shape=(n_packages,))
+    n = 0
+    for block in blocks:
+        output[n:n + len(block)] = block
+        n += len(block)
+    output.flush()
+    del output
+    return n
+
+
+def read_packages_npy(path: str) -> List[Package]:
+    """
+    Reads packages written by write_packages_npy.
+
+    :param path: Path of the .npy file.
+    :return: List of packages.
+    """
+    return packages_from_array(np.load(path, mmap_mode="r"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic ULD packing instance")
+    parser.add_argument("output_dir", help="Directory to write ulds.csv and packages.csv / packages.npy to")
+    parser.add_argument("--packages", type=int, default=400, help="Number of packages")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the instance")
+    parser.add_argument("--family", choices=FAMILIES, default="uniform", help="Distribution family")
+    parser.add_argument("--ulds", type=int, default=6, help="Number of ULDs of the reference fleet")
+    parser.add_argument("--fleet", help="Fleet spec (e.g. 244x318x244:2800*4) or ULD CSV file, overrides --ulds")
+    parser.add_argument("--format", choices=["csv", "npy"], default="csv", help="Format of the package file")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    ulds = parse_fleet(args.fleet) if args.fleet is not None else make_fleet(args.ulds)
+    write_ulds_csv(os.path.join(args.output_dir, "ulds.csv"), ulds)
+
+    blocks = generate_package_blocks(args.seed, args.packages, args.family, ulds)
+    if args.format == "csv":
+        path = os.path.join(args.output_dir, "packages.csv")
+        n = write_packages_csv(path, blocks)
+    else:
+        path = os.path.join(args.output_dir, "packages.npy")
+        n = write_packages_npy(path, blocks, args.packages)
+    print(f"Wrote {len(ulds)} ULDs and {n} {args.family} packages to {args.output_dir}")
@@ -1,70 +1,119 @@
-import matplotlib.pyplot as plt
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+from matplotlib import colormaps
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from mpl_toolkits.mplot3d.art3d import Poly3DCollection
 from solvers.ULDPackerBase import ULDPackerBase
 
-def generate_3d_plot(packer_instance: ULDPackerBase, output_dir: str):
+# Vertex indices of the six faces of a cuboid (front, right, back, left, bottom, top),
+# with the vertices numbered as in _cuboid_faces
+CUBOID_FACES = np.array(
+    [
+        [0, 1, 5, 4],
+        [1, 2, 6, 5],
+        [2, 3, 7, 6],
+        [3, 0, 4, 7],
+        [0, 1, 2, 3],
+        [4, 5, 6, 7],
+    ]
+)
+
+
+def _cuboid_faces(boxes: np.ndarray) -> np.ndarray:
+    """
+    Builds the faces of a batch of cuboids.
+
+    :param boxes: Array of shape (n, 6) of (x, y, z, length, width, height).
+    :return: Array of shape (n * 6, 4, 3) of face vertices.
+    """
+    start = boxes[:, None, :3]
+    size = boxes[:, None, 3:]
+    # Bottom-left-front, bottom-right-front, bottom-right-back, bottom-left-back, then the same on top
+    corners = np.array(
+        [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0], [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]]
+    )
+    vertices = start + corners[None, :, :] * size
+    return vertices[:, CUBOID_FACES].reshape(-1, 4, 3)
+
+
+def _render_uld(uld_id, dimensions: Tuple[int, int, int], boxes: np.ndarray, path: str):
+    """
+    Renders one ULD and its packages to an image. Runs in a worker process,
+    so it only takes plain, picklable data.
+
+    :param uld_id: ID of the ULD.
+    :param dimensions: Dimensions of the ULD.
+    :param boxes: Array of shape (n, 6) of the packed packages (x, y, z, length, width, height).
+    :param path: Path of the image.
+    """
+    # A Figure with an Agg canvas is not registered with pyplot, so it is
+    # released as soon as it goes out of scope
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111, projection="3d")
+
+    # Set limits for the 3D axes based on ULD dimensions
+    ax.set_xlim(0, dimensions[0])
+    ax.set_ylim(0, dimensions[1])
+    ax.set_zlim(0, dimensions[2])
+
+    # Set axis labels and plot title
+    ax.set_xlabel("X")
+    ax.set_ylabel("Y")
+    ax.set_zlabel("Z")
+    ax.set_title(f"Packed ULD {uld_id}")
+
+    if len(boxes) > 0:
+        # All package faces go into a single collection, each package gets
+        # the next color of the Paired colormap
+        colors = colormaps["Paired"](np.arange(1, len(boxes) + 1) % 12)
+        ax.add_collection3d(
+            Poly3DCollection(
+                _cuboid_faces(boxes),
+                facecolors=np.repeat(colors, len(CUBOID_FACES), axis=0),
+                edgecolors="black",
+                alpha=0.7,
+            )
+        )
+
+    # Set the view angle to get a good perspective of the packed ULD
+    ax.view_init(elev=35, azim=45)  # Adjust the camera elevation and azimuth
+
+    fig.savefig(path)
+
+
+def generate_3d_plot(packer_instance: ULDPackerBase, output_dir: str, n_workers: int = None):
     """
     Generates 3D plots of packed ULDs (unit load devices) and their packages, and saves them as images.
 
-    :param packer_instance: The packer instance containing information about ULDs, packages, and their positions.
+    :param packer_instance: The packer instance (or helpers.solution.Solution) containing the ULDs and packed positions.
     :param output_dir: The directory where the generated plots will be saved.
+    :param n_workers: Number of processes rendering ULDs in parallel. Defaults to the number of CPUs.
     """
-    for uld in packer_instance.ulds:
-        # Create a new figure for each ULD
-        fig = plt.figure()
-        ax = fig.add_subplot(111, projection="3d")
-
-        # Set limits for the 3D axes based on ULD dimensions
-        ax.set_xlim(0, uld.dimensions[0])
-        ax.set_ylim(0, uld.dimensions[1])
-        ax.set_zlim(0, uld.dimensions[2])
-
-        # Set axis labels and plot title
-        ax.set_xlabel("X")
-        ax.set_ylabel("Y")
-        ax.set_zlabel("Z")
-        ax.set_title(f"Packed ULD {uld.id}")
-
-        # Initialize a variable to generate distinct colors for each package
-        random_int = 0
-
-        # Loop through the packed positions and plot each package
-        for (package_id, uld_id, x, y, z, length, width, height) in packer_instance.packed_positions:
-            if uld.id == uld_id:
-                # Retrieve the package details (could be used if needed)
-                next(pkg for pkg in packer_instance.packages if pkg.id == package_id)
-
-                # Define the vertices for the package (cuboid) in 3D space
-                vertices = [
-                    [x, y, z],  # Bottom-left-front corner
-                    [x + length, y, z],  # Bottom-right-front corner
-                    [x + length, y + width, z],  # Bottom-right-back corner
-                    [x, y + width, z],  # Bottom-left-back corner
-                    [x, y, z + height],  # Top-left-front corner
-                    [x + length, y, z + height],  # Top-right-front corner
-                    [x + length, y + width, z + height],  # Top-right-back corner
-                    [x, y + width, z + height],  # Top-left-back corner
-                ]
-
-                # Define the faces of the package (each face is a quadrilateral defined by 4 vertices)
-                faces = [
-                    [vertices[0], vertices[1], vertices[5], vertices[4]],  # Front face
-                    [vertices[1], vertices[2], vertices[6], vertices[5]],  # Right face
-                    [vertices[2], vertices[3], vertices[7], vertices[6]],  # Back face
-                    [vertices[3], vertices[0], vertices[4], vertices[7]],  # Left face
-                    [vertices[0], vertices[1], vertices[2], vertices[3]],  # Bottom face
-                    [vertices[4], vertices[5], vertices[6], vertices[7]],  # Top face
-                ]
-
-                # Assign a color to the package using a colormap, ensuring distinct colors
-                random_int += 1
-                color = plt.cm.Paired(random_int % 12)  # Use the Paired colormap for different colors
-
-                # Add the package faces to the 3D plot with the specified color and edge color
-                ax.add_collection3d(Poly3DCollection(faces, facecolors=color, edgecolors="black", alpha=0.7))
-
-        # Set the view angle to get a good perspective of the packed ULD
-        ax.view_init(elev=35, azim=45)  # Adjust the camera elevation and azimuth
-
-        # Save the 3D plot as an image in the specified output directory
-        plt.savefig(f"{output_dir}/packed_uld_{uld.id}.png")
+    positions: Dict[str, List[Tuple]] = {uld.id: [] for uld in packer_instance.ulds}
+    for (package_id, uld_id, x, y, z, length, width, height) in packer_instance.packed_positions:
+        positions[uld_id].append((x, y, z, length, width, height))
+
+    jobs = [
+        (
+            uld.id,
+            tuple(int(d) for d in uld.dimensions),
+            np.array(positions[uld.id], dtype=float).reshape(-1, 6),
+            f"{output_dir}/packed_uld_{uld.id}.png",
+        )
+        for uld in packer_instance.ulds
+    ]
+
+    n_workers = min(len(jobs), n_workers or os.cpu_count() or 1)
+    if n_workers <= 1:
+        for job in jobs:
+            _render_uld(*job)
+        return
+
+    with ProcessPoolExecutor(n_workers) as executor:
+        # Consume the results so that errors in the workers are raised here
+        list(executor.map(_render_uld, *zip(*jobs)))
@@ -0,0 +1,223 @@
+"""
+On-disk cache of packing results, keyed by a content hash of the instance.
+
+Entries are JSON files named after the key. They are written to a temporary
+file and moved into place with os.replace, so readers never see a partial
+entry and need no lock. Eviction (least recently used first, by mtime, which
+a hit refreshes) runs under an exclusive fcntl lock so that concurrent
+writers do not evict from under each other. Without fcntl (e.g. on Windows)
+eviction runs unlocked, which can only cause an extra miss.
+"""
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from dataclass.Package import Package
+from dataclass.ULD import ULD
+from helpers.solution import Solution
+
+# Bump when the entry format or the meaning of the key changes
+CACHE_VERSION = 1
+
+SOLVERS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "solvers")
+
+# Temporary files older than this (in seconds) are left over by crashed writers
+STALE_TMP_AGE = 3600
+
+_solver_code_hash = None
+
+
+def solver_code_hash() -> str:
+    """
+    Hashes the source of the solvers, so that entries written by other versions of the code are not reused.
+
+    :return: Hex digest of all .py files under src/solvers.
+    """
+    global _solver_code_hash
+    if _solver_code_hash is None:
+        digest = hashlib.sha256()
+        for path in sorted(glob.glob(os.path.join(SOLVERS_DIR, "**", "*.py"), recursive=True)):
+            digest.update(os.path.relpath(path, SOLVERS_DIR).encode())
+            with open(path, "rb") as file:
+                digest.update(file.read())
+        _solver_code_hash = digest.hexdigest()
+    return _solver_code_hash
+
+
+def _normalize_number(value):
+    """
+    Normalizes a number so that e.g. 5, 5.0 and numpy.int64(5) hash the same.
+    """
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def instance_key(ulds: List[ULD], packages: List[Package], solver: str, params: Dict) -> str:
+    """
+    Computes the cache key of a run.
+
+    The key covers the parsed instance rather than the CSV bytes, so formatting,
+    comments and number notation do not matter, but the order of ULDs and packages
+    does, as the solvers break ties by input order.
+
+    :param ulds: The ULDs.
+    :param packages: The packages.
+    :param solver: Name of the solver.
+    :param params: Parameters of the solver that affect the result.
+    :return: Hex digest of the key.
+    """
+    normalized = {
+        "version": CACHE_VERSION,
+        "code": solver_code_hash(),
+        "solver": solver,
+        "params": {name: params[name] for name in sorted(params)},
+        "ulds": [
+            [str(u.id), *(_normalize_number(d) for d in u.dimensions), _normalize_number(u.weight_limit)]
+            for u in ulds
+        ],
+        "packages": [
+            [
+                str(p.id),
+                *(_normalize_number(d) for d in p.dimensions),
+                _normalize_number(p.weight),
+                bool(p.is_priority),
+                _normalize_number(p.delay_cost),
+            ]
+            for p in packages
+        ],
+    }
+    return hashlib.sha256(json.dumps(normalized, separators=(",", ":"), default=str).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of packing results in a directory.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Initializes the ResultCache.
+
+        :param cache_dir: Directory of the cache, created if needed.
+        :param max_bytes: Total size of the entries above which the least recently used are evicted.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str, ulds: List[ULD], packages: List[Package]) -> Optional[Solution]:
+        """
+        Looks up a result.
+
+        :param key: Key of the run, see instance_key.
+        :param ulds: The ULDs of the instance, loaded with the packed packages on a hit.
+        :param packages: The packages of the instance.
+        :return: The cached solution, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            with open(path) as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            # Missing, evicted meanwhile or unreadable entries are misses
+            return None
+        if entry.get("version") != CACHE_VERSION or entry.get("key") != key:
+            return None
+
+        try:
+            # Refresh the entry for LRU eviction
+            os.utime(path)
+        except OSError:
+            pass
+
+        solution = Solution(
+            ulds,
+            [tuple(position) for position in entry["packed_positions"]],
+            entry["unpacked_ids"],
+            entry["total_cost"],
+            entry["n_priority_ulds"],
+        )
+        return solution.attach_packages(packages)
+
+    def put(self, key: str, solution: Solution):
+        """
+        Stores a result and evicts the least recently used entries above the size bound.
+
+        :param key: Key of the run, see instance_key.
+        :param solution: The solution to store.
+        """
+        entry = {
+            "version": CACHE_VERSION,
+            "key": key,
+            "total_cost": _normalize_number(solution.total_cost),
+            "n_priority_ulds": solution.n_priority_ulds,
+            "packed_positions": [
+                [str(package_id), str(uld_id), *(_normalize_number(v) for v in box)]
+                for package_id, uld_id, *box in solution.packed_positions
+            ],
+            "unpacked_ids": [str(package_id) for package_id in solution.unpacked_ids],
+        }
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            # mkstemp creates private files, entries are shared by everyone using the cache
+            os.chmod(tmp_path, 0o644)
+            with os.fdopen(fd, "w") as file:
+                json.dump(entry, file, separators=(",", ":"))
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in max_bytes,
+        and temporary files left over by crashed writers.
+        """
+        with open(os.path.join(self.cache_dir, ".lock"), "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+            now = time.time()
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if entry.name.endswith(".tmp"):
+                    if now - stat.st_mtime > STALE_TMP_AGE:
+                        self._unlink(entry.path)
+                elif entry.name.endswith(".json"):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._unlink(path)
+                total -= size
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
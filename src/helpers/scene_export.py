@@ -0,0 +1,209 @@
+"""
+Headless export of packed ULDs to glTF binary (.glb) scene files.
+
+Every ULD is written as one scene holding a single unit cube mesh, drawn once
+per package through per-instance translations and scales
+(EXT_mesh_gpu_instancing), plus the outline of the ULD. Nothing is rendered:
+the cost is one pass over `packed_positions` and viewers (three.js, Babylon.js,
+Blender, ...) do the drawing.
+"""
+import json
+import struct
+from typing import Dict, List
+
+import numpy as np
+
+from solvers.ULDPackerBase import ULDPackerBase
+
+# glTF constants
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+FLOAT = 5126
+UNSIGNED_SHORT = 5123
+MODE_LINES = 1
+MODE_TRIANGLES = 4
+
+# Unit cube: bottom-left-front, bottom-right-front, bottom-right-back, bottom-left-back,
+# then the same four corners on top
+CUBE_VERTICES = np.array(
+    [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0], [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]],
+    dtype=np.float32,
+)
+
+# Two counter-clockwise (outward facing) triangles per face
+CUBE_TRIANGLES = np.array(
+    [
+        [0, 2, 1], [0, 3, 2],  # Bottom face
+        [4, 5, 6], [4, 6, 7],  # Top face
+        [0, 1, 5], [0, 5, 4],  # Front face
+        [3, 6, 2], [3, 7, 6],  # Back face
+        [0, 4, 7], [0, 7, 3],  # Left face
+        [1, 2, 6], [1, 6, 5],  # Right face
+    ],
+    dtype=np.uint16,
+)
+
+CUBE_EDGES = np.array(
+    [[0, 1], [1, 2], [2, 3], [3, 0], [4, 5], [5, 6], [6, 7], [7, 4], [0, 4], [1, 5], [2, 6], [3, 7]],
+    dtype=np.uint16,
+)
+
+
+class _GLBBuilder:
+    """
+    Accumulates binary buffer views and accessors of a glTF document.
+    """
+
+    def __init__(self):
+        self.binary = bytearray()
+        self.buffer_views: List[Dict] = []
+        self.accessors: List[Dict] = []
+
+    def add_accessor(self, data: np.ndarray, accessor_type: str, target: int = None) -> int:
+        """
+        Appends an array to the binary buffer and creates an accessor for it.
+
+        :param data: Array of float32 (one row per element) or uint16 (indices).
+        :param accessor_type: glTF accessor type ('SCALAR', 'VEC3', ...).
+        :param target: Optional buffer view target.
+        :return: Index of the accessor.
+        """
+        # Buffer views are aligned to 4 bytes
+        self.binary.extend(b"\x00" * (-len(self.binary) % 4))
+        view = {"buffer": 0, "byteOffset": len(self.binary), "byteLength": data.nbytes}
+        if target is not None:
+            view["target"] = target
+        self.binary.extend(data.tobytes())
+        self.buffer_views.append(view)
+
+        accessor = {
+            "bufferView": len(self.buffer_views) - 1,
+            "componentType": FLOAT if data.dtype == np.float32 else UNSIGNED_SHORT,
+            "count": len(data) if data.ndim > 1 else data.size,
+            "type": accessor_type,
+        }
+        if data.dtype == np.float32 and len(data) > 0:
+            accessor["min"] = data.min(axis=0).tolist()
+            accessor["max"] = data.max(axis=0).tolist()
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+
+def build_glb(uld_dimensions, boxes: np.ndarray, instancing: bool = True) -> bytes:
+    """
+    Builds a glTF binary scene of one ULD.
+
+    :param uld_dimensions: Dimensions of the ULD.
+    :param boxes: Array of shape (n, 6) of the packed packages (x, y, z, length, width, height).
+    :param instancing: Whether to draw the packages with EXT_mesh_gpu_instancing. If False,
+                       every package gets its own node referencing the cube mesh, which
+                       viewers without the extension can also display.
+    :return: The .glb file contents.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+    builder = _GLBBuilder()
+
+    position = builder.add_accessor(CUBE_VERTICES, "VEC3", ARRAY_BUFFER)
+    triangles = builder.add_accessor(CUBE_TRIANGLES.ravel(), "SCALAR", ELEMENT_ARRAY_BUFFER)
+    edges = builder.add_accessor(CUBE_EDGES.ravel(), "SCALAR", ELEMENT_ARRAY_BUFFER)
+
+    gltf = {
+        "asset": {"version": "2.0", "generator": "ULD packing scene export"},
+        "scene": 0,
+        "materials": [
+            {
+                "name": "package",
+                "pbrMetallicRoughness": {"baseColorFactor": [0.2, 0.5, 0.8, 1.0], "metallicFactor": 0.0},
+            },
+            {
+                "name": "uld",
+                "pbrMetallicRoughness": {"baseColorFactor": [0.3, 0.3, 0.3, 1.0], "metallicFactor": 0.0},
+            },
+        ],
+        "meshes": [
+            {
+                "name": "package",
+                "primitives": [
+                    {"attributes": {"POSITION": position}, "indices": triangles,
+                     "material": 0, "mode": MODE_TRIANGLES},
+                ],
+            },
+            {
+                "name": "uld",
+                "primitives": [
+                    {"attributes": {"POSITION": position}, "indices": edges,
+                     "material": 1, "mode": MODE_LINES},
+                ],
+            },
+        ],
+        "nodes": [
+            {"name": "uld", "mesh": 1, "scale": [float(d) for d in uld_dimensions]},
+        ],
+    }
+
+    if len(boxes) > 0:
+        if instancing:
+            gltf["nodes"].append(
+                {
+                    "name": "packages",
+                    "mesh": 0,
+                    "extensions": {
+                        "EXT_mesh_gpu_instancing": {
+                            "attributes": {
+                                "TRANSLATION": builder.add_accessor(np.ascontiguousarray(boxes[:, :3]), "VEC3"),
+                                "SCALE": builder.add_accessor(np.ascontiguousarray(boxes[:, 3:]), "VEC3"),
+                            }
+                        }
+                    },
+                }
+            )
+            gltf["extensionsUsed"] = ["EXT_mesh_gpu_instancing"]
+            gltf["extensionsRequired"] = ["EXT_mesh_gpu_instancing"]
+        else:
+            gltf["nodes"].extend(
+                {"mesh": 0, "translation": box[:3], "scale": box[3:]}
+                for box in boxes.tolist()
+            )
+
+    gltf["scenes"] = [{"nodes": list(range(len(gltf["nodes"])))}]
+    gltf["accessors"] = builder.accessors
+    gltf["bufferViews"] = builder.buffer_views
+    gltf["buffers"] = [{"byteLength": len(builder.binary)}]
+
+    # Both chunks are padded to 4 bytes, JSON with spaces and the binary with zeros
+    json_chunk = json.dumps(gltf, separators=(",", ":")).encode()
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    binary_chunk = bytes(builder.binary) + b"\x00" * (-len(builder.binary) % 4)
+
+    length = 12 + 8 + len(json_chunk) + 8 + len(binary_chunk)
+    return b"".join(
+        [
+            struct.pack("<4sII", b"glTF", 2, length),
+            struct.pack("<I4s", len(json_chunk), b"JSON"),
+            json_chunk,
+            struct.pack("<I4s", len(binary_chunk), b"BIN\x00"),
+            binary_chunk,
+        ]
+    )
+
+
+def export_gltf(packer_instance: ULDPackerBase, output_dir: str, instancing: bool = True) -> List[str]:
+    """
+    Writes every ULD of a packing to `packed_uld_<id>.glb` in the output directory.
+
+    :param packer_instance: The packer instance (or helpers.solution.Solution) containing the ULDs and packed positions.
+    :param output_dir: The directory where the scene files will be saved.
+    :param instancing: Whether to draw the packages with EXT_mesh_gpu_instancing, see build_glb.
+    :return: The paths of the written files.
+    """
+    boxes: Dict[str, List] = {uld.id: [] for uld in packer_instance.ulds}
+    for (package_id, uld_id, x, y, z, length, width, height) in packer_instance.packed_positions:
+        boxes[uld_id].append((x, y, z, length, width, height))
+
+    paths = []
+    for uld in packer_instance.ulds:
+        path = f"{output_dir}/packed_uld_{uld.id}.glb"
+        with open(path, "wb") as file:
+            file.write(build_glb(uld.dimensions, np.array(boxes[uld.id]), instancing))
+        paths.append(path)
+    return paths
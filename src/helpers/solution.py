@@ -0,0 +1,178 @@
+"""
+Solutions read back from disk, for rendering outside of the solving process
+and for results served from helpers.result_cache.
+
+A Solution exposes the same `ulds` and `packed_positions` attributes as a
+packer, so the renderers in helpers.plot_images, helpers.visualize and
+helpers.scene_export accept either.
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from dataclass.Package import Package
+from dataclass.ULD import ULD
+from helpers.input_data import read_ulds
+
+
+class Solution:
+    """
+    A packing loaded from an output file or from the result cache.
+
+    :param ulds: The ULDs of the instance.
+    :param packed_positions: Packed positions as (package id, ULD id, x, y, z, length, width, height).
+    :param unpacked_ids: IDs of the packages that were not packed.
+    :param total_cost: Total cost of the packing.
+    :param n_priority_ulds: Number of ULDs holding priority packages.
+    """
+
+    def __init__(self, ulds: List[ULD], packed_positions: List[Tuple], unpacked_ids: List[str],
+                 total_cost: float, n_priority_ulds: int):
+        self.ulds = ulds
+        self.packed_positions = packed_positions
+        self.unpacked_ids = unpacked_ids
+        self.total_cost = total_cost
+        self.n_priority_ulds = n_priority_ulds
+        self.packages: List[Package] = None
+
+    def attach_packages(self, packages: List[Package]) -> "Solution":
+        """
+        Attaches the packages of the instance and loads the packed ones into the ULDs
+        (current weight and occupied volume), as packing them would.
+
+        :param packages: The packages of the instance.
+        :return: The solution itself.
+        """
+        self.packages = packages
+        by_id = {pkg.id: pkg for pkg in packages}
+        ulds = {uld.id: uld for uld in self.ulds}
+        for package_id, uld_id, *_ in self.packed_positions:
+            package = by_id[package_id]
+            ulds[uld_id].current_weight += package.weight
+            ulds[uld_id].current_vol_occupied += package.volume
+        return self
+
+    def packed_packages(self) -> List[Package]:
+        """
+        :return: The packed packages, in packing order. Requires attach_packages.
+        """
+        by_id = {pkg.id: pkg for pkg in self.packages}
+        return [by_id[package_id] for package_id, *_ in self.packed_positions]
+
+    def unpacked_packages(self) -> List[Package]:
+        """
+        :return: The packages that were not packed. Requires attach_packages.
+        """
+        by_id = {pkg.id: pkg for pkg in self.packages}
+        return [by_id[package_id] for package_id in self.unpacked_ids]
+
+    def ulds_with_prio(self) -> Dict[str, bool]:
+        """
+        :return: A dictionary with ULD IDs as keys, True for the ULDs holding priority packages.
+                 Requires attach_packages.
+        """
+        ulds_with_prio = {uld.id: False for uld in self.ulds}
+        for uld_id in self.count_priority_packages_in_uld():
+            ulds_with_prio[uld_id] = True
+        return ulds_with_prio
+
+    def count_priority_packages_in_uld(self) -> Dict[str, int]:
+        """
+        Counts priority packages in each ULD. Requires attach_packages.
+
+        :return: A dictionary with ULD IDs as keys and counts of priority packages as values.
+        """
+        by_id = {pkg.id: pkg for pkg in self.packages}
+        priority_count_per_uld = {}
+        for package_id, uld_id, *_ in self.packed_positions:
+            if by_id[package_id].is_priority:
+                priority_count_per_uld[uld_id] = priority_count_per_uld.get(uld_id, 0) + 1
+        return priority_count_per_uld
+
+    @classmethod
+    def from_text(cls, path: str, ulds: List[ULD]) -> "Solution":
+        """
+        Reads a solution in the output.txt format: a 'cost,packed,priority ULDs' header
+        line followed by one 'package,uld,x1,y1,z1,x2,y2,z2' line per package.
+
+        :param path: Path of the output file.
+        :param ulds: The ULDs of the instance.
+        :return: The solution.
+        """
+        with open(path) as file:
+            total_cost, _, n_priority_ulds = file.readline().strip().split(",")
+            packed_positions = []
+            unpacked_ids = []
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                package_id, uld_id, *corners = line.split(",")
+                if uld_id == "NONE":
+                    unpacked_ids.append(package_id)
+                    continue
+                x1, y1, z1, x2, y2, z2 = (int(c) for c in corners)
+                packed_positions.append((package_id, uld_id, x1, y1, z1, x2 - x1, y2 - y1, z2 - z1))
+        return cls(ulds, packed_positions, unpacked_ids, float(total_cost), int(n_priority_ulds))
+
+    @classmethod
+    def from_npz(cls, path: str, ulds: List[ULD]) -> "Solution":
+        """
+        Reads a solution written by write_npz.
+
+        :param path: Path of the .npz file.
+        :param ulds: The ULDs of the instance.
+        :return: The solution.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            packed_positions = [
+                (package_id, uld_id, *box)
+                for package_id, uld_id, box in zip(
+                    data["package_ids"].tolist(), data["uld_ids"].tolist(), data["boxes"].tolist()
+                )
+            ]
+            return cls(
+                ulds,
+                packed_positions,
+                data["unpacked_ids"].tolist(),
+                float(data["total_cost"]),
+                int(data["n_priority_ulds"]),
+            )
+
+    def write_npz(self, path: str):
+        """
+        Writes the solution as a binary .npz file.
+
+        :param path: Path of the output file.
+        """
+        np.savez_compressed(
+            path,
+            package_ids=np.array([p[0] for p in self.packed_positions], dtype=str),
+            uld_ids=np.array([p[1] for p in self.packed_positions], dtype=str),
+            boxes=np.array([p[2:] for p in self.packed_positions], dtype=float).reshape(-1, 6),
+            unpacked_ids=np.array(self.unpacked_ids, dtype=str),
+            total_cost=self.total_cost,
+            n_priority_ulds=self.n_priority_ulds,
+        )
+
+    def get_list_of_spaces(self, uld_id):
+        """
+        Free spaces are not stored in solution files.
+
+        :return: None
+        """
+        return None
+
+
+def read_solution(solution_file: str, uld_file: str) -> Solution:
+    """
+    Reads a solution, as output.txt or as a binary .npz file, with the ULDs it was solved for.
+
+    :param solution_file: Path of the solution file.
+    :param uld_file: ULD data file.
+    :return: The solution.
+    """
+    ulds = read_ulds(uld_file)
+    if solution_file.endswith(".npz"):
+        return Solution.from_npz(solution_file, ulds)
+    return Solution.from_text(solution_file, ulds)
@@ -0,0 +1,94 @@
+import logging
+import json
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# Trace levels (same values as the logging module)
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+OFF = logging.CRITICAL + 10
+
+
+class TraceEvent(NamedTuple):
+    """
+    A single structured trace record.
+
+    :param time: perf_counter timestamp of the event.
+    :param level: Level of the event (DEBUG, INFO).
+    :param name: Name of the event, e.g. 'link_added'.
+    :param fields: Payload of the event.
+    """
+    time: float
+    level: int
+    name: str
+    fields: Dict[str, Any]
+
+
+class Tracer:
+    """
+    Collects structured trace events from the solvers.
+
+    The level has to be checked at the call site before the event is built,
+    so that a disabled tracer costs a single attribute lookup:
+
+        if __debug__ and self.tracer.debug:
+            self.tracer.emit(DEBUG, "link_added", src=node1.node_id, dst=node2.node_id)
+
+    When Python runs with -O, `__debug__` is False and the compiler removes
+    the whole block, so tracing is compiled out entirely.
+    Every packer owns its own tracer, nothing is shared between packers.
+    """
+
+    def __init__(self, level: int = OFF, record: bool = True, logger: Optional[logging.Logger] = None):
+        """
+        Initializes the Tracer.
+
+        :param level: Minimum level of events to emit. Defaults to OFF.
+        :param record: Whether emitted events are kept in `events`.
+        :param logger: Optional logger the events are forwarded to.
+        """
+        self.record = record
+        self.logger = logger
+        self.events: List[TraceEvent] = []
+        self.set_level(level)
+
+    def set_level(self, level: int):
+        """
+        Sets the minimum level and refreshes the per-level flags.
+
+        :param level: Minimum level of events to emit.
+        """
+        self.level = level
+        self.debug = level <= DEBUG
+        self.info = level <= INFO
+
+    def emit(self, level: int, name: str, **fields):
+        """
+        Emits an event. Callers are expected to have checked the level already.
+
+        :param level: Level of the event.
+        :param name: Name of the event.
+        :param fields: Payload of the event.
+        """
+        if self.record:
+            self.events.append(TraceEvent(time.perf_counter(), level, name, fields))
+        if self.logger is not None and self.logger.isEnabledFor(level):
+            self.logger.log(level, "%s %s", name, " ".join(f"{k}={v}" for k, v in fields.items()))
+
+    def clear(self):
+        """
+        Drops all recorded events.
+        """
+        self.events = []
+
+    def dump(self, path: str):
+        """
+        Writes the recorded events to a file, one JSON object per line.
+
+        :param path: Path of the output file.
+        """
+        with open(path, "w") as file:
+            for event in self.events:
+                record = {"time": event.time, "level": event.level, "name": event.name}
+                record.update(event.fields)
+                print(json.dumps(record, default=str), file=file)
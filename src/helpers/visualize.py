@@ -2,97 +2,94 @@ import numpy as np
 import pyvista as pv
 from solvers.ULDPackerBase import ULDPackerBase
 
+# Corners of a unit cuboid: bottom-left-front, bottom-right-front, bottom-right-back,
+# bottom-left-back, then the same four corners on top
+CUBOID_CORNERS = np.array(
+    [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0], [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]],
+    dtype=np.float32,
+)
+
+# Faces of a cuboid as indices into CUBOID_CORNERS (4 vertices per face)
+CUBOID_FACES = np.array(
+    [
+        [0, 1, 2, 3],  # Bottom face
+        [7, 6, 5, 4],  # Top face
+        [0, 3, 7, 4],  # Left face
+        [1, 2, 6, 5],  # Right face
+        [0, 1, 5, 4],  # Front face
+        [3, 2, 6, 7],  # Back face
+    ]
+)
+
+
+def cuboids_mesh(boxes: np.ndarray, colors: np.ndarray = None) -> pv.PolyData:
+    """
+    Merges a batch of cuboids into a single mesh, so that VTK draws them with one actor.
+
+    :param boxes: Array of shape (n, 6) of (x, y, z, length, width, height).
+    :param colors: Optional array of shape (n, 3) of RGB colors in [0, 1], one per cuboid.
+                   Stored as the per-cell 'colors' scalars of the mesh.
+    :return: The merged mesh.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+    n = len(boxes)
+
+    # 8 points per cuboid
+    points = (boxes[:, None, :3] + CUBOID_CORNERS[None, :, :] * boxes[:, None, 3:]).reshape(-1, 3)
+
+    # 6 faces per cuboid, each prefixed with its number of vertices
+    indices = CUBOID_FACES[None, :, :] + 8 * np.arange(n)[:, None, None]
+    faces = np.hstack([np.full((n * 6, 1), 4), indices.reshape(-1, 4)]).astype(np.int64).ravel()
 
-def draw_cuboid(grid, x: int, y: int, z: int, length: int, width: int, height: int, opacity: float):
+    mesh = pv.PolyData(points, faces)
+    if colors is not None:
+        mesh.cell_data["colors"] = (np.repeat(colors, len(CUBOID_FACES), axis=0) * 255).astype(np.uint8)
+    return mesh
+
+
+def _add_container(plotter: pv.Plotter, uld):
     """
-    Creates a cuboid and adds it to the plot.
+    Adds the outline of a ULD to the plot.
 
-    :param grid: The PyVista grid to add the cuboid to.
-    :param x, y, z: Coordinates of the bottom-left-front corner.
-    :param length, width, height: Length, width, and height of the cuboid.
-    :param opacity: Opacity of the cuboid, where 1 is fully opaque and 0 is fully transparent.
+    :param plotter: The PyVista plotter.
+    :param uld: The ULD.
     """
-    # Define vertices of the cuboid in 3D space
-    points = np.array(
-        [[x, y, z],  # Bottom-left-front corner
-        [x + length, y, z],  # Bottom-right-front corner
-        [x + length, y + width, z],  # Bottom-right-back corner
-        [x, y + width, z],  # Bottom-left-back corner
-        [x, y, z + height],  # Top-left-front corner
-        [x + length, y, z + height],  # Top-right-front corner
-        [x + length, y + width, z + height],  # Top-right-back corner
-        [x, y + width, z + height],  # Top-left-back corner
-    ], dtype=np.int32, )
-
-    points = points.astype(np.float32)
-
-    # Define the faces of the cuboid using the vertices (4 vertices per face)
-    faces = np.array([
-        [4, 0, 1, 2, 3],  # Bottom face
-        [4, 7, 6, 5, 4],  # Top face
-        [4, 0, 3, 7, 4],  # Left face
-        [4, 1, 2, 6, 5],  # Right face
-        [4, 0, 1, 5, 4],  # Front face
-        [4, 3, 2, 6, 7],  # Back face
-    ], dtype=np.int32, )
-
-    # Create the cuboid mesh using PyVista
-    cuboid = pv.PolyData(points, faces)
-
-    # Color the cuboid with a random color
-    color = np.random.rand(3)  # Random color (RGB)
-    # Add the cuboid to the plot with the specified opacity and edges
-    grid.add_mesh(cuboid, color=color, show_edges=True, opacity=opacity, edge_color="black")
+    container = cuboids_mesh(np.array([[0, 0, 0, *uld.dimensions]]))
+    plotter.add_mesh(container, color="lightgray", opacity=0.5, show_edges=True, edge_color="black", )
+
+
+def _add_packages(plotter: pv.Plotter, packer_instance: ULDPackerBase, uld):
+    """
+    Adds the packages packed in a ULD to the plot as one mesh, each package with a random color.
+
+    :param plotter: The PyVista plotter.
+    :param packer_instance: The packer instance or Solution.
+    :param uld: The ULD.
+    """
+    boxes = [
+        (x, y, z, l, w, h)
+        for package_id, uld_id, x, y, z, l, w, h in packer_instance.packed_positions
+        if uld_id == uld.id
+    ]
+    if not boxes:
+        return
+    mesh = cuboids_mesh(np.array(boxes), np.random.rand(len(boxes), 3))
+    plotter.add_mesh(mesh, scalars="colors", rgb=True, show_edges=True, edge_color="black")
 
 
 def visualize_3d_packing(packer_instance: ULDPackerBase):
     """
     Visualizes the packed 3D space by adding containers (ULDs) and their packed packages.
 
-    :param packer_instance: The packer instance that holds information about ULDs and packages.
+    :param packer_instance: The packer instance (or helpers.solution.Solution) that holds the ULDs and packed positions.
     """
     for uld in packer_instance.ulds:
         # Create a PyVista plotter for each ULD (unit load device)
         title = f"Packed ULD {uld.id}"
         plotter = pv.Plotter(title=title, window_size=(800, 600))
 
-        ULD_L, ULD_W, ULD_H = uld.dimensions
-
-        # Define the 3D points for the ULD container box
-        container_points = np.array([
-            [0, 0, 0],  # Bottom-left-front corner
-            [ULD_L, 0, 0],  # Bottom-right-front corner
-            [ULD_L, ULD_W, 0],  # Bottom-right-back corner
-            [0, ULD_W, 0],  # Bottom-left-back corner
-            [0, 0, ULD_H],  # Top-left-front corner
-            [ULD_L, 0, ULD_H],  # Top-right-front corner
-            [ULD_L, ULD_W, ULD_H],  # Top-right-back corner
-            [0, ULD_W, ULD_H],  # Top-left-back corner
-        ], dtype=np.float32, )
-
-        # Define the faces of the ULD container
-        container_faces = np.hstack([
-            [4, 0, 1, 2, 3],  # Bottom face
-            [4, 7, 6, 5, 4],  # Top face
-            [4, 0, 3, 7, 4],  # Left face
-            [4, 1, 2, 6, 5],  # Right face
-            [4, 0, 1, 5, 4],  # Front face
-            [4, 3, 2, 6, 7],  # Back face
-        ]).reshape(-1, 5)
-
-        # Create the ULD container mesh
-        container = pv.PolyData(container_points, container_faces)
-
-        # Add the ULD container mesh to the plot with edges
-        plotter.add_mesh(container, color="lightgray", opacity=0.5, show_edges=True, edge_color="black", )
-
-        # Add packed packages (cuboids) to the plot
-        for package_id, uld_id, x, y, z, l, w, h in packer_instance.packed_positions:
-            if uld_id != uld.id:
-                continue
-            package = next(pkg for pkg in packer_instance.packages if pkg.id == package_id)
-            l, w, h = package.rotation
-            draw_cuboid(plotter, x, y, z, l, w, h, 1)
+        _add_container(plotter, uld)
+        _add_packages(plotter, packer_instance, uld)
 
         # Set the camera for an isometric view of the plot
         plotter.view_isometric()
@@ -101,59 +98,27 @@ def visualize_3d_packing(packer_instance: ULDPackerBase):
 
 def visualize_individual_spaces(packer_instance: ULDPackerBase):
     """
-    Visualizes the individual empty spaces available in the ULDs (unit load devices).
+    Visualizes the empty spaces available in the ULDs (unit load devices),
+    all spaces of a ULD as one semi-transparent batch over its packed packages.
 
     :param packer_instance: The packer instance that contains the empty space data.
     """
     for uld in packer_instance.ulds:
         # Retrieve the list of empty spaces for the current ULD
         lsp = packer_instance.get_list_of_spaces(uld.id)
-        if lsp is not None:
-            for x, y, z, l, w, h in lsp:
-                # Create a PyVista plotter for the current ULD
-                title = f"Packed ULD {uld.id}"
-                plotter = pv.Plotter(title=title, window_size=(800, 600))
-
-                ULD_L, ULD_W, ULD_H = uld.dimensions
-
-                # Define the 3D points for the ULD container box
-                container_points = np.array([
-                    [0, 0, 0],  # Bottom-left-front corner
-                    [ULD_L, 0, 0],  # Bottom-right-front corner
-                    [ULD_L, ULD_W, 0],  # Bottom-right-back corner
-                    [0, ULD_W, 0],  # Bottom-left-back corner
-                    [0, 0, ULD_H],  # Top-left-front corner
-                    [ULD_L, 0, ULD_H],  # Top-right-front corner
-                    [ULD_L, ULD_W, ULD_H],  # Top-right-back corner
-                    [0, ULD_W, ULD_H],  # Top-left-back corner
-                ], dtype=np.float32, )
-
-                container_faces = np.hstack([
-                    [4, 0, 1, 2, 3],  # Bottom face
-                    [4, 7, 6, 5, 4],  # Top face
-                    [4, 0, 3, 7, 4],  # Left face
-                    [4, 1, 2, 6, 5],  # Right face
-                    [4, 0, 1, 5, 4],  # Front face
-                    [4, 3, 2, 6, 7],  # Back face
-                ]).reshape(-1, 5)
-
-                # Create the ULD container mesh
-                container = pv.PolyData(container_points, container_faces)
-
-                # Add the container mesh with edge color
-                plotter.add_mesh(container, color="lightgray", opacity=0.5, show_edges=True, edge_color="black", )
-
-                # Add empty spaces into the box with reduced opacity
-                draw_cuboid(plotter, x, y, z, l, w, h, 0.3)
-
-                # Add the packed packages to the plot
-                for (package_id, uld_id, x, y, z, l, w, h,) in packer_instance.packed_positions:
-                    if uld_id != uld.id:
-                        continue
-                    package = next(pkg for pkg in packer_instance.packages if pkg.id == package_id)
-                    l, w, h = package.rotation
-                    draw_cuboid(plotter, x, y, z, l, w, h, 1)
-
-                # Set the camera for a good view
-                plotter.view_isometric()
-                plotter.show(title=title)
+        if not lsp:
+            continue
+
+        title = f"Empty spaces of ULD {uld.id}"
+        plotter = pv.Plotter(title=title, window_size=(800, 600))
+
+        _add_container(plotter, uld)
+        _add_packages(plotter, packer_instance, uld)
+
+        # Add the empty spaces with reduced opacity
+        spaces = cuboids_mesh(np.array(lsp), np.random.rand(len(lsp), 3))
+        plotter.add_mesh(spaces, scalars="colors", rgb=True, opacity=0.3, show_edges=True, edge_color="black")
+
+        # Set the camera for a good view
+        plotter.view_isometric()
+        plotter.show(title=title)
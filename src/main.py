@@ -1,13 +1,15 @@
 #!/usr/bin/python
 
-import pandas as pd
 from typing import List, Tuple
+import argparse
+import logging
 import sys
 
 from dataclass.Package import Package
 from dataclass.ULD import ULD
-from helpers.plot_images import generate_3d_plot
-from helpers.visualize import visualize_3d_packing
+from helpers.input_data import read_packages, read_ulds
+from helpers.tracing import DEBUG, Tracer
+from helpers.timing import PhaseTimer
 import numpy as np
 import warnings
 
@@ -27,34 +29,8 @@ def read_data_from_csv(
     :return: A tuple containing two lists: the first list contains ULD objects,
              and the second list contains Package objects.
     """
-    uld_data = pd.read_csv(uld_file, comment="#")
-    package_data = pd.read_csv(package_file, comment="#")
-
-    ulds = [
-        ULD(
-            id=row["ULD Identifier"],
-            length=row["Length (cm)"],
-            width=row["Width (cm)"],
-            height=row["Height (cm)"],
-            weight_limit=row["Weight Limit (kg)"],
-        )
-        for _, row in uld_data.iterrows()
-    ]
-
-    packages = [
-        Package(
-            id=row["Package Identifier"],
-            length=row["Length (cm)"],
-            width=row["Width (cm)"],
-            height=row["Height (cm)"],
-            weight=row["Weight (kg)"],
-            is_priority=row["Type (P/E)"] == "Priority",
-            delay_cost=int(row["Cost of Delay"])
-            if str(row["Cost of Delay"]).isdigit()
-            else 0,
-        )
-        for _, row in package_data.iterrows()
-    ]
+    ulds = read_ulds(uld_file)
+    packages = read_packages(package_file)
 
     return ulds, packages
 
@@ -101,55 +77,116 @@ def format_output(
 
 
 # Main function
-def main(uld_file, package_file, output_dir):
+def main(uld_file, package_file, output_dir, timings_file=None, chrome_trace_file=None, counters_file=None,
+         plot=True, gltf=False, solution_file=None, cache_dir=None, cache_size=256 * 1024 * 1024,
+         block_placement=False, occupancy_resolution=None, search_options=None, convergence_file=None):
     global global_a_links
     global global_r_links
+    # Wall-clock time of every phase of the run, shared with the packer
+    timer = PhaseTimer()
+
     # Read the ULD and Package files
-    ulds, packages = read_data_from_csv(uld_file, package_file)
+    with timer.phase("ingest"):
+        ulds, packages = read_data_from_csv(uld_file, package_file)
 
     # Define priority spread cost
     priority_spread_cost = 5000
 
-    # Initialize the ULDPacker with multiple passes
-    packer = ULDPacker(ulds, packages, priority_spread_cost)
-
-    # This is to prevent printing. Set NOPRINT to True if
-    # you do not want to print logs while packing
-    global NOPRINT
-    import builtins
-    original_print = builtins.print
-
-    if NOPRINT:
-        builtins.print = lambda *args, **kwargs: None
-
-    # Start packing
-    (
-        packed_positions,
-        packed_packages,
-        unpacked_packages,
-        ulds_with_prio,
-        total_cost,
-    ) = packer.pack()
-
-    # Reset print
-    builtins.print = original_print
-
-    # Validate the packing
-    is_valid, validation_errors = packer.validate_packing()
-    if not is_valid:
-        print("Packing Validation Failed!")
-        for error in validation_errors:
-            print(f"Error: {error}")
+    # Look up the result of an identical earlier run
+    cache = None
+    solution = None
+    if cache_dir is not None:
+        from helpers.result_cache import ResultCache, instance_key
+        cache = ResultCache(cache_dir, cache_size)
+        with timer.phase("cache_lookup"):
+            params = {
+                "priority_spread_cost": priority_spread_cost,
+                "block_placement": block_placement,
+                "occupancy_resolution": occupancy_resolution,
+            }
+            params.update(search_options or {})
+            cache_key = instance_key(ulds, packages, ULDPacker.__name__, params)
+            solution = cache.get(cache_key, ulds, packages)
+
+    if solution is not None:
+        print("Packing loaded from cache")
+        packer = None
+        result = solution
+        packed_positions = solution.packed_positions
+        packed_packages = solution.packed_packages()
+        unpacked_packages = solution.unpacked_packages()
+        ulds_with_prio = solution.ulds_with_prio()
+        total_cost = solution.total_cost
     else:
-        print("Packing validated successfully! No overlaps")
-
-    # Generate 3D plots for ULDs
-    generate_3d_plot(packer, output_dir)  # Matplotlib
+        # Initialize the ULDPacker with multiple passes
+        packer = ULDPacker(ulds, packages, priority_spread_cost)
+        packer.block_placement = block_placement
+        packer.occupancy_resolution = occupancy_resolution
+        # Settings of the search solvers (generations, time budget, workers, ...)
+        for name, value in (search_options or {}).items():
+            setattr(packer, name, value)
+        result = packer
+
+        # Trace events are only built when tracing is enabled. Set NOPRINT
+        # to False to log them while packing
+        if not NOPRINT:
+            packer.tracer = Tracer(DEBUG, record=False, logger=logging.getLogger("solvers"))
+        packer.timings = timer
+
+        # Start packing
+        with timer.phase("pack"):
+            (
+                packed_positions,
+                packed_packages,
+                unpacked_packages,
+                ulds_with_prio,
+                total_cost,
+            ) = packer.pack()
+
+        # Validate the packing
+        with timer.phase("validate"):
+            is_valid, validation_errors = packer.validate_packing()
+        if not is_valid:
+            print("Packing Validation Failed!")
+            for error in validation_errors:
+                print(f"Error: {error}")
+        else:
+            print("Packing validated successfully! No overlaps")
+
+        # Only valid packings are cached
+        if cache is not None and is_valid:
+            from helpers.solution import Solution
+            with timer.phase("cache_store"):
+                cache.put(
+                    cache_key,
+                    Solution(
+                        ulds,
+                        packed_positions,
+                        [pkg.id for pkg in unpacked_packages],
+                        float(total_cost),
+                        sum([1 if is_prio_uld else 0 for is_prio_uld in ulds_with_prio.values()]),
+                    ),
+                )
+
+    # Generate 3D plots for ULDs. The plotting libraries are only imported
+    # here, so that runs without plots do not pay for loading them
+    if plot:
+        with timer.phase("plot"):
+            from helpers.plot_images import generate_3d_plot
+            generate_3d_plot(result, output_dir)  # Matplotlib
+    # from helpers.visualize import visualize_3d_packing, visualize_individual_spaces
     # visualize_3d_packing(packer)  # Pyvista
     # visualize_individual_spaces(packer) # Do not use this with large datasets
 
+    # Export the ULDs as glTF scenes, without rendering
+    if gltf:
+        with timer.phase("export"):
+            from helpers.scene_export import export_gltf
+            export_gltf(result, output_dir)
+
     # Format and print output if required
-    output = format_output(packed_positions, unpacked_packages, total_cost)
+    with timer.phase("format_output"):
+        output = format_output(packed_positions, unpacked_packages, total_cost)
     # print(output)
 
     # Actual output to text file
@@ -158,7 +195,28 @@ def main(uld_file, package_file, output_dir):
             print(f"{int(total_cost)},{len(packed_packages)},{sum([1 if is_prio_uld else 0 for is_prio_uld in ulds_with_prio.values()])}",file=file)
             print(output,file=file)
 
-    OutputToText()
+    with timer.phase("write_output"):
+        OutputToText()
+
+    # Binary copy of the solution, for rendering elsewhere (see render.py)
+    if solution_file is not None:
+        from helpers.solution import Solution
+        Solution(
+            ulds,
+            packed_positions,
+            [pkg.id for pkg in unpacked_packages],
+            float(total_cost),
+            sum([1 if is_prio_uld else 0 for is_prio_uld in ulds_with_prio.values()]),
+        ).write_npz(solution_file)
+
+    if timings_file is not None:
+        timer.write_json(timings_file)
+    if chrome_trace_file is not None:
+        timer.write_chrome_trace(chrome_trace_file)
+    if counters_file is not None and packer is not None:
+        packer.counters.write_json(counters_file)
+    if convergence_file is not None and packer is not None:
+        packer.write_convergence(convergence_file)
 
     print("\nPacking Statistics:")
     print(f"Total packages          : {len(packages)}")
@@ -172,7 +230,7 @@ def main(uld_file, package_file, output_dir):
     print(f"Non-packed Economy pkgs : {sum(1 for p in unpacked_packages if not p.is_priority)}\n")
     print(f"ULDs used               : {sum(1 for u in ulds if u.current_weight > 0)}")
     print(f"ULDs with priority pkgs : {sum([1 if is_prio_uld else 0 for is_prio_uld in ulds_with_prio.values()])}")
-    print(f"Priority pkgs per ULD   : {packer.count_priority_packages_in_uld()}\n")
+    print(f"Priority pkgs per ULD   : {result.count_priority_packages_in_uld()}\n")
     print(f"Total Weight Capacity   : {sum(u.weight_limit for u in ulds)}")
     print(f"Total Weight Used       : {sum(u.current_weight for u in ulds)}")
     print(f"Total Volume Capacity   : {sum(np.prod(u.dimensions) for u in ulds)}")
@@ -193,29 +251,80 @@ def main(uld_file, package_file, output_dir):
 
 
 if __name__ == "__main__":
-    if len(sys.argv) <= 4:
-        print(
-            """
-Usage: python main.py <solver-type> <uld-file> <package-file> <output-dir>
-
+    parser = argparse.ArgumentParser(
+        usage="python main.py <solver-type> <uld-file> <package-file> <output-dir> [options]",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
 Supported Solver Types:
   - BasicOverlap (no guarantee of 100% priority packing)
   - BasicNonOverlap (no guarantee of 100% priority packing),
   - Tree
   - Preference
-  - MixedTree (Buggy, does not work)"""
-        )
-        exit(1)
-
-    if sys.argv[1] == "BasicOverlap":
+  - Layer (wall by wall, for loads of few kinds of packages)
+  - ExtremePoint (fast, for large manifests)
+  - HeightMap (stable stacking on height maps)
+  - Genetic (slow, searches package orders for a lower cost)
+  - Beam (beam search, time grows with the beam width)
+  - MixedTree (Buggy, does not work)""",
+    )
+    parser.add_argument("solver_type", help="Type of solver to use")
+    parser.add_argument("uld_file", help="Path to the ULD file")
+    parser.add_argument("package_file", help="Path to the package file")
+    parser.add_argument("output_dir", help="Directory to store the output results")
+    parser.add_argument("--timings", metavar="FILE", help="Write a JSON report of the time spent in each phase")
+    parser.add_argument("--chrome-trace", metavar="FILE", help="Write the phases in the Chrome trace event format")
+    parser.add_argument("--counters", metavar="FILE", help="Write the hot-path counters of the solver as JSON")
+    parser.add_argument("--no-plot", action="store_true", help="Do not generate the 3D plots of the ULDs")
+    parser.add_argument("--gltf", action="store_true", help="Write each ULD as a glTF binary scene (.glb)")
+    parser.add_argument("--solution-file", metavar="FILE", help="Also write the solution as a binary .npz file")
+    parser.add_argument("--cache-dir", metavar="DIR", help="Reuse results of identical earlier runs cached in DIR")
+    parser.add_argument("--cache-size", metavar="MB", type=float, default=256,
+                        help="Size of the result cache above which least recently used results are evicted")
+    parser.add_argument("--blocks", action="store_true",
+                        help="Pack identical packages as blocks (BasicOverlap and Preference)")
+    parser.add_argument("--occupancy-grid", metavar="RES", type=int,
+                        help="Search occupancy grids with cells of side RES instead of the free spaces "
+                             "(BasicOverlap, BasicNonOverlap and Preference)")
+    parser.add_argument("--search-mode", choices=("first_fit", "global_best"),
+                        help="ULD search of Tree: the first ULD with a space, or the best space of every ULD")
+    parser.add_argument("--priority-subset", action="store_true",
+                        help="Pack the priority packages in the fewest ULDs found to hold them (Preference)")
+    parser.add_argument("--economy-selection", action="store_true",
+                        help="Leave out the economy packages no ULD has the capacity left for (Preference)")
+    parser.add_argument("--beam-width", metavar="N", type=int,
+                        help="Number of partial packings kept at every step by the Beam solver")
+    parser.add_argument("--generations", metavar="N", type=int, help="Number of generations of the Genetic solver")
+    parser.add_argument("--population", metavar="N", type=int,
+                        help="Number of plans per generation of the Genetic solver")
+    parser.add_argument("--time-budget", metavar="SECONDS", type=float,
+                        help="Stop the Genetic solver after the generation running at SECONDS")
+    parser.add_argument("--workers", metavar="N", type=int,
+                        help="Number of processes of the Genetic and Beam solvers or testing priority subsets")
+    parser.add_argument("--decoder-cache", metavar="MB", type=float,
+                        help="Memory bound of the packing states cached per process by the Genetic solver, 0 for none")
+    parser.add_argument("--convergence", metavar="FILE",
+                        help="Write the best and mean cost of every generation of the Genetic solver as JSON")
+    args = parser.parse_args()
+
+    if args.solver_type == "BasicOverlap":
         from solvers.ULDPackerBasicOverlap import ULDPackerBasicOverlap as ULDPacker
-    elif sys.argv[1] == "BasicNonOverlap":
+    elif args.solver_type == "BasicNonOverlap":
         from solvers.ULDPackerBasicNonOverlap import ULDPackerBasicNonOverlap as ULDPacker
-    elif sys.argv[1] == "Tree":
+    elif args.solver_type == "Tree":
         from solvers.ULDPackerTree import ULDPackerTree as ULDPacker
-    elif sys.argv[1] == "Preference":
+    elif args.solver_type == "Preference":
         from solvers.ULDPackerPreference import ULDPackerPreference as ULDPacker
-    elif sys.argv[1] == "MixedTree":
+    elif args.solver_type == "Layer":
+        from solvers.ULDPackerLayer import ULDPackerLayer as ULDPacker
+    elif args.solver_type == "ExtremePoint":
+        from solvers.ULDPackerExtremePoint import ULDPackerExtremePoint as ULDPacker
+    elif args.solver_type == "HeightMap":
+        from solvers.ULDPackerHeightMap import ULDPackerHeightMap as ULDPacker
+    elif args.solver_type == "Genetic":
+        from solvers.ULDPackerGenetic import ULDPackerGenetic as ULDPacker
+    elif args.solver_type == "Beam":
+        from solvers.ULDPackerBeam import ULDPackerBeam as ULDPacker
+    elif args.solver_type == "MixedTree":
         from solvers.ULDPackerMixedTree import ULDPackerMixedTree as ULDPacker
         warnings.warn("The implementation of MixedTree is buggy, it will not work for large datasets")
     else:
@@ -225,8 +334,46 @@ Supported Solver Types:
   - BasicNonOverlap (no guarantee of 100% priority packing),
   - Tree
   - Preference
+  - Layer (wall by wall, for loads of few kinds of packages)
+  - ExtremePoint (fast, for large manifests)
+  - HeightMap (stable stacking on height maps)
+  - Genetic (slow, searches package orders for a lower cost)
+  - Beam (beam search, time grows with the beam width)
   - MixedTree (Buggy, does not work)"""
         )
         exit(1)
 
-    main(sys.argv[2], sys.argv[3], sys.argv[4])
+    if args.blocks and args.solver_type not in ("BasicOverlap", "Preference"):
+        warnings.warn(f"{args.solver_type} does not support --blocks, packages are packed one at a time")
+    if args.occupancy_grid is not None and args.solver_type not in ("BasicOverlap", "BasicNonOverlap", "Preference"):
+        warnings.warn(f"{args.solver_type} does not support --occupancy-grid, it is ignored")
+
+    # Settings of the search solvers, as (packer attribute, option, value, solvers supporting it)
+    search_options = {}
+    for name, option, value, solvers in (
+        ("generations", "--generations", args.generations, ("Genetic",)),
+        ("population_size", "--population", args.population, ("Genetic",)),
+        ("time_budget", "--time-budget", args.time_budget, ("Genetic",)),
+        ("search_mode", "--search-mode", args.search_mode, ("Tree",)),
+        ("priority_subset", "--priority-subset", args.priority_subset or None, ("Preference",)),
+        ("economy_selection", "--economy-selection", args.economy_selection or None, ("Preference",)),
+        ("beam_width", "--beam-width", args.beam_width, ("Beam",)),
+        ("n_workers", "--workers", args.workers, ("Genetic", "Beam", "Preference")),
+        ("cache_bytes", "--decoder-cache",
+         None if args.decoder_cache is None else int(args.decoder_cache * 1024 * 1024), ("Genetic",)),
+    ):
+        if value is None:
+            continue
+        if args.solver_type in solvers:
+            search_options[name] = value
+        else:
+            warnings.warn(f"{args.solver_type} does not support {option}, it is ignored")
+    if args.convergence is not None and args.solver_type != "Genetic":
+        warnings.warn(f"{args.solver_type} does not support --convergence, it is ignored")
+        args.convergence = None
+
+    logging.basicConfig(level=logging.INFO if NOPRINT else logging.DEBUG)
+
+    main(args.uld_file, args.package_file, args.output_dir, args.timings, args.chrome_trace, args.counters,
+         not args.no_plot, args.gltf, args.solution_file, args.cache_dir, int(args.cache_size * 1024 * 1024),
+         args.blocks, args.occupancy_grid, search_options, args.convergence)
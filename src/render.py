@@ -0,0 +1,52 @@
+#!/usr/bin/python
+
+import argparse
+import os
+
+from helpers.solution import read_solution
+
+
+# Main function
+def render(solution_file, uld_file, output_dir, png=True, gltf=False, interactive=False, n_workers=None):
+    """
+    Renders a written solution, independently of the process that solved it.
+
+    :param solution_file: The solution, as output.txt or a binary .npz solution file.
+    :param uld_file: The ULD file the solution was solved for.
+    :param output_dir: Directory to store the images and scenes in.
+    :param png: Whether to write matplotlib images of the ULDs.
+    :param gltf: Whether to write glTF scenes of the ULDs.
+    :param interactive: Whether to open interactive PyVista windows.
+    :param n_workers: Number of processes rendering images in parallel.
+    """
+    solution = read_solution(solution_file, uld_file)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # The rendering libraries are only imported when their output is requested
+    if png:
+        from helpers.plot_images import generate_3d_plot
+        generate_3d_plot(solution, output_dir, n_workers)
+    if gltf:
+        from helpers.scene_export import export_gltf
+        export_gltf(solution, output_dir)
+    if interactive:
+        from helpers.visualize import visualize_3d_packing
+        visualize_3d_packing(solution)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        usage="python render.py <solution-file> <uld-file> <output-dir> [options]",
+        description="Render a solution written by main.py (output.txt or a --solution-file .npz)",
+    )
+    parser.add_argument("solution_file", help="Path to the solution file")
+    parser.add_argument("uld_file", help="Path to the ULD file the solution was solved for")
+    parser.add_argument("output_dir", help="Directory to store the images and scenes")
+    parser.add_argument("--no-png", action="store_true", help="Do not write the matplotlib images")
+    parser.add_argument("--gltf", action="store_true", help="Write each ULD as a glTF binary scene (.glb)")
+    parser.add_argument("--interactive", action="store_true", help="Open interactive PyVista windows")
+    parser.add_argument("--workers", type=int, default=None, help="Processes rendering images in parallel")
+    args = parser.parse_args()
+
+    render(args.solution_file, args.uld_file, args.output_dir,
+           not args.no_png, args.gltf, args.interactive, args.workers)
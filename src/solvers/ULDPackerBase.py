@@ -3,8 +3,21 @@ from dataclass.ULD import ULD
 from dataclass.Package import Package
 import numpy as np
 import itertools
+from helpers.counters import Counters
+from helpers.timing import PhaseTimer
+from helpers.tracing import DEBUG, Tracer
+from .structures.NegativeFitCache import NegativeFitCache
+from .structures.OccupancyGrid import OccupancyGrid
 from .structures.SpaceNode import SpaceNode
 
+# Occupancy grids (one byte per cell) are drawn by validate_packing for ULDs
+# holding more packages than this, and at most this many cells
+MIN_GRID_VALIDATION_PACKAGES = 100
+MAX_VALIDATION_CELLS = 2**25
+
+# Cost of leaving a priority package out, for the search solvers (their delay cost is 0)
+PRIORITY_PENALTY = 10**9
+
 # Define the ULDPacker class
 class ULDPackerBase:
     def __init__(
@@ -34,7 +47,18 @@ class ULDPackerBase:
             u.id: [(0, 0, 0, u.dimensions[0], u.dimensions[1], u.dimensions[2])]
             for u in self.ulds
         }
+        # Boxes that did not fit, free space only shrinks so they never will
+        self.negative_fits = {u.id: NegativeFitCache() for u in self.ulds}
         self.minimum_dimension = np.inf
+        self.tracer = Tracer()  # Disabled by default, see helpers.tracing
+        self.timings = PhaseTimer()  # Wall-clock time per packing phase
+        self.counters = Counters()  # Hot-path counters, see get_counters
+        # Pack identical packages as blocks, for the solvers supporting it (see _pack_groups)
+        self.block_placement = False
+        # Cell side of the occupancy grids searched instead of the free spaces,
+        # for the solvers supporting it (see _find_in_occupancy_grid). None to disable
+        self.occupancy_resolution = None
+        self.occupancy_grids = {}
 
     def _find_available_space(
         self, uld: ULD, package: Package, orientation: Tuple[int], policy: str
@@ -78,13 +102,72 @@ class ULDPackerBase:
         """
         raise NotImplementedError("This method needs to be implemented.")
 
+    def get_counters(self) -> dict:
+        """
+        Returns the hot-path counters collected while packing.
+
+        :return: A dictionary of the counters.
+        """
+        return self.counters.as_dict()
+
     def get_list_of_spaces(self, uld_id):
         """
         Wrapper for getting list of empty spaces in a ULD
 
-        :return: None
+        :param uld_id: ID of the ULD to retrieve spaces from.
+        :return: List of available spaces as (x, y, z, length, width, height) tuples.
+        """
+        return list(self.available_spaces[uld_id])
+
+    def _occupancy_grid(self, uld: ULD) -> OccupancyGrid:
+        """
+        Returns the occupancy grid of a ULD, created empty on first use.
+
+        :param uld: The ULD.
+        :return: Its uniform OccupancyGrid at occupancy_resolution.
+        """
+        grid = self.occupancy_grids.get(uld.id)
+        if grid is None:
+            grid = OccupancyGrid.uniform(uld.dimensions, self.occupancy_resolution)
+            self.occupancy_grids[uld.id] = grid
+        return grid
+
+    def _find_in_occupancy_grid(self, uld: ULD, orientation: Tuple[int], policy: str):
+        """
+        Alternative to _find_available_space searching the occupancy grid of the ULD
+        rather than its list of free spaces, at a cost independent of the number of
+        spaces. Positions are on cell edges and packages cover whole cells, so the
+        search is conservative: it never overlaps packages but may miss a position.
+
+        The free space list is not maintained, the whole ULD stands for the space found.
+
+        :param uld: The ULD in which to find space.
+        :param orientation: The orientation of the package.
+        :param policy: Only 'first_find' (lowest, then back, then left position) is supported.
+        :return: Whether space was found, its position and the index of the space (0).
         """
-        pass
+        if policy != "first_find":
+            raise RuntimeError(f"Invalid policy {policy} for the occupancy grid")
+
+        position = self._occupancy_grid(uld).find_free(*orientation)
+        if self.counters.enabled:
+            self.counters.add("orientation_attempts")
+            self.counters.add("fit_checks")
+        if position is None:
+            return False, None, -1
+        return True, np.array(position), 0
+
+    def _occupy_in_grid(self, uld: ULD, position: np.ndarray, orientation: Tuple[int]):
+        """
+        Alternative to _update_available_spaces for the occupancy grid, marks the cells of a package.
+
+        :param uld: The ULD being updated.
+        :param position: The position where the package was packed.
+        :param orientation: The orientation of the package.
+        """
+        self._occupancy_grid(uld).occupy(*position, *orientation)
+        if self.counters.enabled:
+            self.counters.add("placements")
 
     def _try_pack_package(
         self,
@@ -104,6 +187,8 @@ class ULDPackerBase:
         :return: True if the package was successfully packed. False otherwise.
         """
         if package.weight + uld.current_weight > uld.weight_limit:
+            if self.counters.enabled:
+                self.counters.add("failed_uld_attempts")
             return False, (None, None, None)  # Exceeds weight limit
 
         if orientation_choose_policy == "no_rot":
@@ -147,6 +232,8 @@ class ULDPackerBase:
                     return True, temp_space
                 else:
                     return True
+            if self.counters.enabled:
+                self.counters.add("failed_uld_attempts")
             if return_space:
                 return False, None
             else:
@@ -195,6 +282,8 @@ class ULDPackerBase:
                         return True, temp_space
                     else:
                         return True
+                if self.counters.enabled:
+                    self.counters.add("failed_uld_attempts")
                 if return_space:
                     return False, None
                 else:
@@ -249,19 +338,21 @@ class ULDPackerBase:
                         best_orientation[2],
                     )
                 )
-                (x, y, z, l, b, h) = self.available_spaces[uld.id][space_index]
+                (x, y, z, l, b, h) = self.available_spaces[uld.id][best_space_index]
 
                 temp_space = SpaceNode(np.array([x, y, z]), np.array([l, b, h]), self.minimum_dimension)
 
                 self._update_available_spaces(
-                    uld, position, orientation, package, space_index
+                    uld, best_position, best_orientation, package, best_space_index
                 )
-                package.rotation = orientation
+                package.rotation = best_orientation
                 self.packed_packages.append(package)
                 if return_space:
                     return True, temp_space
                 else:
                     return True
+            if self.counters.enabled:
+                self.counters.add("failed_uld_attempts")
             if return_space:
                 return False, None
             else:
@@ -272,14 +363,186 @@ class ULDPackerBase:
                 f"Invalid orientation choose policy  {orientation_choose_policy}"
             )
 
-    def validate_packing(self) -> Tuple[bool, List[str]]:
+    @staticmethod
+    def _group_identical_packages(packages: List[Package]) -> List[List[Package]]:
+        """
+        Groups packages with the same dimensions, weight and priority class, which
+        are interchangeable while searching for space.
+
+        :param packages: The packages, in packing order.
+        :return: The groups, ordered by their first package, each keeping the packing order.
+        """
+        groups = {}
+        for package in packages:
+            key = (tuple(package.dimensions), package.weight, package.is_priority)
+            groups.setdefault(key, []).append(package)
+        return list(groups.values())
+
+    def _try_pack_block(
+        self,
+        packages: List[Package],
+        uld: ULD,
+        space_find_policy: str,
+        orientation_choose_policy: str,
+    ) -> int:
+        """
+        Attempts to pack identical packages (see _group_identical_packages) into the
+        specified ULD as one a x b x c block, with a single search and a single space update.
+        The block is the largest one of at most len(packages) packages that fills a cuboid
+        in the space found for one package, and within the weight limit of the ULD.
+
+        :param packages: Identical packages, packed from the front of the list.
+        :param uld: The ULD in which to attempt packing the packages.
+        :param space_find_policy: Policy to determine how to find available space (first_find, etc...).
+        :param orientation_choose_policy: 'no_rot' to keep the dimensions of the packages,
+                                          'first_find' to use the first orientation that fits.
+        :return: The number of packages packed, 0 if none fit.
+        """
+        package = packages[0]
+        count = len(packages)
+        if package.weight > 0:
+            count = min(count, int((uld.weight_limit - uld.current_weight) // package.weight))
+        if count < 1:
+            if self.counters.enabled:
+                self.counters.add("failed_uld_attempts")
+            return 0
+
+        if orientation_choose_policy == "no_rot":
+            orientations = [tuple(package.dimensions)]
+        elif orientation_choose_policy == "first_find":
+            orientations = list(itertools.permutations(package.dimensions))
+        else:
+            raise RuntimeError(
+                f"Invalid orientation choose policy  {orientation_choose_policy}"
+            )
+
+        for orientation in orientations:
+            can_fit, position, space_index = self._find_available_space(
+                uld, package, orientation, policy=space_find_policy
+            )
+            if can_fit:
+                break
+        else:
+            if self.counters.enabled:
+                self.counters.add("failed_uld_attempts")
+            return 0
+
+        # Largest full cuboid of at most `count` packages in the space, filled
+        # along the length first, then the width, then the height
+        length, width, height = orientation
+        x, y, z = position
+        if self.occupancy_resolution is None:
+            _, _, _, al, aw, ah = self.available_spaces[uld.id][space_index]
+        else:
+            # The free-space list is not maintained on a grid, bound the block by the ULD
+            al, aw, ah = (d - p for d, p in zip(uld.dimensions, position))
+        a = int(min(al // length, count))
+        b = int(min(aw // width, count // a))
+        c = int(min(ah // height, count // (a * b)))
+
+        if self.occupancy_resolution is not None:
+            # The grid does not bound the free space around the position, shrink the
+            # block until it is free (a single package is)
+            grid = self._occupancy_grid(uld)
+            while a * b * c > 1 and not grid.is_free(x, y, z, a * length, b * width, c * height):
+                if c > 1:
+                    c -= 1
+                elif b > 1:
+                    b -= 1
+                else:
+                    a -= 1
+        n_block = a * b * c
+
+        for k in range(c):
+            for j in range(b):
+                for i in range(a):
+                    block_package = packages[k * a * b + j * a + i]
+                    self.packed_positions.append(
+                        (
+                            block_package.id,
+                            uld.id,
+                            x + i * length,
+                            y + j * width,
+                            z + k * height,
+                            orientation[0],
+                            orientation[1],
+                            orientation[2],
+                        )
+                    )
+                    block_package.rotation = np.array(orientation)
+                    self.packed_packages.append(block_package)
+
+        uld.current_weight += n_block * package.weight
+        uld.current_vol_occupied += n_block * package.volume
+        if package.is_priority:
+            self.prio_ulds[uld.id] = True
+
+        self._update_available_spaces(
+            uld, position, (a * length, b * width, c * height), package, space_index
+        )
+        if self.counters.enabled:
+            self.counters.add("block_packages", n_block)
+        return n_block
+
+    def _pack_groups(
+        self,
+        packages: List[Package],
+        ulds,
+        space_find_policy: str,
+        orientation_choose_policy: str,
+    ) -> int:
+        """
+        Packs packages as blocks of identical packages, see _try_pack_block.
+        Packages that fit in no ULD are added to the unpacked packages.
+
+        :param packages: The packages, in packing order.
+        :param ulds: The ULDs to try, in order, or a function of no arguments returning them,
+                     called before packing each block.
+        :param space_find_policy: Policy to determine how to find available space (first_find, etc...).
+        :param orientation_choose_policy: The policy to determine which orientation is chosen in the space.
+        :return: The number of packages packed.
+        """
+        n_packs = 0
+        for group in self._group_identical_packages(packages):
+            while group:
+                n_block = 0
+                for uld in (ulds() if callable(ulds) else ulds):
+                    n_block = self._try_pack_block(
+                        group, uld, space_find_policy, orientation_choose_policy
+                    )
+                    if n_block > 0:
+                        if __debug__ and self.tracer.debug:
+                            self.tracer.emit(DEBUG, "packed_block", package=group[0].id, uld=uld.id,
+                                             priority=group[0].is_priority, size=n_block)
+                        break
+                if n_block == 0:
+                    # The packages are identical, if the first fits nowhere none does
+                    self.unpacked_packages.extend(group)
+                    break
+                n_packs += n_block
+                group = group[n_block:]
+        return n_packs
+
+    def validate_packing(self, method: str = "grid") -> Tuple[bool, List[str]]:
         """
         Validates the packing performed
         Checks for package overlaps and package out of boundaries
 
+        With the 'grid' method, the packages of each ULD are drawn on an exact
+        coordinate-compressed OccupancyGrid and only the packages covering a cell
+        twice are compared pairwise. 'pairwise' compares every pair of packages.
+        Both report the same errors, in the same order. ULDs with few packages
+        (MIN_GRID_VALIDATION_PACKAGES) or whose grid would exceed
+        MAX_VALIDATION_CELLS cells are compared pairwise.
+
+        :param method: 'grid' or 'pairwise'.
         :return: Whether packing is valid. If not, also return list of errors
         """
+        if method not in ("grid", "pairwise"):
+            raise RuntimeError(f"Invalid validation method {method}")
+
         validation_errors = []
+        packages = {pkg.id: pkg for pkg in self.packages}
 
         # Check each ULD for validity
         for uld in self.ulds:
@@ -287,64 +550,66 @@ class ULDPackerBase:
             if uld.current_weight > uld.weight_limit:
                 validation_errors.append(f"ULD {uld.id} exceeds weight limit!")
 
+            positions = [position for position in self.packed_positions if position[1] == uld.id]
+            boxes = [position[2:] for position in positions]
+
+            # Packages that may overlap others, all of them when compared pairwise
+            suspects = [True] * len(positions)
+            if (
+                method == "grid"
+                and len(boxes) > MIN_GRID_VALIDATION_PACKAGES
+                and OccupancyGrid.n_cells(uld.dimensions, boxes) <= MAX_VALIDATION_CELLS
+            ):
+                grid = OccupancyGrid.compressed(uld.dimensions, boxes)
+                for box in boxes:
+                    grid.occupy(*box)
+                suspects = [grid.is_overlapping(*box) for box in boxes]
+
             # Check each packed position within the ULD
-            for (
-                package_id,
-                uld_id,
-                x,
-                y,
-                z,
-                length,
-                width,
-                height,
-            ) in self.packed_positions:
-                if uld.id == uld_id:
-                    # Retrieve the package
-                    package = next(pkg for pkg in self.packages if pkg.id == package_id)
-
-                    # Boundary check: Ensure package fits within ULD
-                    if (
-                        x + length > uld.dimensions[0]
-                        or y + width > uld.dimensions[1]
-                        or z + height > uld.dimensions[2]
-                    ):
-                        validation_errors.append(
-                            f"Package {package.id} in ULD {uld.id} extends beyond ULD boundaries!"
-                        )
+            for (package_id, uld_id, x, y, z, length, width, height), suspect in zip(positions, suspects):
+                # Retrieve the package
+                package = packages[package_id]
+
+                # Boundary check: Ensure package fits within ULD
+                if (
+                    x + length > uld.dimensions[0]
+                    or y + width > uld.dimensions[1]
+                    or z + height > uld.dimensions[2]
+                ):
+                    validation_errors.append(
+                        f"Package {package.id} in ULD {uld.id} extends beyond ULD boundaries!"
+                    )
 
-                    # Check for overlap with other packages
-                    for (
-                        other_package_id,
-                        other_uld_id,
-                        other_x,
-                        other_y,
-                        other_z,
-                        other_length,
-                        other_width,
-                        other_height,
-                    ) in self.packed_positions:
-                        if (other_package_id != package.id) and (
-                            other_uld_id == uld_id
+                if not suspect:
+                    continue
+
+                # Check for overlap with other packages
+                for (
+                    other_package_id,
+                    other_uld_id,
+                    other_x,
+                    other_y,
+                    other_z,
+                    other_length,
+                    other_width,
+                    other_height,
+                ), other_suspect in zip(positions, suspects):
+                    if other_suspect and other_package_id != package.id:
+                        other_package = packages[other_package_id]
+
+                        # Check for overlap (if packages share space)
+                        if not (
+                            x + length <= other_x
+                            or x >= other_x + other_length
+                            or y + width <= other_y
+                            or y >= other_y + other_width
+                            or z + height <= other_z
+                            or z >= other_z + other_height
                         ):
-                            other_package = next(
-                                pkg
-                                for pkg in self.packages
-                                if pkg.id == other_package_id
+                            validation_errors.append(
+                                f"Package {package.id} overlaps with Package {other_package.id} in ULD {uld.id}!"
                             )
 
-                            # Check for overlap (if packages share space)
-                            if not (
-                                x + length <= other_x
-                                or x >= other_x + other_length
-                                or y + width <= other_y
-                                or y >= other_y + other_width
-                                or z + height <= other_z
-                                or z >= other_z + other_height
-                            ):
-                                validation_errors.append(
-                                    f"Package {package.id} overlaps with Package {other_package.id} in ULD {uld.id}!"
-                                )
-
         # Return validation status and any errors found
         is_valid = len(validation_errors) == 0
         return is_valid, validation_errors
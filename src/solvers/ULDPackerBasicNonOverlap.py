@@ -27,6 +27,18 @@ class ULDPackerBasicNonOverlap(ULDPackerBase):
     def _find_available_space(
         self, uld: ULD, package: Package, orientation: Tuple[int], policy: str
     ) -> Tuple[bool, np.ndarray]:
+        negative_fits = self.negative_fits[uld.id]
+        if negative_fits.rejects(package.dimensions):
+            if self.counters.enabled:
+                self.counters.add("negative_fit_hits")
+            return False, None, -1
+
+        if self.occupancy_resolution is not None:
+            found = self._find_in_occupancy_grid(uld, package.dimensions, policy)
+            if not found[0]:
+                negative_fits.add(package.dimensions)
+            return found
+
         length, width, height = package.dimensions
         best_position = None
         best_idx = None
@@ -45,7 +57,9 @@ class ULDPackerBasicNonOverlap(ULDPackerBase):
             best_surface_area = 0
             best_volume = 0
 
+        scanned = 0
         for idx, area in enumerate(self.available_spaces[uld.id]):
+            scanned += 1
             x, y, z, al, aw, ah = area
             if length <= al and width <= aw and height <= ah:
                 if policy == "first_find":
@@ -103,13 +117,23 @@ class ULDPackerBasicNonOverlap(ULDPackerBase):
                         best_position = np.array([x, y, z])
                         best_idx = idx
 
+        if self.counters.enabled:
+            self.counters.add("orientation_attempts")
+            self.counters.add("spaces_scanned", scanned)
+            self.counters.add("fit_checks", scanned)
+
         if best_position is not None:
             return True, best_position, best_idx
+        negative_fits.add(package.dimensions)
         return False, None, -1
 
     def _update_available_spaces(
         self, uld: ULD, position: np.ndarray, orientation: np.ndarray, package: Package, space_index: int
     ):
+        if self.occupancy_resolution is not None:
+            self._occupy_in_grid(uld, position, orientation)
+            return
+
         length, width, height = orientation
         x, y, z = position
 
@@ -158,27 +182,34 @@ class ULDPackerBasicNonOverlap(ULDPackerBase):
 
         self.available_spaces[uld.id].pop(space_index)
 
-    def pack(self):
-        priority_packages = sorted(
-            [pkg for pkg in self.packages if pkg.is_priority],
-            key=lambda p: p.delay_cost,
-            reverse=True,
-        )
-        economy_packages = sorted(
-            [pkg for pkg in self.packages if not pkg.is_priority],
-            key=lambda p: p.delay_cost,
-            reverse=True,
-        )
+        if self.counters.enabled:
+            self.counters.add("placements")
+            self.counters.add("spaces_created", 3)
+            self.counters.peak("peak_free_spaces", uld.id, len(self.available_spaces[uld.id]))
 
-        # First pass - initial packing
-        for package in priority_packages + economy_packages:
-            packed = False
-            for uld in self.ulds:
-                if self._try_pack_package(package, uld, space_find_policy="first_find", orientation_choose_policy="no_rot"):
-                    packed = True
-                    break
-            if not packed:
-                self.unpacked_packages.append(package)
+    def pack(self):
+        with self.timings.phase("sort"):
+            priority_packages = sorted(
+                [pkg for pkg in self.packages if pkg.is_priority],
+                key=lambda p: p.delay_cost,
+                reverse=True,
+            )
+            economy_packages = sorted(
+                [pkg for pkg in self.packages if not pkg.is_priority],
+                key=lambda p: p.delay_cost,
+                reverse=True,
+            )
+
+        with self.timings.phase("pack"):
+            # First pass - initial packing
+            for package in priority_packages + economy_packages:
+                packed = False
+                for uld in self.ulds:
+                    if self._try_pack_package(package, uld, space_find_policy="first_find", orientation_choose_policy="no_rot"):
+                        packed = True
+                        break
+                if not packed:
+                    self.unpacked_packages.append(package)
 
         total_delay_cost = sum(pkg.delay_cost for pkg in self.unpacked_packages)
         priority_spread_cost = sum(
@@ -1,6 +1,7 @@
 from typing import List, Tuple
 from dataclass.ULD import ULD
 from dataclass.Package import Package
+from helpers.tracing import DEBUG
 import numpy as np
 
 from .ULDPackerBase import ULDPackerBase
@@ -48,6 +49,18 @@ class ULDPackerBasicOverlap(ULDPackerBase):
         :param policy: The policy for finding available space (first_find, min_volume, ...)
         :return: A tuple indicating whether space was found and the coordinates of the space.
         """
+        negative_fits = self.negative_fits[uld.id]
+        if negative_fits.rejects(orientation):
+            if self.counters.enabled:
+                self.counters.add("negative_fit_hits")
+            return False, None, -1
+
+        if self.occupancy_resolution is not None:
+            found = self._find_in_occupancy_grid(uld, orientation, policy)
+            if not found[0]:
+                negative_fits.add(orientation)
+            return found
+
         length, width, height = orientation
         best_position = None
         best_idx = None
@@ -66,7 +79,9 @@ class ULDPackerBasicOverlap(ULDPackerBase):
             best_surface_area = 0
             best_volume = 0
 
+        scanned = 0
         for idx, area in enumerate(self.available_spaces[uld.id]):
+            scanned += 1
             x, y, z, al, aw, ah = area
             if length <= al and width <= aw and height <= ah:
                 if policy == "first_find":
@@ -124,8 +139,14 @@ class ULDPackerBasicOverlap(ULDPackerBase):
                         best_position = np.array([x, y, z])
                         best_idx = idx
 
+        if self.counters.enabled:
+            self.counters.add("orientation_attempts")
+            self.counters.add("spaces_scanned", scanned)
+            self.counters.add("fit_checks", scanned)
+
         if best_position is not None:
             return True, best_position, best_idx
+        negative_fits.add(orientation)
         return False, None, -1
 
     def _update_available_spaces(
@@ -136,11 +157,17 @@ class ULDPackerBasicOverlap(ULDPackerBase):
         package: Package,
         space_index: int,
     ):
+        if self.occupancy_resolution is not None:
+            self._occupy_in_grid(uld, position, orientation)
+            return
+
         length, width, height = orientation
         x, y, z = position
 
         # New spaces after the space is cut
         updated_spaces = []
+        n_spaces = len(self.available_spaces[uld.id])
+        n_untouched = 0
         for space in self.available_spaces[uld.id]:
             ax, ay, az, al, aw, ah = space
 
@@ -188,30 +215,51 @@ class ULDPackerBasicOverlap(ULDPackerBase):
 
             else:
                 updated_spaces.append(space)
+                n_untouched += 1
 
         self.available_spaces[uld.id] = updated_spaces
 
+        if self.counters.enabled:
+            # Every space hit by the package is cut into up to 6 subspaces,
+            # the ones that are empty or too small are pruned
+            n_cut = n_spaces - n_untouched
+            self.counters.add("placements")
+            self.counters.add("spaces_created", len(updated_spaces) - n_untouched)
+            self.counters.add("spaces_pruned", 6 * n_cut - (len(updated_spaces) - n_untouched))
+            self.counters.peak("peak_free_spaces", uld.id, len(updated_spaces))
+
     def pack(self):
         n_packs = 0
 
         self.minimum_dimension = min([np.min(p.dimensions) for p in self.packages])
 
-        for package in self.packages:
-            packed = False
-            for uld in self.ulds:
-                can_fit = self._try_pack_package(
-                    package,
-                    uld,
+        with self.timings.phase("pack"):
+            if self.block_placement:
+                n_packs = self._pack_groups(
+                    self.packages,
+                    self.ulds,
                     space_find_policy="first_find",
                     orientation_choose_policy="no_rot",
                 )
-                if can_fit:
-                    packed = True
-                    n_packs += 1
-                    print(f"Packed Priority {package.id} in {uld.id}, {n_packs}")
-                    break
-            if not packed:
-                self.unpacked_packages.append(package)
+            else:
+                for package in self.packages:
+                    packed = False
+                    for uld in self.ulds:
+                        can_fit = self._try_pack_package(
+                            package,
+                            uld,
+                            space_find_policy="first_find",
+                            orientation_choose_policy="no_rot",
+                        )
+                        if can_fit:
+                            packed = True
+                            n_packs += 1
+                            if __debug__ and self.tracer.debug:
+                                self.tracer.emit(DEBUG, "packed", package=package.id, uld=uld.id,
+                                                 priority=package.is_priority, n=n_packs)
+                            break
+                    if not packed:
+                        self.unpacked_packages.append(package)
 
         total_delay_cost = sum(pkg.delay_cost for pkg in self.unpacked_packages)
         priority_spread_cost = sum(
@@ -0,0 +1,435 @@
+import multiprocessing
+from itertools import permutations
+from typing import Dict, List, Tuple
+from dataclass.ULD import ULD
+from dataclass.Package import Package
+from helpers.tracing import DEBUG
+import numpy as np
+from .ULDPackerBase import PRIORITY_PENALTY
+from .ULDPackerBasicOverlap import ULDPackerBasicOverlap
+from .structures.BeamState import BeamState
+from .structures.FluidBound import FluidBound
+
+# Share of the free volume of a ULD the priority packages left are expected to fill
+PRIORITY_FILL = 0.85
+
+
+def _serve_replica(connection, instance: Tuple, shard: int, n_shards: int):
+    """
+    Keeps a replica of the beam in a worker process and scores the placements in its shard
+    of the ULDs. Every step, the candidates are sent, then the candidates kept are received
+    and the replica is expanded the same way as the beam of the main process. At the end,
+    the free spaces of the shard in the best packing are sent.
+
+    :param connection: End of the pipe to the main process.
+    :param instance: (ULD specs, packages in packing order, priority spread cost, minimum dimension).
+    :param shard: Index of the shard of the ULDs.
+    :param n_shards: Number of shards, one per process including the main one.
+    """
+    uld_specs, packages, priority_spread_cost, minimum_dimension = instance
+    replica = ULDPackerBeam([ULD(*spec) for spec in uld_specs], packages, priority_spread_cost)
+    replica._prepare(minimum_dimension, shard, n_shards)
+    left = FluidBound(packages)
+    beam = [replica._root()]
+    try:
+        for index, package in enumerate(packages):
+            left.remove(index, package)
+            connection.send(replica._score(beam, package, left))
+            selected = connection.recv()
+            beam = replica._expand([(beam[rank], candidate) for rank, candidate in selected], package, index)
+        best = beam[connection.recv()]
+        connection.send({uld_id: best.spaces[uld_id] for uld_id in replica._shard_ulds})
+    except (EOFError, BrokenPipeError):
+        # The main process stopped
+        pass
+    finally:
+        connection.close()
+
+
+class ULDPackerBeam(ULDPackerBasicOverlap):
+    """
+    A class for packing packages into ULDs with a beam search.
+
+    Packages are taken in the order of ULDPackerPreference (priority packages
+    by volume, then economy packages by delay cost). The search keeps the
+    `beam_width` best partial packings. Each step expands them by every
+    placement of the next package (every ULD and orientation, searched in the
+    free spaces of ULDPackerBasicOverlap) and by leaving it out, and keeps the
+    best candidates. Candidates are scored before their free spaces are cut,
+    so only the kept ones pay for it:
+
+        score = cost so far + estimated cost of the packages left
+
+    The estimate is the delay cost of the packages left that do not fit in the
+    free volume or weight of the ULDs filled as a fluid, densest first (see
+    FluidBound), plus the priority spread cost of the ULDs still needed by the
+    priority packages left, filled to PRIORITY_FILL. The estimate only depends
+    on the volume and weight packed, so ties are broken by the volume the
+    placement leaves unusable in its free space (see _dead_volume), then by the
+    order of the greedy choices. Only the best candidate is kept among those
+    leading to the same cost and volume and weight in every ULD, which would
+    be near-copies of one packing.
+
+    Partial packings are forked copy-on-write (see BeamState). If `n_workers`
+    > 1, the ULDs are split in shards between the main process and
+    `n_workers` - 1 worker processes, each keeping its own replica of the beam
+    (see _serve_replica) and searching the placements in its ULDs only. The
+    free spaces and negative fit caches of a ULD are only kept up to date in
+    the process of its shard, so cutting the free spaces is split too, and
+    only the candidates and the choices kept go through the pipes.
+    """
+
+    def __init__(
+        self,
+        ulds: List[ULD],
+        packages: List[Package],
+        priority_spread_cost: int,
+        max_passes: int = 1,
+        beam_width: int = 4,
+        n_workers: int = 1,
+    ):
+        """
+        Initializes the ULDPackerBeam instance.
+
+        :param ulds: List of ULDs available for packing.
+        :param packages: List of packages to be packed.
+        :param priority_spread_cost: Cost associated with spreading priority packages.
+        :param max_passes: Maximum number of packing passes (default is 1).
+        :param beam_width: Number of partial packings kept at every step. Time grows linearly with it.
+        :param n_workers: Number of processes searching the placements, the main process included.
+        """
+        super().__init__(
+            ulds,
+            packages,
+            priority_spread_cost,
+            max_passes,
+        )
+        if beam_width < 1:
+            raise RuntimeError(f"Invalid beam width {beam_width}")
+        self.beam_width = beam_width
+        self.n_workers = n_workers
+
+    def _order(self) -> List[Package]:
+        """
+        :return: The packages in packing order.
+        """
+        priority_packages = sorted(
+            [pkg for pkg in self.packages if pkg.is_priority],
+            key=lambda p: p.volume,
+            reverse=True,
+        )
+        economy_packages = sorted(
+            [pkg for pkg in self.packages if not pkg.is_priority],
+            key=lambda p: p.delay_cost ** 2 / p.volume,
+            reverse=True,
+        )
+        return priority_packages + economy_packages
+
+    def _candidates(self, state: BeamState, package: Package, left: FluidBound) -> List[Tuple]:
+        """
+        Scores the placements of a package from a partial packing in the ULDs of the shard, and
+        leaving it out in the first shard. Ranks are the same whatever the shards.
+
+        :param state: The partial packing.
+        :param package: The package.
+        :param left: Bound of the cost of the packages after it.
+        :return: Candidates as (score, dead volume, rank, ULD ID, position, orientation, space index),
+                 with a None ULD ID for leaving the package out. See _dead_volume.
+        """
+        capacities = self._volumes
+        free_volume = sum(capacities[u] - state.volumes[u] for u in capacities)
+        free_weight = sum(self._weight_limits[u] - state.weights[u] for u in capacities)
+
+        def estimate(uld_id, volume, weight, prio_ulds):
+            # Cost to go after packing the given volume and weight in a ULD, or nothing if uld_id is None
+            lost = left.lost(free_volume - volume, free_weight - weight)
+            return lost + self._spread_to_go(state, uld_id, volume, prio_ulds, left.priority_volume)
+
+        # Same ULD order as ULDPackerPreference
+        if package.is_priority:
+            ulds = self._ulds_by_volume
+        else:
+            ulds = sorted(self.ulds, key=lambda u: 1 - state.volumes[u.id] / capacities[u.id])
+
+        self.available_spaces = state.spaces
+        self.negative_fits = state.negative_fits
+        orientations = list(dict.fromkeys(permutations(package.dimensions.tolist())))
+
+        candidates = []
+        for uld_rank, uld in enumerate(ulds):
+            if uld.id not in self._shard_ulds or package.weight + state.weights[uld.id] > uld.weight_limit:
+                continue
+            prio_ulds = state.prio_ulds
+            score = state.cost
+            if package.is_priority and uld.id not in prio_ulds:
+                prio_ulds = prio_ulds | {uld.id}
+                score += self.priority_spread_cost
+            score += estimate(uld.id, package.volume, package.weight, prio_ulds)
+            for orientation_rank, orientation in enumerate(orientations):
+                can_fit, position, space_index = self._find_available_space(uld, package, orientation, "first_find")
+                if can_fit:
+                    dead = self._dead_volume(state.spaces[uld.id][space_index][3:], orientation)
+                    rank = uld_rank * len(orientations) + orientation_rank
+                    candidates.append((score, dead, rank, uld.id, tuple(position.tolist()), orientation, space_index))
+
+        if self._shard == 0:
+            left_out = PRIORITY_PENALTY if package.is_priority else package.delay_cost
+            score = state.cost + left_out + estimate(None, 0, 0, state.prio_ulds)
+            candidates.append((score, 0, len(ulds) * len(orientations), None, None, None, -1))
+        return candidates
+
+    def _dead_volume(self, space_dimensions, orientation) -> int:
+        """
+        Volume of a free space that no package can use once a package is placed at its corner:
+        the slabs beside the package thinner than the smallest package dimension.
+
+        :param space_dimensions: Dimensions of the free space.
+        :param orientation: Dimensions of the package.
+        :return: The dead volume.
+        """
+        # Points of the space beyond the package along an axis with a thick slab are usable,
+        # the others, but the package, are dead
+        box = 1
+        for space_side, side in zip(space_dimensions, orientation):
+            box *= side if space_side - side >= self.minimum_dimension else space_side
+        return int(box - np.prod(orientation))
+
+    def _spread_to_go(self, state: BeamState, uld_id, volume: int, prio_ulds, priority_volume: int) -> int:
+        """
+        Priority spread cost of the ULDs the priority packages left still need, taking the
+        largest free volumes first, filled to PRIORITY_FILL.
+
+        :param state: The partial packing.
+        :param uld_id: ULD of the placement scored, None if the package is left out.
+        :param volume: Volume of the package placed.
+        :param prio_ulds: ULDs holding priority packages after the placement.
+        :param priority_volume: Volume of the priority packages left.
+        :return: The cost.
+        """
+        if priority_volume <= 0:
+            return 0
+        free = {u: self._volumes[u] - state.volumes[u] for u in self._volumes}
+        if uld_id is not None:
+            free[uld_id] -= volume
+        needed = priority_volume - PRIORITY_FILL * sum(free[u] for u in prio_ulds)
+        n_ulds = 0
+        for v in sorted((free[u] for u in free if u not in prio_ulds), reverse=True):
+            if needed <= 0:
+                break
+            needed -= PRIORITY_FILL * v
+            n_ulds += 1
+        return n_ulds * self.priority_spread_cost
+
+    def _signature(self, state: BeamState, candidate: Tuple, package: Package) -> Tuple:
+        """
+        :return: Cost, priority ULDs and volume and weight packed in every ULD after a candidate.
+        """
+        uld_id = candidate[3]
+        volumes = dict(state.volumes)
+        weights = dict(state.weights)
+        prio_ulds = state.prio_ulds
+        cost = state.cost
+        if uld_id is None:
+            cost += PRIORITY_PENALTY if package.is_priority else package.delay_cost
+        else:
+            volumes[uld_id] += package.volume
+            weights[uld_id] += package.weight
+            if package.is_priority and uld_id not in prio_ulds:
+                prio_ulds = prio_ulds | {uld_id}
+                cost += self.priority_spread_cost
+        return cost, prio_ulds, tuple(volumes.values()), tuple(weights.values())
+
+    def _expand(self, selected: List[Tuple], package: Package, index: int) -> List[BeamState]:
+        """
+        Forks the partial packings of the selected candidates and cuts their free spaces.
+
+        :param selected: Candidates as (parent state, candidate), see _candidates.
+        :param package: The package placed.
+        :param index: Index of the package in packing order.
+        :return: The new partial packings.
+        """
+        children = []
+        for state, (_, _, _, uld_id, position, orientation, space_index) in selected:
+            child = state.fork((index, uld_id, position, orientation))
+            if uld_id is None:
+                child.cost += PRIORITY_PENALTY if package.is_priority else package.delay_cost
+            else:
+                child.weights[uld_id] += package.weight
+                child.volumes[uld_id] += package.volume
+                if package.is_priority and uld_id not in child.prio_ulds:
+                    child.prio_ulds = child.prio_ulds | {uld_id}
+                    child.cost += self.priority_spread_cost
+                if uld_id in self._shard_ulds:
+                    self.available_spaces = child.spaces
+                    self._update_available_spaces(self._uld_by_id[uld_id], position, orientation, package, space_index)
+            children.append(child)
+
+        if self.counters.enabled:
+            self.counters.add("beam_expansions", len(children))
+        return children
+
+    def _score(self, beam: List[BeamState], package: Package, left: FluidBound) -> List[Tuple]:
+        """
+        Scores the candidates of every state of the beam in the ULDs of the shard.
+
+        :param beam: The partial packings.
+        :param package: The package placed.
+        :param left: Bound of the cost of the packages after it.
+        :return: Candidates as (state rank, candidate), see _candidates.
+        """
+        return [
+            (state_rank, candidate)
+            for state_rank, state in enumerate(beam)
+            for candidate in self._candidates(state, package, left)
+        ]
+
+    def _root(self) -> BeamState:
+        """
+        :return: The empty partial packing.
+        """
+        return BeamState(
+            None,
+            None,
+            {u.id: 0 for u in self.ulds},
+            {u.id: 0 for u in self.ulds},
+            dict(self.available_spaces),
+            dict(self.negative_fits),
+            frozenset(),
+            0,
+        )
+
+    def _search(self, packages: List[Package], connections: List) -> BeamState:
+        """
+        Runs the beam search.
+
+        :param packages: The packages in packing order.
+        :param connections: Pipes to the worker processes searching the other shards of the ULDs.
+        :return: The best complete packing.
+        """
+        # Packages after the one placed
+        left = FluidBound(packages)
+
+        beam = [self._root()]
+        for index, package in enumerate(packages):
+            left.remove(index, package)
+            scored = self._score(beam, package, left)
+            for connection in connections:
+                scored.extend(connection.recv())
+            candidates = [
+                ((candidate[0], candidate[1], state_rank, candidate[2]), state_rank, candidate)
+                for state_rank, candidate in scored
+            ]
+            if self.counters.enabled:
+                self.counters.add("beam_candidates", len(candidates))
+
+            # Placements in the same ULD from equal states lead to near-copies, which would fill
+            # the beam with one packing, so only one candidate is kept per packed volume and weight
+            candidates.sort(key=lambda c: c[0])
+            best, seen = [], set()
+            for c in candidates:
+                signature = self._signature(beam[c[1]], c[2], package)
+                if signature not in seen:
+                    seen.add(signature)
+                    best.append(c)
+                    if len(best) == self.beam_width:
+                        break
+            selected = [(state_rank, candidate) for _, state_rank, candidate in best]
+            # The workers expand their replicas while this process expands the beam
+            for connection in connections:
+                connection.send(selected)
+            beam = self._expand([(beam[state_rank], candidate) for state_rank, candidate in selected], package, index)
+            if __debug__ and self.tracer.debug:
+                self.tracer.emit(DEBUG, "beam_step", package=package.id, n=index + 1,
+                                 best=best[0][0][0], candidates=len(candidates))
+
+        best_rank = min(range(len(beam)), key=lambda state_rank: beam[state_rank].cost)
+        best = beam[best_rank]
+        for connection in connections:
+            connection.send(best_rank)
+            best.spaces.update(connection.recv())
+        return best
+
+    def _prepare(self, minimum_dimension, shard: int = 0, n_shards: int = 1):
+        """
+        Computes the data of the ULDs used by the search.
+
+        :param minimum_dimension: Smallest dimension of the packages.
+        :param shard: Index of the shard of the ULDs searched by this process.
+        :param n_shards: Number of shards.
+        """
+        self.minimum_dimension = minimum_dimension
+        self._shard = shard
+        self._shard_ulds = {u.id for i, u in enumerate(self.ulds) if i % n_shards == shard}
+        self._ulds_by_volume = sorted(self.ulds, key=lambda u: np.prod(u.dimensions), reverse=True)
+        self._uld_by_id = {u.id: u for u in self.ulds}
+        self._volumes: Dict[str, int] = {u.id: int(np.prod(u.dimensions)) for u in self.ulds}
+        self._weight_limits: Dict[str, int] = {u.id: u.weight_limit for u in self.ulds}
+
+    def pack(self):
+        """
+        Pack the packages into the ULDs with the best packing of the beam search.
+
+        :return: Tuple containing packed positions, packed packages,
+                    unpacked packages, priority ULDs, and total cost.
+        """
+        self._prepare(min([np.min(pkg.dimensions) for pkg in self.packages]), 0, max(self.n_workers, 1))
+
+        with self.timings.phase("sort"):
+            packages = self._order()
+
+        with self.timings.phase("search"):
+            instance = (
+                [(u.id, *u.dimensions.tolist(), u.weight_limit) for u in self.ulds],
+                packages,
+                self.priority_spread_cost,
+                self.minimum_dimension,
+            )
+            connections, workers = [], []
+            for shard in range(1, self.n_workers):
+                connection, worker_connection = multiprocessing.Pipe()
+                worker = multiprocessing.Process(
+                    target=_serve_replica, args=(worker_connection, instance, shard, self.n_workers), daemon=True
+                )
+                worker.start()
+                worker_connection.close()
+                connections.append(connection)
+                workers.append(worker)
+            try:
+                best = self._search(packages, connections)
+            finally:
+                for connection in connections:
+                    connection.close()
+                for worker in workers:
+                    worker.join()
+
+        # The best packing becomes the state of the packer
+        self.available_spaces = best.spaces
+        self.negative_fits = best.negative_fits
+        for index, uld_id, position, orientation in best.placements():
+            package = packages[index]
+            if uld_id is None:
+                self.unpacked_packages.append(package)
+                continue
+            uld = self._uld_by_id[uld_id]
+            x, y, z = position
+            self.packed_positions.append((package.id, uld_id, x, y, z, *orientation))
+            package.rotation = np.array(orientation)
+            self.packed_packages.append(package)
+            uld.current_weight += package.weight
+            uld.current_vol_occupied += package.volume
+            if package.is_priority:
+                self.prio_ulds[uld_id] = True
+
+        total_delay_cost = sum(pkg.delay_cost for pkg in self.unpacked_packages)
+        priority_spread_cost = sum(
+            [self.priority_spread_cost if is_prio_uld else 0 for is_prio_uld in self.prio_ulds.values()]
+        )
+        total_cost = total_delay_cost + priority_spread_cost
+
+        return (
+            self.packed_positions,
+            self.packed_packages,
+            self.unpacked_packages,
+            self.prio_ulds,
+            total_cost,
+        )
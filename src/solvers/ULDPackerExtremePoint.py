@@ -0,0 +1,263 @@
+from itertools import permutations
+from typing import List, Tuple
+from dataclass.ULD import ULD
+from dataclass.Package import Package
+from helpers.tracing import DEBUG
+import numpy as np
+from .ULDPackerBase import ULDPackerBase
+from .structures.ExtremePointSet import ExtremePointSet
+from .structures.UniformGrid import UniformGrid
+
+
+class ULDPackerExtremePoint(ULDPackerBase):
+    """
+    A class for packing packages into ULDs at extreme points.
+
+    Instead of maintaining the free spaces, every ULD keeps the positions a
+    package can be placed at: the corners of the placed packages, projected
+    towards the origin onto the nearest package or wall. Each placement adds
+    at most six points, so the candidates grow linearly with the packages.
+    Collisions are checked against the placed packages near the candidate
+    through a uniform grid.
+    """
+
+    def __init__(
+        self,
+        ulds: List[ULD],
+        packages: List[Package],
+        priority_spread_cost: int,
+        max_passes: int = 1,
+        orientation_choose_policy: str = "first_find",
+        cell_size: int = None,
+    ):
+        """
+        Initializes the ULDPackerExtremePoint instance.
+
+        :param ulds: List of ULDs available for packing.
+        :param packages: List of packages to be packed.
+        :param priority_spread_cost: Cost associated with spreading priority packages.
+        :param max_passes: Maximum number of packing passes (default is 1).
+        :param orientation_choose_policy: 'first_find' tries every orientation of a package
+                                          at each point, 'no_rot' only its given dimensions.
+        :param cell_size: Side of the grid cells. Defaults to the median side of the packages.
+        """
+        super().__init__(
+            ulds,
+            packages,
+            priority_spread_cost,
+            max_passes,
+        )
+        if orientation_choose_policy not in ("first_find", "no_rot"):
+            raise RuntimeError(f"Invalid orientation choose policy {orientation_choose_policy}")
+        self.orientation_choose_policy = orientation_choose_policy
+        self.cell_size = cell_size
+        self.extreme_points = {}
+        self.grids = {}
+
+    def _orientations(self, package: Package) -> List[Tuple]:
+        """
+        :return: The distinct orientations of a package to try, as allowed by the policy.
+        """
+        if self.orientation_choose_policy == "no_rot":
+            return [tuple(package.dimensions.tolist())]
+        return list(dict.fromkeys(permutations(package.dimensions.tolist())))
+
+    def _add_extreme_point(self, uld: ULD, x, y, z):
+        """
+        Adds a point with its residual space, unless no package fits there
+        (inside a package, or less free space than the smallest side along an axis).
+        """
+        grid = self.grids[uld.id]
+        if grid.contains_point(x, y, z):
+            return
+        point = (x, y, z)
+        residual = []
+        for axis in range(3):
+            if uld.dimensions[axis] - point[axis] < self.minimum_dimension:
+                return
+            residual.append(grid.project_forward(point, axis, uld.dimensions[axis]) - point[axis])
+            if residual[axis] < self.minimum_dimension:
+                return
+        self.extreme_points[uld.id].add(x, y, z, tuple(residual))
+
+    def _try_place(self, package: Package, uld: ULD):
+        """
+        Finds the lowest extreme point where the package fits.
+
+        :param package: The package to place.
+        :param uld: The ULD to place it in.
+        :return: The position and orientation, or (None, None) if it does not fit.
+        """
+        if package.weight + uld.current_weight > uld.weight_limit:
+            if self.counters.enabled:
+                self.counters.add("failed_uld_attempts")
+            return None, None
+
+        # Failures are only remembered until the next placement in the ULD, as
+        # a placement adds extreme points where larger packages may fit
+        negative_fits = self.negative_fits[uld.id]
+        if (
+            negative_fits.rejects_all_rotations(package.dimensions)
+            if self.orientation_choose_policy == "first_find"
+            else negative_fits.rejects(package.dimensions)
+        ):
+            if self.counters.enabled:
+                self.counters.add("negative_fit_hits")
+                self.counters.add("failed_uld_attempts")
+            return None, None
+
+        grid = self.grids[uld.id]
+        points = self.extreme_points[uld.id]
+        orientations = self._orientations(package)
+        scanned = 0
+        fit_checks = 0
+        result = (None, None)
+
+        for x, y, z, (rl, rw, rh) in points:
+            scanned += 1
+            # Cheap reject on the residual space, before looking at the grid
+            if not any(length <= rl and width <= rw and height <= rh for length, width, height in orientations):
+                continue
+            # Points covered by a package placed since they were added are dropped here
+            if grid.contains_point(x, y, z):
+                points.remove(x, y, z)
+                continue
+            for length, width, height in orientations:
+                if length > rl or width > rw or height > rh:
+                    continue
+                fit_checks += 1
+                if not grid.collides(x, y, z, length, width, height):
+                    result = ((x, y, z), (length, width, height))
+                    break
+            if result[0] is not None:
+                break
+
+        if result[0] is None:
+            if self.orientation_choose_policy == "first_find":
+                negative_fits.add_all_rotations(package.dimensions)
+            else:
+                negative_fits.add(package.dimensions)
+
+        if self.counters.enabled:
+            self.counters.add("spaces_scanned", scanned)
+            self.counters.add("fit_checks", fit_checks)
+            self.counters.add("orientation_attempts", fit_checks)
+            if result[0] is None:
+                self.counters.add("failed_uld_attempts")
+        return result
+
+    def _place(self, package: Package, uld: ULD, position: Tuple, orientation: Tuple):
+        """
+        Places a package and adds the extreme points of its corners.
+
+        :param package: The package to place.
+        :param uld: The ULD to place it in.
+        :param position: Position of the package.
+        :param orientation: Dimensions of the package along the axes.
+        """
+        x, y, z = position
+        length, width, height = orientation
+        grid = self.grids[uld.id]
+        grid.insert(x, y, z, length, width, height)
+        self.extreme_points[uld.id].remove(x, y, z)
+        self.negative_fits[uld.id].clear()
+
+        # Each corner next to the package is projected along the two other axes
+        for corner, axis in (
+            ((x + length, y, z), 1), ((x + length, y, z), 2),
+            ((x, y + width, z), 0), ((x, y + width, z), 2),
+            ((x, y, z + height), 0), ((x, y, z + height), 1),
+        ):
+            point = list(corner)
+            point[axis] = grid.project(corner, axis)
+            self._add_extreme_point(uld, *point)
+
+        self.packed_positions.append((package.id, uld.id, x, y, z, length, width, height))
+        package.rotation = np.array(orientation)
+        self.packed_packages.append(package)
+        uld.current_weight += package.weight
+        uld.current_vol_occupied += package.volume
+        if package.is_priority:
+            self.prio_ulds[uld.id] = True
+
+        if self.counters.enabled:
+            self.counters.add("placements")
+            self.counters.peak("peak_free_spaces", uld.id, len(self.extreme_points[uld.id]))
+
+    def pack(self):
+        """
+        Pack the packages into the ULDs.
+
+        :return: Tuple containing packed positions, packed packages,
+                    unpacked packages, priority ULDs, and total cost.
+        """
+        n_packs = 0
+
+        with self.timings.phase("setup"):
+            self.minimum_dimension = min([np.min(pkg.dimensions) for pkg in self.packages])
+            cell_size = self.cell_size
+            if cell_size is None:
+                cell_size = max(1, int(np.median([pkg.dimensions for pkg in self.packages])))
+            ulds = sorted(self.ulds, key=lambda u: np.prod(u.dimensions), reverse=True)
+            for uld in ulds:
+                self.grids[uld.id] = UniformGrid(cell_size)
+                self.extreme_points[uld.id] = ExtremePointSet()
+                self._add_extreme_point(uld, 0, 0, 0)
+
+        with self.timings.phase("sort"):
+            priority_packages = sorted(
+                [pkg for pkg in self.packages if pkg.is_priority],
+                key=lambda p: (p.volume),
+                reverse=True,
+            )
+            economy_packages = sorted(
+                [pkg for pkg in self.packages if not pkg.is_priority],
+                key=lambda p: p.delay_cost / p.volume,
+                reverse=True,
+            )
+
+        for phase, packages in (("priority", priority_packages), ("economy", economy_packages)):
+            with self.timings.phase(phase):
+                for package in packages:
+                    packed = False
+                    for uld in ulds:
+                        position, orientation = self._try_place(package, uld)
+                        if position is not None:
+                            self._place(package, uld, position, orientation)
+                            packed = True
+                            n_packs += 1
+                            if __debug__ and self.tracer.debug:
+                                self.tracer.emit(DEBUG, "packed", package=package.id, uld=uld.id,
+                                                 priority=package.is_priority, n=n_packs)
+                            break
+                    if not packed:
+                        self.unpacked_packages.append(package)
+
+        total_delay_cost = sum(pkg.delay_cost for pkg in self.unpacked_packages)
+        priority_spread_cost = sum(
+            [self.priority_spread_cost if is_prio_uld else 0 for is_prio_uld in self.prio_ulds.values()]
+        )
+        total_cost = total_delay_cost + priority_spread_cost
+
+        return (
+            self.packed_positions,
+            self.packed_packages,
+            self.unpacked_packages,
+            self.prio_ulds,
+            total_cost,
+        )
+
+    def get_list_of_spaces(self, uld_id):
+        """
+        Free spaces are not tracked, the extreme points are listed instead as
+        the spaces from each point to the far corner of the ULD.
+
+        :param uld_id: ID of the ULD to retrieve spaces from.
+        :return: List of (x, y, z, length, width, height) tuples.
+        """
+        uld = next(u for u in self.ulds if u.id == uld_id)
+        length, width, height = uld.dimensions
+        return [
+            (x, y, z, length - x, width - y, height - z)
+            for x, y, z, _ in self.extreme_points.get(uld_id, [])
+        ]
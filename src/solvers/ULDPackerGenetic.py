@@ -0,0 +1,421 @@
+import json
+import logging
+import multiprocessing
+import time
+from itertools import permutations
+from typing import Dict, List, Tuple
+from dataclass.ULD import ULD
+from dataclass.Package import Package
+from helpers.tracing import DEBUG
+import numpy as np
+from .ULDPackerBase import PRIORITY_PENALTY
+from .ULDPackerBasicOverlap import ULDPackerBasicOverlap
+from .structures.PrefixCache import PrefixCache
+
+logger = logging.getLogger(__name__)
+
+# Space find policies chosen by the policy gene of a package
+SPACE_FIND_POLICIES = ("first_find", "origin_bias", "min_volume")
+
+# Number of orientations of a package, chosen from by its orientation gene
+N_ORIENTATIONS = 6
+
+# Exponent of the share of the packages drawn again by perturb_tail: the larger it is,
+# the later the tails start, and the longer the prefixes decoding resumes from
+TAIL_EXPONENT = 3
+
+# Estimated sizes of the packing states cached by the decoders, in bytes
+SNAPSHOT_BYTES = 1024
+SPACE_BYTES = 120
+POSITION_BYTES = 16
+
+# Instance and decoder cache of the worker processes, set once per process by _init_worker
+_worker_instance = None
+_worker_cache = None
+
+
+def _init_worker(instance: Tuple, cache_bytes: int):
+    """
+    Stores the instance in a worker process, so that only keys are sent per evaluation.
+    """
+    global _worker_instance, _worker_cache
+    _worker_instance = instance
+    _worker_cache = PrefixCache(cache_bytes) if cache_bytes > 0 else None
+
+
+def _evaluate_in_worker(keys: np.ndarray) -> float:
+    return evaluate(_worker_instance, keys, _worker_cache)
+
+
+def evaluate(instance: Tuple, keys: np.ndarray, cache: PrefixCache = None) -> float:
+    """
+    Decodes a chromosome on fresh ULDs and returns its fitness.
+
+    :param instance: (ULD specs, packages, priority spread cost), see ULDPackerGenetic.instance.
+    :param keys: The random keys of the chromosome.
+    :param cache: Cache of the decoder states of the instance, see ULDPackerGenetic.decode.
+    :return: Total cost of the plan, plus PRIORITY_PENALTY per priority package left out.
+    """
+    uld_specs, packages, priority_spread_cost = instance
+    ulds = [ULD(*spec) for spec in uld_specs]
+    decoder = ULDPackerGenetic(ulds, packages, priority_spread_cost)
+    _, _, unpacked_packages, _, total_cost = decoder.decode(keys, cache)
+    return total_cost + PRIORITY_PENALTY * sum(1 for pkg in unpacked_packages if pkg.is_priority)
+
+
+class ULDPackerGenetic(ULDPackerBasicOverlap):
+    """
+    A class for packing packages into ULDs with a biased random-key genetic algorithm (BRKGA).
+
+    A chromosome holds three random keys in [0, 1) per package: its rank in the
+    packing order (within its priority class, priority packages go first), the
+    orientation tried first and the space find policy. It is decoded by the
+    greedy placement loop of ULDPackerPreference on the free spaces of
+    ULDPackerBasicOverlap. The first chromosome encodes the greedy order of
+    ULDPackerPreference, so the result is never worse than that plan decoded.
+
+    Each generation keeps the elite chromosomes, adds random mutants and fills
+    the rest with children of an elite and a non-elite parent, taking each key
+    from the elite parent with probability `elite_bias`. Populations are
+    evaluated by a process pool, every worker holding the instance and a
+    PrefixCache of the packing states after the orders decoded before, so that
+    chromosomes starting with the same steps resume from the longest one.
+    """
+
+    def __init__(
+        self,
+        ulds: List[ULD],
+        packages: List[Package],
+        priority_spread_cost: int,
+        max_passes: int = 1,
+        population_size: int = 20,
+        generations: int = 10,
+        time_budget: float = None,
+        elite_fraction: float = 0.2,
+        mutant_fraction: float = 0.15,
+        perturbed_fraction: float = 0.2,
+        elite_bias: float = 0.7,
+        n_workers: int = 1,
+        seed: int = 0,
+        cache_bytes: int = 64 * 1024 * 1024,
+    ):
+        """
+        Initializes the ULDPackerGenetic instance.
+
+        :param ulds: List of ULDs available for packing.
+        :param packages: List of packages to be packed.
+        :param priority_spread_cost: Cost associated with spreading priority packages.
+        :param max_passes: Maximum number of packing passes (default is 1).
+        :param population_size: Number of chromosomes per generation.
+        :param generations: Maximum number of generations.
+        :param time_budget: Time in seconds after which no new generation is started. None for no limit.
+        :param elite_fraction: Share of the population kept as elite.
+        :param mutant_fraction: Share of the population replaced by random chromosomes.
+        :param perturbed_fraction: Share of the population replaced by elites with a new tail.
+        :param elite_bias: Probability of a child inheriting a key from its elite parent.
+        :param n_workers: Number of processes evaluating the population.
+        :param seed: Seed of the random keys.
+        :param cache_bytes: Memory bound of the decoder states cached by each process, 0 for no cache.
+        """
+        super().__init__(
+            ulds,
+            packages,
+            priority_spread_cost,
+            max_passes,
+        )
+        self.population_size = population_size
+        self.generations = generations
+        self.time_budget = time_budget
+        self.elite_fraction = elite_fraction
+        self.mutant_fraction = mutant_fraction
+        self.perturbed_fraction = perturbed_fraction
+        self.elite_bias = elite_bias
+        self.n_workers = n_workers
+        self.seed = seed
+        self.cache_bytes = cache_bytes
+        self.convergence: List[Dict] = []  # Best and mean fitness per generation
+
+    @property
+    def instance(self) -> Tuple:
+        """
+        The instance as sent to the workers: ULD specs, packages and priority spread cost.
+        """
+        return (
+            [(u.id, *u.dimensions.tolist(), u.weight_limit) for u in self.ulds],
+            self.packages,
+            self.priority_spread_cost,
+        )
+
+    def greedy_keys(self) -> np.ndarray:
+        """
+        Encodes the greedy plan of ULDPackerPreference: its packing order, the given
+        orientation first and the first_find policy.
+
+        :return: The random keys.
+        """
+        n = len(self.packages)
+        priority = sorted(
+            [i for i, pkg in enumerate(self.packages) if pkg.is_priority],
+            key=lambda i: self.packages[i].volume,
+            reverse=True,
+        )
+        economy = sorted(
+            [i for i, pkg in enumerate(self.packages) if not pkg.is_priority],
+            key=lambda i: self.packages[i].delay_cost ** 2 / self.packages[i].volume,
+            reverse=True,
+        )
+        keys = np.zeros(3 * n)
+        for rank, i in enumerate(priority + economy):
+            keys[i] = rank / n
+        return keys
+
+    def steps(self, keys: np.ndarray) -> List[Tuple[int, int, int]]:
+        """
+        Decodes the keys into packing steps: the index of a package, its first orientation
+        and its space find policy, in packing order.
+
+        :param keys: The random keys, 3 per package (order, orientation, policy).
+        :return: The steps.
+        """
+        n = len(self.packages)
+        order = sorted(range(n), key=lambda i: (not self.packages[i].is_priority, keys[i]))
+        return [
+            (
+                i,
+                int(keys[n + i] * N_ORIENTATIONS) % N_ORIENTATIONS,
+                int(keys[2 * n + i] * len(SPACE_FIND_POLICIES)) % len(SPACE_FIND_POLICIES),
+            )
+            for i in order
+        ]
+
+    def perturb_tail(self, keys: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """
+        Draws new keys for the packages after a random step of a chromosome, keeping them
+        after the packages before it. Both chromosomes start with the same steps, which
+        decoding with a PrefixCache does not repeat. The step is drawn near the end of
+        the order (see TAIL_EXPONENT), where steps are the most expensive to decode.
+
+        :param keys: The random keys.
+        :param rng: The random generator.
+        :return: The perturbed keys, as a (1, 3 x packages) array.
+        """
+        n = len(self.packages)
+        order = [i for i, _, _ in self.steps(keys)]
+        cut = n - 1 - int((n - 1) * rng.random() ** TAIL_EXPONENT) if n > 1 else 0
+
+        # Keys of the tail are drawn above the largest key of the prefix in their priority class
+        floor = {True: 0.0, False: 0.0}
+        for i in order[:cut]:
+            is_priority = self.packages[i].is_priority
+            floor[is_priority] = max(floor[is_priority], keys[i])
+
+        perturbed = keys.copy()
+        tail = np.array(order[cut:], dtype=np.int64)
+        floors = np.array([floor[self.packages[i].is_priority] for i in tail])
+        perturbed[tail] = floors + rng.random(len(tail)) * (1 - floors)
+        perturbed[n + tail] = rng.random(len(tail))
+        perturbed[2 * n + tail] = rng.random(len(tail))
+        return perturbed[np.newaxis]
+
+    def _snapshot(self, seconds: float) -> Tuple[Tuple, int]:
+        """
+        Copies the packing state. Free spaces are never modified in place, so they are shared.
+
+        :param seconds: Time taken to decode the state from the empty one.
+        :return: The state and its estimated size in bytes.
+        """
+        state = (
+            seconds,
+            [(u.current_weight, u.current_vol_occupied) for u in self.ulds],
+            {uld_id: list(spaces) for uld_id, spaces in self.available_spaces.items()},
+            {uld_id: (cache.oriented, cache.rotated) for uld_id, cache in self.negative_fits.items()},
+            list(self.packed_positions),
+            list(self.packed_packages),
+            list(self.unpacked_packages),
+            dict(self.prio_ulds),
+        )
+        n_spaces = sum(len(spaces) for spaces in self.available_spaces.values())
+        n_packages = len(self.packed_packages) + len(self.unpacked_packages)
+        return state, SNAPSHOT_BYTES + SPACE_BYTES * n_spaces + POSITION_BYTES * n_packages
+
+    def _restore(self, state: Tuple) -> float:
+        """
+        Resumes packing from a state of _snapshot.
+
+        :return: Time taken to decode the state from the empty one.
+        """
+        seconds, weights, spaces, negative_fits, positions, packed, unpacked, prio_ulds = state
+        for uld, (weight, volume) in zip(self.ulds, weights):
+            uld.current_weight, uld.current_vol_occupied = weight, volume
+        self.available_spaces = {uld_id: list(s) for uld_id, s in spaces.items()}
+        for uld_id, (oriented, rotated) in negative_fits.items():
+            self.negative_fits[uld_id].oriented = oriented
+            self.negative_fits[uld_id].rotated = rotated
+        self.packed_positions = list(positions)
+        self.packed_packages = list(packed)
+        self.unpacked_packages = list(unpacked)
+        self.prio_ulds = dict(prio_ulds)
+        return seconds
+
+    def decode(self, keys: np.ndarray, cache: PrefixCache = None):
+        """
+        Packs the packages as encoded by a chromosome.
+
+        With a cache, packing resumes from the state of the longest prefix of its steps
+        packed before, and the states at the checkpoints past it are cached, along with
+        the time taken to decode them. The rotations of the packages packed in the
+        cached prefix are then not set.
+
+        :param keys: The random keys, 3 per package (order, orientation, policy).
+        :param cache: Cache of the states after prefixes of steps, shared by the decoders of an instance.
+        :return: Same as pack.
+        """
+        self.minimum_dimension = min([np.min(pkg.dimensions) for pkg in self.packages])
+        steps = self.steps(keys)
+        by_volume = sorted(self.ulds, key=lambda u: np.prod(u.dimensions), reverse=True)
+
+        depth = 0
+        seconds = 0.0  # Time taken to decode the steps packed, from the empty state
+        checkpoint_seconds = 0.0
+        if cache is not None:
+            depth, state = cache.lookup(steps)
+            if state is not None:
+                seconds = checkpoint_seconds = self._restore(state)
+        if self.counters.enabled:
+            self.counters.add("steps_reused", depth)
+            self.counters.add("steps_decoded", len(steps) - depth)
+
+        for n_steps, (i, first, policy) in enumerate(steps[depth:], depth + 1):
+            start = time.perf_counter()
+            package = self.packages[i]
+            rotations = list(permutations(package.dimensions.tolist()))
+            rotations = rotations[first:] + rotations[:first]
+            policy = SPACE_FIND_POLICIES[policy]
+
+            if package.is_priority:
+                ulds = by_volume
+            else:
+                ulds = sorted(self.ulds, key=lambda u: (1 - u.current_vol_occupied / np.prod(u.dimensions)))
+
+            packed = False
+            for uld in ulds:
+                if package.weight + uld.current_weight > uld.weight_limit:
+                    continue
+                for orientation in rotations:
+                    can_fit, position, space_index = self._find_available_space(uld, package, orientation, policy)
+                    if can_fit:
+                        self._update_available_spaces(uld, position, orientation, package, space_index)
+                        x, y, z = position
+                        self.packed_positions.append((package.id, uld.id, x, y, z, *orientation))
+                        package.rotation = np.array(orientation)
+                        self.packed_packages.append(package)
+                        uld.current_weight += package.weight
+                        uld.current_vol_occupied += package.volume
+                        if package.is_priority:
+                            self.prio_ulds[uld.id] = True
+                        packed = True
+                        break
+                if packed:
+                    break
+            if not packed:
+                self.unpacked_packages.append(package)
+
+            seconds += time.perf_counter() - start
+            if cache is not None and cache.is_checkpoint(seconds - checkpoint_seconds) and n_steps < len(steps):
+                cache.store(steps, n_steps, *self._snapshot(seconds), seconds)
+                checkpoint_seconds = seconds
+
+        total_delay_cost = sum(pkg.delay_cost for pkg in self.unpacked_packages)
+        priority_spread_cost = sum(
+            [self.priority_spread_cost if is_prio_uld else 0 for is_prio_uld in self.prio_ulds.values()]
+        )
+        total_cost = total_delay_cost + priority_spread_cost
+
+        return (
+            self.packed_positions,
+            self.packed_packages,
+            self.unpacked_packages,
+            self.prio_ulds,
+            total_cost,
+        )
+
+    def _evolve(self, evaluate_all) -> np.ndarray:
+        """
+        Runs the genetic algorithm.
+
+        :param evaluate_all: Function returning the fitness of a list of chromosomes.
+        :return: The best chromosome.
+        """
+        rng = np.random.default_rng(self.seed)
+        n_keys = 3 * len(self.packages)
+        n_elite = max(1, int(self.elite_fraction * self.population_size))
+        n_mutants = int(self.mutant_fraction * self.population_size)
+        n_perturbed = int(self.perturbed_fraction * self.population_size)
+        n_children = max(0, self.population_size - n_elite - n_mutants - n_perturbed)
+
+        start = time.perf_counter()
+        population = rng.random((self.population_size, n_keys))
+        population[0] = self.greedy_keys()
+        fitness = np.array(evaluate_all(list(population)))
+
+        for generation in range(self.generations + 1):
+            ranking = np.argsort(fitness, kind="stable")
+            population, fitness = population[ranking], fitness[ranking]
+            elapsed = time.perf_counter() - start
+            self.convergence.append(
+                {"generation": generation, "elapsed": elapsed,
+                 "best": float(fitness[0]), "mean": float(fitness.mean())}
+            )
+            if __debug__ and self.tracer.debug:
+                self.tracer.emit(DEBUG, "generation", n=generation, best=float(fitness[0]))
+            logger.info(f"Generation {generation}: best {fitness[0]:.0f}, mean {fitness.mean():.0f}")
+
+            if generation == self.generations or (self.time_budget is not None and elapsed >= self.time_budget):
+                break
+
+            # Children of an elite and a non-elite parent, random mutants and perturbed elites
+            elite = population[rng.integers(0, n_elite, n_children)]
+            others = population[rng.integers(n_elite, self.population_size, n_children)]
+            children = np.where(rng.random((n_children, n_keys)) < self.elite_bias, elite, others)
+            perturbed = [self.perturb_tail(population[e], rng) for e in rng.integers(0, n_elite, n_perturbed)]
+            offspring = np.concatenate([children, rng.random((n_mutants, n_keys)), *perturbed])
+
+            population = np.concatenate([population[:n_elite], offspring])
+            fitness = np.concatenate([fitness[:n_elite], evaluate_all(list(offspring))])
+
+        return population[0]
+
+    def pack(self):
+        """
+        Pack the packages into the ULDs with the best plan found.
+
+        :return: Tuple containing packed positions, packed packages,
+                    unpacked packages, priority ULDs, and total cost.
+        """
+        instance = self.instance
+        with self.timings.phase("evolve"):
+            if self.n_workers > 1:
+                with multiprocessing.Pool(
+                    self.n_workers, initializer=_init_worker, initargs=(instance, self.cache_bytes)
+                ) as pool:
+                    best = self._evolve(lambda population: pool.map(_evaluate_in_worker, population))
+            else:
+                cache = PrefixCache(self.cache_bytes) if self.cache_bytes > 0 else None
+                best = self._evolve(lambda population: [evaluate(instance, keys, cache) for keys in population])
+                if cache is not None and self.counters.enabled:
+                    self.counters.add("prefix_cache_hits", cache.hits)
+                    self.counters.add("prefix_cache_misses", cache.misses)
+                    self.counters.add("steps_reused", cache.reused_steps)
+                    self.counters.add("decode_seconds_saved", cache.saved_seconds)
+
+        with self.timings.phase("decode"):
+            return self.decode(best)
+
+    def write_convergence(self, path: str):
+        """
+        Writes the best and mean fitness of every generation as JSON.
+
+        :param path: Path of the output file.
+        """
+        with open(path, "w") as file:
+            json.dump(self.convergence, file, indent=2)
@@ -0,0 +1,200 @@
+from itertools import permutations
+from typing import Dict, List, Tuple
+from dataclass.ULD import ULD
+from dataclass.Package import Package
+from helpers.tracing import DEBUG
+import numpy as np
+from .ULDPackerBase import ULDPackerBase
+from .structures.HeightMap import HeightMap
+
+
+class ULDPackerHeightMap(ULDPackerBase):
+    """
+    A class for packing packages into ULDs on height maps.
+
+    Every ULD keeps the height of the packages stacked on each cell of its
+    floor (see HeightMap). A package goes to the lowest position where it
+    rests on enough of its footprint (the support ratio), so packings are
+    stable by construction. Nothing is placed under an overhang.
+
+    A priority package left out costs more than any delay, so one that fits
+    nowhere with `min_support` is tried again with `priority_min_support`,
+    trading stability for a lower cost.
+    """
+
+    def __init__(
+        self,
+        ulds: List[ULD],
+        packages: List[Package],
+        priority_spread_cost: int,
+        max_passes: int = 1,
+        orientation_choose_policy: str = "first_find",
+        resolution: int = 5,
+        min_support: float = 0.75,
+        priority_min_support: float = 0.0,
+    ):
+        """
+        Initializes the ULDPackerHeightMap instance.
+
+        :param ulds: List of ULDs available for packing.
+        :param packages: List of packages to be packed.
+        :param priority_spread_cost: Cost associated with spreading priority packages.
+        :param max_passes: Maximum number of packing passes (default is 1).
+        :param orientation_choose_policy: 'first_find' uses the first orientation of a package
+                                          that fits, 'no_rot' only its given dimensions.
+        :param resolution: Side of the height map cells. Footprints are rounded up to whole cells.
+        :param min_support: Minimum share of the footprint of a package resting on packages or the floor.
+        :param priority_min_support: Minimum support ratio of the priority packages that fit nowhere
+                                     with min_support.
+        """
+        super().__init__(
+            ulds,
+            packages,
+            priority_spread_cost,
+            max_passes,
+        )
+        if orientation_choose_policy not in ("first_find", "no_rot"):
+            raise RuntimeError(f"Invalid orientation choose policy {orientation_choose_policy}")
+        self.orientation_choose_policy = orientation_choose_policy
+        self.resolution = resolution
+        self.min_support = min_support
+        self.priority_min_support = priority_min_support
+        self.height_maps: Dict[str, HeightMap] = {}
+        self.support_ratios: Dict[str, float] = {}  # Support ratio of every packed package
+
+    def _try_place(self, package: Package, uld: ULD, min_support: float):
+        """
+        Finds the position of a package in a ULD, trying its orientations in turn.
+
+        :param package: The package to place.
+        :param uld: The ULD to place it in.
+        :param min_support: Minimum support ratio of the package.
+        :return: The cell, rest height, support ratio and orientation, or None if it does not fit.
+        """
+        if package.weight + uld.current_weight > uld.weight_limit:
+            if self.counters.enabled:
+                self.counters.add("failed_uld_attempts")
+            return None
+
+        if self.orientation_choose_policy == "no_rot":
+            orientations = [tuple(package.dimensions.tolist())]
+        else:
+            orientations = list(dict.fromkeys(permutations(package.dimensions.tolist())))
+
+        height_map = self.height_maps[uld.id]
+        fit_checks = 0
+        result = None
+        for orientation in orientations:
+            fit_checks += 1
+            position = height_map.find_position(*orientation, min_support)
+            if position is not None:
+                result = (*position, orientation)
+                break
+
+        if self.counters.enabled:
+            self.counters.add("fit_checks", fit_checks)
+            self.counters.add("orientation_attempts", fit_checks)
+            if result is None:
+                self.counters.add("failed_uld_attempts")
+        return result
+
+    def _place(self, package: Package, uld: ULD, i: int, j: int, z: int, support: float, orientation: Tuple):
+        """
+        Places a package on the height map of a ULD.
+        """
+        length, width, height = orientation
+        height_map = self.height_maps[uld.id]
+        height_map.place(i, j, length, width, z + height)
+
+        x, y = i * height_map.resolution, j * height_map.resolution
+        self.packed_positions.append((package.id, uld.id, x, y, z, length, width, height))
+        self.support_ratios[package.id] = support
+        package.rotation = np.array(orientation)
+        self.packed_packages.append(package)
+        uld.current_weight += package.weight
+        uld.current_vol_occupied += package.volume
+        if package.is_priority:
+            self.prio_ulds[uld.id] = True
+
+        if self.counters.enabled:
+            self.counters.add("placements")
+
+    def pack(self):
+        """
+        Pack the packages into the ULDs.
+
+        :return: Tuple containing packed positions, packed packages,
+                    unpacked packages, priority ULDs, and total cost.
+        """
+        n_packs = 0
+
+        with self.timings.phase("setup"):
+            ulds = sorted(self.ulds, key=lambda u: np.prod(u.dimensions), reverse=True)
+            for uld in ulds:
+                self.height_maps[uld.id] = HeightMap(*uld.dimensions, self.resolution)
+
+        with self.timings.phase("sort"):
+            priority_packages = sorted(
+                [pkg for pkg in self.packages if pkg.is_priority],
+                key=lambda p: (p.volume),
+                reverse=True,
+            )
+            economy_packages = sorted(
+                [pkg for pkg in self.packages if not pkg.is_priority],
+                key=lambda p: p.delay_cost / p.volume,
+                reverse=True,
+            )
+
+        for phase, packages in (("priority", priority_packages), ("economy", economy_packages)):
+            with self.timings.phase(phase):
+                for package in packages:
+                    packed = False
+                    min_supports = [self.min_support]
+                    if package.is_priority and self.priority_min_support < self.min_support:
+                        min_supports.append(self.priority_min_support)
+                    for min_support in min_supports:
+                        for uld in ulds:
+                            placement = self._try_place(package, uld, min_support)
+                            if placement is not None:
+                                self._place(package, uld, *placement)
+                                packed = True
+                                n_packs += 1
+                                if __debug__ and self.tracer.debug:
+                                    self.tracer.emit(DEBUG, "packed", package=package.id, uld=uld.id,
+                                                     priority=package.is_priority, n=n_packs)
+                                break
+                        if packed:
+                            break
+                    if not packed:
+                        self.unpacked_packages.append(package)
+
+        total_delay_cost = sum(pkg.delay_cost for pkg in self.unpacked_packages)
+        priority_spread_cost = sum(
+            [self.priority_spread_cost if is_prio_uld else 0 for is_prio_uld in self.prio_ulds.values()]
+        )
+        total_cost = total_delay_cost + priority_spread_cost
+
+        return (
+            self.packed_positions,
+            self.packed_packages,
+            self.unpacked_packages,
+            self.prio_ulds,
+            total_cost,
+        )
+
+    def get_list_of_spaces(self, uld_id):
+        """
+        Free spaces are not tracked, the space above every cell of the height map is listed instead.
+
+        :param uld_id: ID of the ULD to retrieve spaces from.
+        :return: List of (x, y, z, length, width, height) tuples.
+        """
+        height_map = self.height_maps.get(uld_id)
+        if height_map is None:
+            return []
+        r = height_map.resolution
+        return [
+            (i * r, j * r, int(top), r, r, height_map.height - int(top))
+            for (i, j), top in np.ndenumerate(height_map.heights)
+            if top < height_map.height
+        ]
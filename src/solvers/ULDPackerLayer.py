@@ -0,0 +1,218 @@
+from typing import List, Optional, Tuple
+from dataclass.ULD import ULD
+from dataclass.Package import Package
+from helpers.tracing import DEBUG
+import numpy as np
+from .ULDPackerBase import ULDPackerBase
+from .structures.GuillotinePacker2D import GuillotinePacker2D
+
+
+class ULDPackerLayer(ULDPackerBase):
+    """
+    A class for packing packages into ULDs wall by wall.
+
+    Each ULD is filled from the front (x = 0) to the back with walls spanning its
+    whole cross-section (width x height). The depth of a wall is one of the sides
+    of the first remaining package, the one whose wall is the densest, and the
+    wall is filled by a 2D guillotine packing of the cross-section, with every
+    package standing with its largest side that fits the depth along the length.
+
+    Packages with the same sides and weight fail to fit together, so each wall
+    only tries every kind of package until it first fails, which keeps packing
+    loads of few kinds of packages close to linear in the number of packages.
+    """
+
+    def __init__(
+        self,
+        ulds: List[ULD],
+        packages: List[Package],
+        priority_spread_cost: int,
+        max_passes: int = 1,
+    ):
+        """
+        Initializes the ULDPackerLayer instance.
+
+        :param ulds: List of ULDs available for packing.
+        :param packages: List of packages to be packed.
+        :param priority_spread_cost: Cost associated with spreading priority packages.
+        :param max_passes: Maximum number of packing passes (default is 1).
+        """
+        super().__init__(
+            ulds,
+            packages,
+            priority_spread_cost,
+            max_passes,
+        )
+
+    @staticmethod
+    def _orient_for_depth(package: Package, depth: int) -> Optional[Tuple[int, int, int]]:
+        """
+        Orients a package for a wall, with its largest side not deeper than the wall along the length.
+
+        :param package: The package to orient.
+        :param depth: Depth of the wall.
+        :return: The sides (along the length, width, height), or None if no side fits the depth.
+        """
+        sides = sorted(package.dimensions.tolist(), reverse=True)
+        for i, side in enumerate(sides):
+            if side <= depth:
+                others = sides[:i] + sides[i + 1:]
+                return side, others[0], others[1]
+        return None
+
+    def _build_wall(self, uld: ULD, packages: List[Package], depth: int) -> Tuple[List[Tuple], int]:
+        """
+        Fills the cross-section of a ULD for a wall of the given depth, without placing anything.
+
+        :param uld: The ULD.
+        :param packages: The candidate packages, in packing order.
+        :param depth: Depth of the wall.
+        :return: The placements as (package, y, z, length, width, height) and their total volume.
+        """
+        packer = GuillotinePacker2D(uld.dimensions[1], uld.dimensions[2])
+        weight_left = uld.weight_limit - uld.current_weight
+        failed = set()
+        placements = []
+        volume = 0
+        fit_checks = 0
+
+        for package in packages:
+            if package.weight > weight_left:
+                continue
+            key = tuple(sorted(package.dimensions.tolist()))
+            if key in failed:
+                continue
+            sides = self._orient_for_depth(package, depth)
+            if sides is None:
+                failed.add(key)
+                continue
+
+            fit_checks += 1
+            length, width, height = sides
+            placed = packer.insert(width, height)
+            if placed is None:
+                failed.add(key)
+                continue
+
+            y, z, width, height = placed
+            placements.append((package, y, z, length, width, height))
+            volume += package.volume
+            weight_left -= package.weight
+            if packer.is_full():
+                break
+
+        if self.counters.enabled:
+            self.counters.add("fit_checks", fit_checks)
+        return placements, volume
+
+    def _fill_uld(self, uld: ULD, packages: List[Package]) -> List[Package]:
+        """
+        Fills a ULD with walls of packages.
+
+        :param uld: The ULD to fill.
+        :param packages: The packages left to pack, in packing order.
+        :return: The packages that were not packed.
+        """
+        uld_length, uld_width, uld_height = uld.dimensions
+        x = 0
+
+        while packages and x < uld_length:
+            # The first package that fits in the rest of the ULD decides the candidate depths
+            depths = []
+            for package in packages:
+                if package.weight + uld.current_weight > uld.weight_limit:
+                    continue
+                sides = package.dimensions.tolist()
+                for i, depth in enumerate(sides):
+                    others = sorted(sides[:i] + sides[i + 1:])
+                    if (
+                        depth <= uld_length - x
+                        and others[0] <= min(uld_width, uld_height)
+                        and others[1] <= max(uld_width, uld_height)
+                        and depth not in depths
+                    ):
+                        depths.append(depth)
+                if depths:
+                    break
+            if not depths:
+                break
+
+            # Keep the densest wall, the deepest on ties
+            best = None
+            for depth in sorted(depths, reverse=True):
+                placements, volume = self._build_wall(uld, packages, depth)
+                if self.counters.enabled:
+                    self.counters.add("wall_candidates")
+                if placements and (best is None or volume / depth > best[2] / best[0]):
+                    best = (depth, placements, volume)
+            if best is None:
+                break
+
+            depth, placements, _ = best
+            for package, y, z, length, width, height in placements:
+                self.packed_positions.append((package.id, uld.id, x, y, z, length, width, height))
+                package.rotation = np.array([length, width, height])
+                self.packed_packages.append(package)
+                uld.current_weight += package.weight
+                uld.current_vol_occupied += package.volume
+                if package.is_priority:
+                    self.prio_ulds[uld.id] = True
+
+            if __debug__ and self.tracer.debug:
+                self.tracer.emit(DEBUG, "wall", uld=uld.id, x=x, depth=depth, n=len(placements))
+            if self.counters.enabled:
+                self.counters.add("walls")
+                self.counters.add("placements", len(placements))
+
+            placed_ids = {id(package) for package, *_ in placements}
+            packages = [package for package in packages if id(package) not in placed_ids]
+            x += depth
+
+            # Only the space behind the last wall is tracked
+            self.available_spaces[uld.id] = (
+                [(x, 0, 0, uld_length - x, uld_width, uld_height)] if x < uld_length else []
+            )
+
+        return packages
+
+    def pack(self):
+        """
+        Pack the packages into the ULDs.
+
+        :return: Tuple containing packed positions, packed packages,
+                    unpacked packages, priority ULDs, and total cost.
+        """
+        with self.timings.phase("sort"):
+            # Priority packages first, so that they share as few ULDs as possible
+            priority_packages = sorted(
+                [pkg for pkg in self.packages if pkg.is_priority],
+                key=lambda p: (p.volume),
+                reverse=True,
+            )
+            economy_packages = sorted(
+                [pkg for pkg in self.packages if not pkg.is_priority],
+                key=lambda p: p.delay_cost / p.volume,
+                reverse=True,
+            )
+
+        with self.timings.phase("pack"):
+            remaining = priority_packages + economy_packages
+            for uld in sorted(self.ulds, key=lambda u: np.prod(u.dimensions), reverse=True):
+                if not remaining:
+                    break
+                remaining = self._fill_uld(uld, remaining)
+            self.unpacked_packages = remaining
+
+        total_delay_cost = sum(pkg.delay_cost for pkg in self.unpacked_packages)
+        priority_spread_cost = sum(
+            [self.priority_spread_cost if is_prio_uld else 0 for is_prio_uld in self.prio_ulds.values()]
+        )
+        total_cost = total_delay_cost + priority_spread_cost
+
+        return (
+            self.packed_positions,
+            self.packed_packages,
+            self.unpacked_packages,
+            self.prio_ulds,
+            total_cost,
+        )
@@ -1,9 +1,7 @@
-import logging
-logging.basicConfig(level=logging.INFO)
-
 from typing import List, Tuple
 from dataclass.ULD import ULD
 from dataclass.Package import Package
+from helpers.tracing import DEBUG
 import numpy as np
 from .ULDPackerTree import ULDPackerTree
 from .ULDPackerBase import ULDPackerBase
@@ -51,7 +49,7 @@ class ULDPackerMixedTree(ULDPackerTree):
         self.minimum_dimension = np.inf
 
         self.unpacked_packages = []
-        self.space_trees = [(SpaceTree(u, self.minimum_dimension), u) for u in ulds]
+        self.space_trees = [(SpaceTree(u, self.minimum_dimension, self.tracer), u) for u in ulds]
 
 
     def _insert_into_space(self, space_node, package, uld):
@@ -71,8 +69,8 @@ class ULDPackerMixedTree(ULDPackerTree):
                       space,
                       package,
                   )
-                  print(f"\n{space.node_id} is for {package.id}\n")
-                  print(f"Tree {uld.id}")
+                  if __debug__ and self.tracer.debug:
+                      self.tracer.emit(DEBUG, "space_chosen", node=space.node_id, package=package.id, uld=uld.id)
 
                   # # Use for debugging
                   # st.display_tree()
@@ -95,7 +93,7 @@ class ULDPackerMixedTree(ULDPackerTree):
         :return: Tuple containing packed positions, packed packages, unpacked packages, priority ULDs, and total cost.
         """
         self.minimum_dimension = min([np.min(pkg.dimensions) for pkg in self.packages])
-        self.space_trees = [(SpaceTree(u, self.minimum_dimension), u) for u in ulds]
+        self.space_trees = [(SpaceTree(u, self.minimum_dimension, self.tracer), u) for u in ulds]
 
         n_packs = 1
 
@@ -131,9 +129,8 @@ class ULDPackerMixedTree(ULDPackerTree):
                 if can_fit:
                     packed = True
                     n_packs += 1
-                    print(
-                        f"Packed Priority {package.id} in {uld.id}, {n_packs} "
-                    )
+                    if __debug__ and self.tracer.debug:
+                        self.tracer.emit(DEBUG, "packed", package=package.id, uld=uld.id, priority=True, n=n_packs)
                     self._insert_into_space(space_node, package, uld)
                     break
             if not packed:
@@ -145,7 +142,8 @@ class ULDPackerMixedTree(ULDPackerTree):
             if not packed:
                 self.unpacked_packages.append(package)
             else:
-                print(f"Packed Economy {package.id} in {uld.id}, {n_packs}")
+                if __debug__ and self.tracer.debug:
+                    self.tracer.emit(DEBUG, "packed", package=package.id, uld=uldid, priority=False, n=n_packs)
                 self.packed_positions.append(
                     (
                         package.id,
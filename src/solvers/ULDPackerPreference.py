@@ -1,13 +1,56 @@
-# import logging
-# logging.basicConfig(level=logging.INFO)
+import multiprocessing
+from itertools import combinations
 from sys import stderr
-from typing import List, Tuple
+from typing import List, Optional, Sequence, Tuple
 from dataclass.ULD import ULD
 from dataclass.Package import Package
+from helpers.tracing import DEBUG
 import numpy as np
 from .ULDPackerBasicOverlap import ULDPackerBasicOverlap
+from .structures.FluidBound import FluidBound
 SIZE_BOUND = 5000
 
+# Subsets of each size tested for the priority packages, largest first (see _select_priority_ulds)
+MAX_SUBSET_TESTS = 16
+
+# Instance of the worker processes testing subsets, set once per process by _init_worker
+_worker_instance = None
+
+
+def _init_worker(instance: Tuple):
+    """
+    Stores the instance in a worker process, so that only subsets are sent per test.
+    """
+    global _worker_instance
+    _worker_instance = instance
+
+
+def _pack_priority_in_worker(subset: Tuple[int]) -> Optional[int]:
+    return pack_priority(_worker_instance, subset)
+
+
+def pack_priority(instance: Tuple, subset: Sequence[int], every_orientation: bool = True) -> Optional[int]:
+    """
+    Packs the priority packages alone in fresh copies of a subset of the ULDs, as
+    ULDPackerPreference.pack packs them first.
+
+    :param instance: (ULD specs, sorted priority packages, minimum dimension, block placement,
+                     occupancy resolution), see ULDPackerPreference._select_priority_ulds.
+    :param subset: Indices of the ULDs.
+    :param every_orientation: Whether the packages are packed as in a subset, or as without one.
+    :return: Number of ULDs holding priority packages, None if some priority package was not packed.
+    """
+    uld_specs, priority_packages, minimum_dimension, block_placement, occupancy_resolution = instance
+    ulds = [ULD(*uld_specs[i]) for i in subset]
+    packer = ULDPackerPreference(ulds, priority_packages, 0)
+    packer.minimum_dimension = minimum_dimension
+    packer.block_placement = block_placement
+    packer.occupancy_resolution = occupancy_resolution
+    packer._pack_priority(priority_packages, ulds, every_orientation)
+    if len(packer.packed_packages) < len(priority_packages):
+        return None
+    return sum(1 for is_prio_uld in packer.prio_ulds.values() if is_prio_uld)
+
 
 class ULDPackerPreference(ULDPackerBasicOverlap):
     """
@@ -38,6 +81,11 @@ class ULDPackerPreference(ULDPackerBasicOverlap):
             priority_spread_cost,
             max_passes,
         )
+        # Pack the priority packages in the fewest ULDs found to hold them (see _select_priority_ulds)
+        self.priority_subset = False
+        self.n_workers = 1  # Processes testing the subsets of ULDs
+        # Leave out the economy packages that no ULD has the capacity for (see _select_economy)
+        self.economy_selection = False
 
     def pack(self):
         """
@@ -48,83 +96,316 @@ class ULDPackerPreference(ULDPackerBasicOverlap):
         """
         n_packs = 0
 
-        # Calculate minimum dimension of a Package
-        # Used in optimising empty space tracking
-        self.minimum_dimension = min([np.min(pkg.dimensions) for pkg in self.packages])
+        with self.timings.phase("sort"):
+            # Calculate minimum dimension of a Package
+            # Used in optimising empty space tracking
+            self.minimum_dimension = min([np.min(pkg.dimensions) for pkg in self.packages])
 
-        # Get priority packages (sort if required)
-        priority_packages = sorted(
-            [pkg for pkg in self.packages if pkg.is_priority],
-            key=lambda p: (p.volume),
-            reverse=True,
-        )
+            # Get priority packages (sort if required)
+            priority_packages = sorted(
+                [pkg for pkg in self.packages if pkg.is_priority],
+                key=lambda p: (p.volume),
+                reverse=True,
+            )
 
-        # Get economy packages (sort if required)
-        economy_packages = sorted(
-            [pkg for pkg in self.packages if not pkg.is_priority],
-            key=lambda p: (
-                (p.delay_cost)**(2) / (p.volume),
-            ),
-            reverse=True,
-        )
+            # Get economy packages (sort if required)
+            economy_packages = sorted(
+                [pkg for pkg in self.packages if not pkg.is_priority],
+                key=lambda p: (
+                    (p.delay_cost)**(2) / (p.volume),
+                ),
+                reverse=True,
+            )
+
+        # ULDs the priority packages may go to, all of them unless fewer are found to hold them
+        subset = None
+        if self.priority_subset and priority_packages:
+            with self.timings.phase("priority_subset"):
+                subset = self._select_priority_ulds(priority_packages)
+        priority_ulds = self.ulds if subset is None else subset
+
+        if self.block_placement:
+            return self._pack_blocks(priority_packages, economy_packages, priority_ulds, subset is not None)
+
+        with self.timings.phase("priority"):
+            # Pack the priority packages first
+            n_packs = self._pack_priority(priority_packages, priority_ulds, subset is not None)
 
-        # Pack the priority packages first
+        if self.economy_selection:
+            with self.timings.phase("economy_selection"):
+                economy_packages = self._select_economy(economy_packages)
+
+        with self.timings.phase("economy"):
+            ulds = sorted(
+                    self.ulds,
+                    key=lambda u: (1 - u.current_vol_occupied / np.prod(u.dimensions)),
+                    reverse=False,
+                )
+
+            # Pack the economy packages next
+            for package in economy_packages:
+                packed = False
+                ulds = list(filter(lambda u: (1 - u.current_weight / u.weight_limit) >= 49, ulds))
+                if len(ulds) < 1:
+                    ulds = sorted(
+                        self.ulds,
+                        key=lambda u: (1 - u.current_vol_occupied / np.prod(u.dimensions)),
+                        reverse=False,
+                    )
+                if self.economy_selection:
+                    # Only the ULDs with the weight and volume left for the package are searched
+                    ulds = [
+                        u for u in ulds
+                        if package.weight + u.current_weight <= u.weight_limit
+                        and package.volume + u.current_vol_occupied <= np.prod(u.dimensions)
+                    ]
+                    if not ulds:
+                        if self.counters.enabled:
+                            self.counters.add("economy_skipped")
+                        self.unpacked_packages.append(package)
+                        continue
+                for uld in ulds:
+                    can_fit = self._try_pack_package(
+                        package,
+                        uld,
+                        space_find_policy="first_find",
+                        orientation_choose_policy="first_find",
+                    )
+                    if can_fit:
+                        packed = True
+                        n_packs += 1
+                        if __debug__ and self.tracer.debug:
+                            self.tracer.emit(DEBUG, "packed", package=package.id, uld=uld.id, priority=False, n=n_packs)
+                        break
+                if not packed:
+                    self.unpacked_packages.append(package)
+
+        return self._result()
+
+    def _pack_priority(self, priority_packages: List[Package], ulds: List[ULD], every_orientation: bool = False) -> int:
+        """
+        Packs the sorted priority packages, in the ULDs sorted by volume.
+
+        :param priority_packages: The sorted priority packages.
+        :param ulds: The ULDs the priority packages may go to.
+        :param every_orientation: Whether every orientation of the packages is tried, to fit them
+                                  in a subset of the ULDs. Only the given one is tried otherwise.
+        :return: Number of packages packed.
+        """
+        if self.block_placement:
+            return self._pack_groups(
+                priority_packages,
+                sorted(ulds, key=lambda u: np.prod(u.dimensions), reverse=True),
+                space_find_policy="first_find",
+                orientation_choose_policy="first_find" if every_orientation else "no_rot",
+            )
+
+        orientation_choose_policy = "min_volume" if every_orientation else "no_rot"
+
+        n_packs = 0
         for package in priority_packages:
             packed = False
             for uld in sorted(
-                self.ulds,
+                ulds,
                 key=lambda u: np.prod(u.dimensions),
                 reverse=True,
             ):
+                # _try_pack_package fails on the weight limit with a true value, the package
+                # is then lost, so the subsets are packed checking it first
+                if every_orientation and package.weight + uld.current_weight > uld.weight_limit:
+                    continue
                 can_fit = self._try_pack_package(
                     package,
                     uld,
                     space_find_policy="first_find",
-                    orientation_choose_policy="no_rot",
+                    orientation_choose_policy=orientation_choose_policy,
                 )
                 if can_fit:
                     packed = True
                     n_packs += 1
-                    print(
-                        f"Packed Priority {package.id} in {uld.id}, {n_packs} "
-                    )
+                    if __debug__ and self.tracer.debug:
+                        self.tracer.emit(DEBUG, "packed", package=package.id, uld=uld.id, priority=True, n=n_packs)
                     break
             if not packed:
                 self.unpacked_packages.append(package)
+        return n_packs
 
-        ulds = sorted(
-                self.ulds,
-                key=lambda u: (1 - u.current_vol_occupied / np.prod(u.dimensions)),
-                reverse=False,
-            )
+    def _select_priority_ulds(self, priority_packages: List[Package]) -> Optional[List[ULD]]:
+        """
+        Finds fewer ULDs than pack uses for the priority packages that can hold them all,
+        as each ULD holding priority packages costs the priority spread cost.
 
-        # Pack the economy packages next
-        for package in economy_packages:
-            packed = False
-            ulds = list(filter(lambda u: (1 - u.current_weight / u.weight_limit) >= 49, ulds))
-            if len(ulds) < 1:
-                ulds = sorted(
+        Subsets are enumerated by size, and for a size by decreasing volume. The subsets
+        without the volume or weight capacity of the priority packages, or without a ULD
+        large enough for one of them, are pruned. The others are tested by packing the
+        priority packages alone in them, trying every orientation (see pack_priority), at
+        most MAX_SUBSET_TESTS per size, in a process pool if `n_workers` > 1.
+
+        :param priority_packages: The sorted priority packages.
+        :return: The first subset holding them all, None if there is none smaller.
+        """
+        n = len(self.ulds)
+        volumes = [int(np.prod(u.dimensions)) for u in self.ulds]
+        weights = [u.weight_limit for u in self.ulds]
+        total_volume = sum(pkg.volume for pkg in priority_packages)
+        total_weight = sum(pkg.weight for pkg in priority_packages)
+
+        # ULDs each package fits in, in some orientation, as bit masks
+        uld_dimensions = [sorted(u.dimensions) for u in self.ulds]
+        fit_masks = set()
+        for pkg in priority_packages:
+            dimensions = sorted(pkg.dimensions)
+            fit_masks.add(sum(
+                1 << i for i, d in enumerate(uld_dimensions) if all(a <= b for a, b in zip(dimensions, d))
+            ))
+        if 0 in fit_masks:
+            return None
+
+        instance = (
+            [(u.id, *u.dimensions.tolist(), u.weight_limit) for u in self.ulds],
+            priority_packages,
+            self.minimum_dimension,
+            self.block_placement,
+            self.occupancy_resolution,
+        )
+        # Only subsets smaller than the ULDs pack uses are worth it, or all of them if pack
+        # leaves priority packages out
+        n_used = pack_priority(instance, range(n), every_orientation=False)
+        max_size = n if n_used is None else n_used - 1
+
+        pool = None
+        if self.n_workers > 1:
+            pool = multiprocessing.Pool(self.n_workers, initializer=_init_worker, initargs=(instance,))
+        try:
+            for size in range(1, max_size + 1):
+                if (
+                    sum(sorted(volumes, reverse=True)[:size]) < total_volume
+                    or sum(sorted(weights, reverse=True)[:size]) < total_weight
+                ):
+                    continue
+
+                candidates = []
+                for subset in combinations(range(n), size):
+                    mask = sum(1 << i for i in subset)
+                    if (
+                        sum(volumes[i] for i in subset) >= total_volume
+                        and sum(weights[i] for i in subset) >= total_weight
+                        and all(fit_mask & mask for fit_mask in fit_masks)
+                    ):
+                        candidates.append(subset)
+                candidates.sort(key=lambda subset: -sum(volumes[i] for i in subset))
+                candidates = candidates[:MAX_SUBSET_TESTS]
+
+                if pool is not None:
+                    results = pool.imap(_pack_priority_in_worker, candidates)
+                else:
+                    results = (pack_priority(instance, subset) for subset in candidates)
+                found = None
+                n_tested = 0
+                for subset, n_used in zip(candidates, results):
+                    n_tested += 1
+                    if n_used is not None:
+                        found = subset
+                        break
+
+                if self.counters.enabled:
+                    self.counters.add("subsets_tested", n_tested)
+                if found is not None:
+                    ulds = [self.ulds[i] for i in found]
+                    if __debug__ and self.tracer.debug:
+                        self.tracer.emit(DEBUG, "priority_subset", ulds=[u.id for u in ulds], tested=n_tested)
+                    return ulds
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+        return None
+
+    def _select_economy(self, economy_packages: List[Package]) -> List[Package]:
+        """
+        Selects the economy packages worth a geometric search once the priority
+        packages are packed.
+
+        A package is hopeless if no ULD has both the volume and weight left for it
+        and the dimensions to hold it in some orientation, as the free spaces only
+        shrink. The hopeless packages are unpacked up front, checking every package
+        against every ULD at once. The delay cost that the volume and weight left
+        cannot hold even filled as a fluid (see FluidBound), a lower bound of the
+        economy delay cost, is traced.
+
+        :param economy_packages: The sorted economy packages.
+        :return: The packages left to search for, in the same order.
+        """
+        if not economy_packages:
+            return []
+        volumes = np.array([pkg.volume for pkg in economy_packages], dtype=np.float64)
+        weights = np.array([pkg.weight for pkg in economy_packages], dtype=np.float64)
+        dimensions = np.sort([pkg.dimensions for pkg in economy_packages], axis=1)
+
+        free_volumes = np.array([np.prod(u.dimensions) - u.current_vol_occupied for u in self.ulds], dtype=np.float64)
+        free_weights = np.array([u.weight_limit - u.current_weight for u in self.ulds], dtype=np.float64)
+        uld_dimensions = np.sort([u.dimensions for u in self.ulds], axis=1)
+
+        # Packages x ULDs that could hold them
+        fits = (
+            np.all(dimensions[:, None, :] <= uld_dimensions[None, :, :], axis=2)
+            & (volumes[:, None] <= free_volumes[None, :])
+            & (weights[:, None] <= free_weights[None, :])
+        )
+        hopeless = ~fits.any(axis=1)
+        selected = [pkg for pkg, drop in zip(economy_packages, hopeless) if not drop]
+        dropped = [pkg for pkg, drop in zip(economy_packages, hopeless) if drop]
+
+        if __debug__ and self.tracer.debug:
+            lost = FluidBound(selected).lost(free_volumes.sum(), free_weights.sum())
+            self.tracer.emit(DEBUG, "economy_selection", dropped=len(dropped),
+                             delay_bound=float(lost + sum(pkg.delay_cost for pkg in dropped)))
+
+        if self.counters.enabled:
+            self.counters.add("economy_dropped", len(dropped))
+        self.unpacked_packages.extend(dropped)
+        return selected
+
+    def _pack_blocks(self, priority_packages: List[Package], economy_packages: List[Package],
+                     priority_ulds: List[ULD], every_orientation: bool = False):
+        """
+        Packs the sorted packages in the same order as pack, but as blocks of
+        identical packages (see ULDPackerBase._pack_groups).
+
+        :param priority_packages: The sorted priority packages.
+        :param economy_packages: The sorted economy packages.
+        :param priority_ulds: The ULDs the priority packages may go to.
+        :param every_orientation: Whether every orientation of the priority packages is tried, see _pack_priority.
+        :return: Same as pack.
+        """
+        with self.timings.phase("priority"):
+            self._pack_priority(priority_packages, priority_ulds, every_orientation)
+
+        if self.economy_selection:
+            with self.timings.phase("economy_selection"):
+                economy_packages = self._select_economy(economy_packages)
+
+        with self.timings.phase("economy"):
+            # The ULDs are sorted again by free volume before packing each block
+            self._pack_groups(
+                economy_packages,
+                lambda: sorted(
                     self.ulds,
                     key=lambda u: (1 - u.current_vol_occupied / np.prod(u.dimensions)),
                     reverse=False,
-                )
-            for uld in ulds:
-                can_fit = self._try_pack_package(
-                    package,
-                    uld,
-                    space_find_policy="first_find",
-                    orientation_choose_policy="first_find",
-                )
-                if can_fit:
-                    packed = True
-                    n_packs += 1
-                    print(
-                        f"Packed Economy {package.id} in {uld.id}, {n_packs} "
-                    )
-                    break
-            if not packed:
-                self.unpacked_packages.append(package)
+                ),
+                space_find_policy="first_find",
+                orientation_choose_policy="first_find",
+            )
+
+        return self._result()
 
+    def _result(self):
+        """
+        Computes the total cost of the packing.
+
+        :return: Same as pack.
+        """
         total_delay_cost = sum(pkg.delay_cost for pkg in self.unpacked_packages)
         priority_spread_cost = sum(
             [self.priority_spread_cost if is_prio_uld else 0 for is_prio_uld in self.prio_ulds.values()]
@@ -1,11 +1,16 @@
+import logging
 from typing import List, Tuple
 from dataclass.ULD import ULD
 from dataclass.Package import Package
+from helpers.counters import Counters
+from helpers.tracing import DEBUG
 import numpy as np
 from .ULDPackerBase import ULDPackerBase
 from .structures.SpaceTree import SpaceTree
 import copy
 
+logger = logging.getLogger(__name__)
+
 class ULDPackerTree(ULDPackerBase):
     def __init__(
         self,
@@ -13,6 +18,7 @@ class ULDPackerTree(ULDPackerBase):
         packages: List[Package],
         priority_spread_cost: int,
         max_passes: int = 1,
+        search_mode: str = "first_fit",
     ):
         """
         Initialize the ULDPackerTree.
@@ -21,6 +27,8 @@ class ULDPackerTree(ULDPackerBase):
         :param packages: List of packages to be packed.
         :param priority_spread_cost: Cost associated with priority spread.
         :param max_passes: Maximum number of packing passes.
+        :param search_mode: 'first_fit' packs into the first ULD (largest first) with a space,
+                            'global_best' searches every ULD and picks the best scoring space.
         """
         super().__init__(
             ulds,
@@ -31,6 +39,12 @@ class ULDPackerTree(ULDPackerBase):
         self.unpacked_packages = []
         self.prio_ulds = {}
         self.space_trees = None
+        self.search_policy = "dfs"
+        self.space_choose_policy = "side_diff_vol_combo"
+        self.search_mode = search_mode
+
+        if search_mode not in ("first_fit", "global_best"):
+            raise RuntimeError(f"Invalid search mode {search_mode}")
 
     def insert(self, package: Package):
         """
@@ -39,16 +53,18 @@ class ULDPackerTree(ULDPackerBase):
         :param package: Package to be inserted.
         :return: Tuple indicating success, position, and ULD ID.
         """
+        if self.search_mode == "global_best":
+            return self._insert_global_best(package)
 
         for st, u in self.space_trees:
-            space = st.search(package, search_policy="dfs", space_choose_policy="side_diff_vol_combo")
+            space = st.search(package, search_policy=self.search_policy, space_choose_policy=self.space_choose_policy)
             if space is not None:
                 st.place_package_in(
                     space,
                     package,
                 )
-                print(f"\n{space.node_id} is for {package.id}\n")
-                print(f"Tree {u.id}")
+                if __debug__ and self.tracer.debug:
+                    self.tracer.emit(DEBUG, "space_chosen", node=space.node_id, package=package.id, uld=u.id)
 
                 # # Use for debugging
                 # st.display_tree()
@@ -61,76 +77,142 @@ class ULDPackerTree(ULDPackerBase):
                 u.current_vol_occupied += package.volume
 
                 return True, space.start_corner, u.id
+            if self.counters.enabled:
+                self.counters.add("failed_uld_attempts")
         return False, None, None
 
+    def _insert_global_best(self, package: Package):
+        """
+        Insert a package into the best scoring space over all ULD trees.
+        ULDs whose weight limit would be exceeded are not considered.
+
+        A package only opens a ULD if no ULD in use has a space for it: for a priority
+        package the ULDs in use are the ones holding priority packages, as opening
+        another costs the priority spread cost. The ULD opened is then the largest one
+        with a space, as in 'first_fit'. Ties are broken by the order of the space trees.
+
+        :param package: Package to be inserted.
+        :return: Tuple indicating success, position, and ULD ID.
+        """
+        best = None
+        n_failed = 0
+        for st, u in self.space_trees:
+            if u.current_weight + package.weight > u.weight_limit:
+                n_failed += 1
+                continue
+            space, rot, score = st.find_space(
+                package,
+                search_policy=self.search_policy,
+                space_choose_policy=self.space_choose_policy,
+            )
+            if space is None:
+                n_failed += 1
+                continue
+            if package.is_priority:
+                opens = u.id not in self.prio_ulds
+            else:
+                opens = u.current_vol_occupied == 0
+            # The trees are sorted by volume, the first ULD opened is the largest
+            rank = (opens, 0 if opens else score)
+            if best is None or rank < best[4]:
+                best = (st, u, space, rot, rank)
+
+        if self.counters.enabled:
+            self.counters.add("failed_uld_attempts", n_failed)
+
+        if best is None:
+            return False, None, None
+
+        st, u, space, rot, _ = best
+        package.rotation = rot
+        st.place_package_in(space, package)
+        if __debug__ and self.tracer.debug:
+            self.tracer.emit(DEBUG, "space_chosen", node=space.node_id, package=package.id, uld=u.id)
+
+        if package.is_priority:
+            self.prio_ulds[u.id] = True
+        u.current_weight += package.weight
+        u.current_vol_occupied += package.volume
+
+        return True, space.start_corner, u.id
+
     def pack(self):
         """
         Pack the packages into the ULDs.
 
         :return: Tuple containing packed positions, packed packages, unpacked packages, priority ULDs, and total cost.
         """
-        self.minimum_dimension = min([np.min(pkg.dimensions) for pkg in self.packages])
-        self.space_trees = [(SpaceTree(u, self.minimum_dimension), u) for u in self.ulds]
-        self.space_trees.sort(key = lambda t: np.prod(t[1].dimensions), reverse = True)
+        with self.timings.phase("setup"):
+            self.minimum_dimension = min([np.min(pkg.dimensions) for pkg in self.packages])
+            self.space_trees = [
+                (SpaceTree(u, self.minimum_dimension, self.tracer, Counters(self.counters.enabled)), u)
+                for u in self.ulds
+            ]
+            self.space_trees.sort(key = lambda t: np.prod(t[1].dimensions), reverse = True)
 
         n_packs = 1
 
-        # Get priority packages (sort if required)
-        # priority_packages = [pkg for pkg in self.packages if pkg.is_priority]
-        priority_packages = sorted(
-            [pkg for pkg in self.packages if pkg.is_priority],
-            key=lambda p: (p.volume),
-            reverse=True,
-        )
-
-        # Get economy packages (sort if required)
-        economy_packages = sorted(
-            [pkg for pkg in self.packages if not pkg.is_priority],
-            key=lambda p: p.delay_cost / p.volume,
-            reverse=True,
-        )
-
-        # Pack the priority packages first
-        for package in priority_packages:
-            packed, position, uldid = self.insert(package)
-            if not packed:
-                self.unpacked_packages.append(package)
-            else:
-                print(f"Packed Priority {package.id} in {uldid}, {n_packs}")
-                self.packed_packages.append(package)
-                self.packed_positions.append(
-                    (
-                        package.id,
-                        uldid,
-                        position[0],
-                        position[1],
-                        position[2],
-                        package.rotation[0],
-                        package.rotation[1],
-                        package.rotation[2],
+        with self.timings.phase("sort"):
+            # Get priority packages (sort if required)
+            # priority_packages = [pkg for pkg in self.packages if pkg.is_priority]
+            priority_packages = sorted(
+                [pkg for pkg in self.packages if pkg.is_priority],
+                key=lambda p: (p.volume),
+                reverse=True,
+            )
+
+            # Get economy packages (sort if required)
+            economy_packages = sorted(
+                [pkg for pkg in self.packages if not pkg.is_priority],
+                key=lambda p: p.delay_cost / p.volume,
+                reverse=True,
+            )
+
+        with self.timings.phase("priority"):
+            # Pack the priority packages first
+            for package in priority_packages:
+                packed, position, uldid = self.insert(package)
+                if not packed:
+                    self.unpacked_packages.append(package)
+                else:
+                    if __debug__ and self.tracer.debug:
+                        self.tracer.emit(DEBUG, "packed", package=package.id, uld=uldid, priority=True, n=n_packs)
+                    self.packed_packages.append(package)
+                    self.packed_positions.append(
+                        (
+                            package.id,
+                            uldid,
+                            position[0],
+                            position[1],
+                            position[2],
+                            package.rotation[0],
+                            package.rotation[1],
+                            package.rotation[2],
+                        )
                     )
-                )
 
-        # Pack the economy packages next
-        for package in economy_packages:
-            packed, position, uldid = self.insert(package)
-            if not packed:
-                self.unpacked_packages.append(package)
-            else:
-                print(f"Packed Economy {package.id} in {uldid}, {n_packs}")
-                self.packed_packages.append(package)
-                self.packed_positions.append(
-                    (
-                        package.id,
-                        uldid,
-                        position[0],
-                        position[1],
-                        position[2],
-                        package.rotation[0],
-                        package.rotation[1],
-                        package.rotation[2],
+        with self.timings.phase("economy"):
+            # Pack the economy packages next
+            for package in economy_packages:
+                packed, position, uldid = self.insert(package)
+                if not packed:
+                    self.unpacked_packages.append(package)
+                else:
+                    if __debug__ and self.tracer.debug:
+                        self.tracer.emit(DEBUG, "packed", package=package.id, uld=uldid, priority=False, n=n_packs)
+                    self.packed_packages.append(package)
+                    self.packed_positions.append(
+                        (
+                            package.id,
+                            uldid,
+                            position[0],
+                            position[1],
+                            position[2],
+                            package.rotation[0],
+                            package.rotation[1],
+                            package.rotation[2],
+                        )
                     )
-                )
 
         # Calculate some statistics to print
         total_delay_cost = sum(pkg.delay_cost for pkg in self.unpacked_packages)
@@ -141,9 +223,13 @@ class ULDPackerTree(ULDPackerBase):
 
         n_links = [st.n_links for st, u in self.space_trees]
         num_links = np.sum(n_links)
-        import logging
-        logging.basicConfig(level=logging.INFO)
-        logging.info(f"NUM_LINK: {num_links}, {n_links}")
+
+        if self.counters.enabled:
+            for st, u in self.space_trees:
+                self.counters.merge(st.counters)
+                self.counters.peak("spacetree_nodes", u.id, st.next_node_id)
+                self.counters.peak("spacetree_links", u.id, st.n_links)
+        logger.info("NUM_LINK: %s, %s", num_links, n_links)
 
         return (
             self.packed_positions,
@@ -160,6 +246,6 @@ class ULDPackerTree(ULDPackerBase):
         :param uld_id: ID of the ULD to retrieve spaces from.
         :return: List of available spaces.
         """
-        for st, uid in self.space_trees:
-            if uid == uld_id:
+        for st, u in self.space_trees:
+            if u.id == uld_id:
                 return st.create_list_of_spaces()
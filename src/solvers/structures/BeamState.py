@@ -0,0 +1,80 @@
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from .NegativeFitCache import NegativeFitCache
+
+
+class BeamState:
+    """
+    A partial packing of a beam search, forked copy-on-write from its parent.
+
+    A fork copies the per-ULD dictionaries only: the free space lists are
+    shared until a placement replaces the list of its ULD (they are never
+    modified in place), and the negative fit caches share their antichains.
+    Placements are not copied either, each state keeps its own and a link to
+    its parent, so that forking costs the same whatever the number of
+    packages packed.
+
+    Attributes:
+        parent (Optional[BeamState]): The state this one was forked from.
+        placement (Optional[Tuple]): Placement made from the parent, as (package index, ULD ID,
+                                     position, orientation), with None for the ULD, position and
+                                     orientation if the package was left out.
+        weights (Dict[str, int]): Weight packed in every ULD.
+        volumes (Dict[str, int]): Volume packed in every ULD.
+        spaces (Dict[str, List]): Free spaces of every ULD.
+        negative_fits (Dict[str, NegativeFitCache]): Boxes known not to fit in every ULD.
+        prio_ulds (FrozenSet[str]): ULDs holding priority packages.
+        cost (float): Delay cost, priority penalties and priority spread cost so far.
+    """
+
+    __slots__ = ("parent", "placement", "weights", "volumes", "spaces", "negative_fits", "prio_ulds", "cost")
+
+    def __init__(
+        self,
+        parent: Optional["BeamState"],
+        placement: Optional[Tuple],
+        weights: Dict[str, int],
+        volumes: Dict[str, int],
+        spaces: Dict[str, List],
+        negative_fits: Dict[str, NegativeFitCache],
+        prio_ulds: FrozenSet[str],
+        cost: float,
+    ):
+        self.parent = parent
+        self.placement = placement
+        self.weights = weights
+        self.volumes = volumes
+        self.spaces = spaces
+        self.negative_fits = negative_fits
+        self.prio_ulds = prio_ulds
+        self.cost = cost
+
+    def fork(self, placement: Tuple) -> "BeamState":
+        """
+        Creates a child state sharing the data of this one.
+
+        :param placement: Placement made from this state, see `placement`.
+        :return: The child state.
+        """
+        return BeamState(
+            self,
+            placement,
+            dict(self.weights),
+            dict(self.volumes),
+            dict(self.spaces),
+            {uld_id: cache.copy() for uld_id, cache in self.negative_fits.items()},
+            self.prio_ulds,
+            self.cost,
+        )
+
+    def placements(self) -> List[Tuple]:
+        """
+        :return: The placements made from the root state to this one, in order.
+        """
+        placements = []
+        state = self
+        while state.parent is not None:
+            placements.append(state.placement)
+            state = state.parent
+        placements.reverse()
+        return placements
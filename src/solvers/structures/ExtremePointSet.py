@@ -0,0 +1,56 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Tuple
+
+
+class ExtremePointSet:
+    """
+    Candidate positions of a ULD, kept sorted from the bottom, back, left upwards.
+
+    Points are (x, y, z) and are ordered by (z, y, x), so packages are tried at
+    the lowest points first. Duplicates are ignored. Every point keeps its
+    residual space: how far the free space reaches from it along each axis when
+    it was added. Free space only shrinks, so the residual space stays an upper
+    bound of the sides of a package that fits at the point.
+
+    Attributes:
+        points (List[Tuple]): The points, stored as (z, y, x) keys in sorted order.
+        residuals (Dict[Tuple, Tuple]): Residual space (along x, y, z) per key.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty ExtremePointSet.
+        """
+        self.points: List[Tuple] = []
+        self.residuals: Dict[Tuple, Tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def add(self, x, y, z, residual: Tuple):
+        """
+        Adds a point, unless already present.
+
+        :param residual: Residual space of the point along x, y and z.
+        """
+        key = (z, y, x)
+        if key not in self.residuals:
+            self.residuals[key] = residual
+            insort(self.points, key)
+
+    def remove(self, x, y, z):
+        """
+        Removes a point, if present.
+        """
+        key = (z, y, x)
+        if self.residuals.pop(key, None) is not None:
+            del self.points[bisect_left(self.points, key)]
+
+    def __iter__(self) -> Iterator[Tuple]:
+        """
+        Iterates over a snapshot of the points as (x, y, z, residual), lowest first.
+        """
+        residuals = self.residuals
+        for key in list(self.points):
+            z, y, x = key
+            yield x, y, z, residuals[key]
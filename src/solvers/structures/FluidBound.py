@@ -0,0 +1,106 @@
+from typing import List
+
+import numpy as np
+
+from dataclass.Package import Package
+
+
+class FluidBound:
+    """
+    Delay cost lost by the packages left to pack, relaxed to fractional knapsacks.
+
+    Packages are treated as a fluid filling the free volume by decreasing delay
+    cost per unit of volume, priority packages first, and the delay cost of the
+    volume that does not fit is lost. The same is done for the free weight, by
+    delay cost per unit of weight, and the larger loss is kept, so whichever of
+    volume or weight is scarce bounds the cost. Geometry is ignored, so the
+    loss is optimistic, but packing a package then costs the delay of the least
+    dense packages it pushes out rather than an average.
+
+    Packages are removed as they are packed. The cumulative sizes and delay
+    costs in density order are recomputed on the next query after a removal.
+
+    Attributes:
+        volume (int): Volume of the packages left.
+        weight (int): Weight of the packages left.
+        delay (int): Delay cost of the packages left.
+        priority_volume (int): Volume of the priority packages left.
+    """
+
+    def __init__(self, packages: List[Package]):
+        """
+        Initializes the FluidBound with every package left.
+
+        :param packages: The packages.
+        """
+        delays = np.array([pkg.delay_cost for pkg in packages], dtype=np.float64)
+        priority = np.array([pkg.is_priority for pkg in packages], dtype=bool)
+        self._ranks = []  # Position of every package in density order, per resource
+        self._sizes = []  # Sizes in density order, per resource
+        self._delays = []  # Delay costs in density order, per resource
+        for sizes in (
+            np.array([pkg.volume for pkg in packages], dtype=np.float64),
+            np.array([pkg.weight for pkg in packages], dtype=np.float64),
+        ):
+            density = np.where(priority, np.inf, delays / np.maximum(sizes, 1))
+            order = np.argsort(-density, kind="stable")
+            rank = np.empty(len(packages), dtype=np.int64)
+            rank[order] = np.arange(len(packages))
+            self._ranks.append(rank)
+            self._sizes.append(sizes[order])
+            self._delays.append(delays[order])
+        self._left = [np.ones(len(packages), dtype=bool) for _ in self._ranks]
+        self._cumulative = [None] * len(self._ranks)
+
+        self.volume = sum(pkg.volume for pkg in packages)
+        self.weight = sum(pkg.weight for pkg in packages)
+        self.delay = sum(pkg.delay_cost for pkg in packages)
+        self.priority_volume = sum(pkg.volume for pkg in packages if pkg.is_priority)
+
+    def remove(self, index: int, package: Package):
+        """
+        Removes a package from the packages left.
+
+        :param index: Index of the package in the list given at creation.
+        :param package: The package.
+        """
+        for resource, rank in enumerate(self._ranks):
+            self._left[resource][rank[index]] = False
+            self._cumulative[resource] = None
+        self.volume -= package.volume
+        self.weight -= package.weight
+        self.delay -= package.delay_cost
+        if package.is_priority:
+            self.priority_volume -= package.volume
+
+    def _lost(self, resource: int, capacity: float) -> float:
+        """
+        Delay cost of the packages left that do not fit in a capacity of one resource.
+        """
+        if self._cumulative[resource] is None:
+            left = self._left[resource]
+            self._cumulative[resource] = (
+                np.cumsum(self._sizes[resource] * left),
+                np.cumsum(self._delays[resource] * left),
+            )
+        sizes, delays = self._cumulative[resource]
+        if capacity >= sizes[-1]:
+            return 0.0
+        # Packages before j fit entirely, the package j (left, as the size rises there) in part
+        j = int(np.searchsorted(sizes, capacity, side="right"))
+        filled_size = sizes[j - 1] if j > 0 else 0.0
+        filled_delay = delays[j - 1] if j > 0 else 0.0
+        filled_delay += (capacity - filled_size) * self._delays[resource][j] / max(self._sizes[resource][j], 1)
+        return max(self.delay - filled_delay, 0.0)
+
+    def lost(self, free_volume: float, free_weight: float) -> float:
+        """
+        Delay cost of the packages left that do not fit in the given free volume and weight.
+
+        :param free_volume: The free volume.
+        :param free_weight: The free weight.
+        :return: The delay cost lost.
+        """
+        if self.delay <= 0 or (free_volume >= self.volume and free_weight >= self.weight):
+            return 0.0
+        return max(self._lost(0, free_volume), self._lost(1, free_weight))
@@ -0,0 +1,81 @@
+from typing import List, Optional, Tuple
+
+
+class GuillotinePacker2D:
+    """
+    Packs rectangles into a rectangular area by guillotine cuts.
+
+    Free space is kept as a list of disjoint rectangles. A rectangle is placed in
+    the corner of the free rectangle it fits best (smallest leftover area), which
+    is then cut in two along the shorter leftover side. Free rectangles only
+    shrink, so a rectangle that does not fit never will.
+
+    Attributes:
+        width (int): Width of the area.
+        height (int): Height of the area.
+        free_rects (List[Tuple]): Free rectangles as (x, y, width, height).
+        used_area (int): Total area of the placed rectangles.
+    """
+
+    def __init__(self, width: int, height: int):
+        """
+        Initializes the GuillotinePacker2D with an empty area.
+
+        :param width: Width of the area.
+        :param height: Height of the area.
+        """
+        self.width = width
+        self.height = height
+        self.free_rects: List[Tuple] = [(0, 0, width, height)]
+        self.used_area = 0
+
+    def insert(self, width: int, height: int, allow_rotation: bool = True) -> Optional[Tuple]:
+        """
+        Places a rectangle.
+
+        :param width: Width of the rectangle.
+        :param height: Height of the rectangle.
+        :param allow_rotation: Whether the rectangle may be turned by 90 degrees.
+        :return: The placement as (x, y, width, height), or None if it does not fit.
+        """
+        best_idx = None
+        best_leftover = None
+        best_size = None
+        for idx, (fx, fy, fw, fh) in enumerate(self.free_rects):
+            for w, h in ((width, height), (height, width)) if allow_rotation else ((width, height),):
+                if w <= fw and h <= fh:
+                    leftover = fw * fh - w * h
+                    if best_leftover is None or leftover < best_leftover:
+                        best_idx = idx
+                        best_leftover = leftover
+                        best_size = (w, h)
+                        if leftover == 0:
+                            break
+            if best_leftover == 0:
+                break
+
+        if best_idx is None:
+            return None
+
+        fx, fy, fw, fh = self.free_rects.pop(best_idx)
+        w, h = best_size
+
+        # Split along the shorter leftover side, keeping the larger remainder whole
+        if fw - w < fh - h:
+            right = (fx + w, fy, fw - w, h)
+            top = (fx, fy + h, fw, fh - h)
+        else:
+            right = (fx + w, fy, fw - w, fh)
+            top = (fx, fy + h, w, fh - h)
+        for rect in (right, top):
+            if rect[2] > 0 and rect[3] > 0:
+                self.free_rects.append(rect)
+
+        self.used_area += w * h
+        return fx, fy, w, h
+
+    def is_full(self) -> bool:
+        """
+        :return: True if no free area is left.
+        """
+        return not self.free_rects
@@ -0,0 +1,139 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+class HeightMap:
+    """
+    Floor of a ULD as a 2D grid of stacked heights.
+
+    The floor is divided into square cells of `resolution` (along the length and
+    the width), each holding the height of the top of the packages stacked on
+    it. A package with a footprint of a x b cells placed at cell (i, j) rests at
+    the maximum height under its footprint, so the rest heights of all the
+    positions are a 2D sliding window maximum of the map, computed in linear
+    time whatever the footprint (van Herk / Gil-Werman). Placing it is a slice
+    assignment.
+
+    The support ratio of a position is the share of the footprint resting on
+    the top of packages (or the floor), i.e. of cells at the rest height.
+
+    Heights only grow, so the lowest rest height of a footprint found by a
+    search stays a lower bound of it, as does the lowest cell of the map. A
+    package taller than the room above the bound fits nowhere, which is
+    checked before any sliding window maximum.
+
+    Attributes:
+        resolution (int): Side of a cell.
+        height (int): Height of the ULD.
+        heights (np.ndarray): Stacked height of every cell.
+        lowest (int): Height of the lowest cell.
+        lowest_rests (Dict[Tuple[int, int], int]): Lower bound of the rest height of every
+                                                   footprint (in cells) searched.
+    """
+
+    def __init__(self, length: int, width: int, height: int, resolution: int = 1):
+        """
+        Initializes an empty HeightMap. Cells that do not fit entirely in the ULD are left out.
+
+        :param length: Length of the ULD.
+        :param width: Width of the ULD.
+        :param height: Height of the ULD.
+        :param resolution: Side of a cell.
+        """
+        if resolution <= 0:
+            raise RuntimeError(f"Invalid resolution {resolution}")
+        self.resolution = resolution
+        self.height = height
+        self.heights = np.zeros((int(length // resolution), int(width // resolution)), dtype=np.int64)
+        self.lowest = 0
+        self.lowest_rests: Dict[Tuple[int, int], int] = {}
+
+    @staticmethod
+    def sliding_max(values: np.ndarray, window: int, axis: int) -> np.ndarray:
+        """
+        Maximum over every window of consecutive values along an axis (van Herk / Gil-Werman).
+
+        The axis is cut in blocks of `window` values. The maximum of a window is
+        the maximum of the suffix maximum of the block it starts in and the
+        prefix maximum of the block it ends in, so the cost does not depend on
+        the window.
+
+        :param values: Integer array.
+        :param window: Size of the windows.
+        :param axis: Axis to slide along.
+        :return: Array with n - window + 1 values along the axis.
+        """
+        values = np.moveaxis(values, axis, 0)
+        n = values.shape[0]
+        n_blocks = -(-n // window)
+        padded = np.full((n_blocks * window,) + values.shape[1:], np.iinfo(values.dtype).min, dtype=values.dtype)
+        padded[:n] = values
+
+        blocks = padded.reshape((n_blocks, window) + values.shape[1:])
+        prefix = np.maximum.accumulate(blocks, axis=1).reshape(padded.shape)
+        suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+
+        result = np.maximum(suffix[: n - window + 1], prefix[window - 1: n])
+        return np.moveaxis(result, 0, axis)
+
+    def footprint(self, length: int, width: int) -> Tuple[int, int]:
+        """
+        :return: Number of cells covered by a footprint along the length and the width.
+        """
+        return -(-int(length) // self.resolution), -(-int(width) // self.resolution)
+
+    def find_position(self, length: int, width: int, height: int,
+                      min_support: float = 1.0) -> Optional[Tuple[int, int, int, float]]:
+        """
+        Finds the lowest position of a package, then the closest to the front left corner,
+        among the positions with at least the given support ratio.
+
+        :param length: Length of the package.
+        :param width: Width of the package.
+        :param height: Height of the package.
+        :param min_support: Minimum share of the footprint resting on packages or the floor.
+        :return: The cell (i, j), the rest height and the support ratio, or None if it does not fit.
+        """
+        a, b = self.footprint(length, width)
+        n_length, n_width = self.heights.shape
+        if a > n_length or b > n_width:
+            return None
+        if max(self.lowest, self.lowest_rests.get((a, b), 0)) + height > self.height:
+            return None
+
+        rest = self.sliding_max(self.sliding_max(self.heights, a, 0), b, 1)
+        self.lowest_rests[(a, b)] = int(rest.min())
+        fits = rest + height <= self.height
+        if not fits.any():
+            return None
+
+        # Cells at the rest height are counted with a summed-area table per rest height,
+        # from the lowest up, stopping at the first one with a supported position
+        area = a * b
+        for level in np.unique(rest[fits]):
+            candidates = fits & (rest == level)
+            on_level = np.zeros((n_length + 1, n_width + 1), dtype=np.int64)
+            on_level[1:, 1:] = (self.heights == level).cumsum(axis=0).cumsum(axis=1)
+            supported = (
+                on_level[a:, b:] - on_level[:-a, b:] - on_level[a:, :-b] + on_level[:-a, :-b]
+            )
+            valid = candidates & (supported >= min_support * area)
+            if valid.any():
+                i, j = np.unravel_index(np.argmax(valid), valid.shape)
+                return int(i), int(j), int(level), float(supported[i, j] / area)
+        return None
+
+    def place(self, i: int, j: int, length: int, width: int, top: int):
+        """
+        Raises the cells under a footprint to the top of a placed package.
+
+        :param i: Cell along the length.
+        :param j: Cell along the width.
+        :param length: Length of the package.
+        :param width: Width of the package.
+        :param top: Height of the top of the package.
+        """
+        a, b = self.footprint(length, width)
+        self.heights[i: i + a, j: j + b] = top
+        self.lowest = int(self.heights.min())
@@ -0,0 +1,108 @@
+from itertools import permutations
+from typing import List, Tuple
+
+
+class NegativeFitCache:
+    """
+    Remembers the boxes that did not fit in a ULD.
+
+    Free space in a ULD only shrinks while packing, so once a box does not fit,
+    no box at least as large in every dimension will fit later. The cache keeps
+    the minimal failed boxes (a Pareto antichain) and answers these dominance
+    queries without searching the free spaces again.
+
+    Two antichains are kept: oriented boxes, which failed in the given orientation
+    only, and sorted boxes, which failed in every orientation.
+
+    Attributes:
+        oriented (List[Tuple]): Minimal boxes that did not fit in their orientation.
+        rotated (List[Tuple]): Minimal sorted boxes that did not fit in any orientation.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty NegativeFitCache.
+        """
+        self.oriented: List[Tuple] = []
+        self.rotated: List[Tuple] = []
+
+    @staticmethod
+    def _dominated(box: Tuple, antichain: List[Tuple]) -> bool:
+        """
+        Checks if an antichain holds a box no larger than `box` in every dimension.
+        """
+        l, w, h = box
+        for fl, fw, fh in antichain:
+            if fl <= l and fw <= w and fh <= h:
+                return True
+        return False
+
+    @staticmethod
+    def _insert(box: Tuple, antichain: List[Tuple]) -> List[Tuple]:
+        """
+        Inserts a box into an antichain, dropping the boxes it dominates.
+        """
+        l, w, h = box
+        kept = [f for f in antichain if not (l <= f[0] and w <= f[1] and h <= f[2])]
+        kept.append(box)
+        return kept
+
+    def rejects(self, box: Tuple) -> bool:
+        """
+        Checks if a box is known not to fit in the given orientation.
+
+        :param box: Oriented dimensions (length, width, height).
+        :return: True if the box cannot fit, False if unknown.
+        """
+        box = tuple(box)
+        return self._dominated(box, self.oriented) or self._dominated(tuple(sorted(box)), self.rotated)
+
+    def rejects_all_rotations(self, box: Tuple) -> bool:
+        """
+        Checks if a box is known not to fit in any orientation.
+
+        :param box: Dimensions of the box, in any order.
+        :return: True if the box cannot fit, False if unknown.
+        """
+        if self._dominated(tuple(sorted(box)), self.rotated):
+            return True
+        return bool(self.oriented) and all(self._dominated(rot, self.oriented) for rot in permutations(box))
+
+    def add(self, box: Tuple):
+        """
+        Records that a box did not fit in the given orientation.
+
+        :param box: Oriented dimensions (length, width, height).
+        """
+        box = tuple(box)
+        if not self.rejects(box):
+            self.oriented = self._insert(box, self.oriented)
+
+    def add_all_rotations(self, box: Tuple):
+        """
+        Records that a box did not fit in any orientation.
+
+        :param box: Dimensions of the box, in any order.
+        """
+        box = tuple(sorted(box))
+        if not self._dominated(box, self.rotated):
+            self.rotated = self._insert(box, self.rotated)
+
+    def copy(self) -> "NegativeFitCache":
+        """
+        Copies the cache, e.g. for a packing forked from this one. The antichains are
+        replaced rather than modified, so the copy shares them.
+
+        :return: The copy.
+        """
+        cache = NegativeFitCache()
+        cache.oriented = self.oriented
+        cache.rotated = self.rotated
+        return cache
+
+    def clear(self):
+        """
+        Forgets all failures, e.g. when free space was added back.
+        """
+        self.oriented = []
+        self.rotated = []
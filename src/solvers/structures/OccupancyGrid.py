@@ -0,0 +1,162 @@
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class OccupancyGrid:
+    """
+    Occupancy of a ULD on a 3D grid of cells, one byte per cell.
+
+    The cells are delimited by sorted edges along each axis, either uniform
+    (every `resolution` units, see `uniform`) or the coordinates of a known set
+    of boxes (coordinate compression, see `compressed`). A box covers every
+    cell it overlaps, so on a uniform grid occupancy is conservative and on a
+    compressed grid it is exact. Queries and updates are slice reductions and
+    slice assignments whose cost depends on the size of the box in cells, not
+    on the number of boxes or free spaces.
+
+    Cells count the boxes covering them up to 2, so overlaps are detected.
+
+    Attributes:
+        edges (Tuple[np.ndarray]): Cell edges along x, y and z.
+        resolution (Optional[int]): Side of the cells of a uniform grid, None if compressed.
+        cells (np.ndarray): Number of boxes covering each cell, saturated at 2.
+    """
+
+    def __init__(self, edges: Sequence[np.ndarray], resolution: Optional[int] = None):
+        """
+        Initializes an empty OccupancyGrid.
+
+        :param edges: Sorted cell edges along x, y and z.
+        :param resolution: Side of the cells, if uniform.
+        """
+        self.edges = tuple(np.asarray(e) for e in edges)
+        self.resolution = resolution
+        self.cells = np.zeros(tuple(len(e) - 1 for e in self.edges), dtype=np.uint8)
+
+    @classmethod
+    def uniform(cls, dimensions: Sequence[int], resolution: int) -> "OccupancyGrid":
+        """
+        Creates a grid of cubic cells (the last cells along an axis may be thinner).
+
+        :param dimensions: Dimensions of the ULD.
+        :param resolution: Side of the cells.
+        :return: The grid.
+        """
+        if resolution <= 0:
+            raise RuntimeError(f"Invalid resolution {resolution}")
+        return cls(
+            [np.append(np.arange(0, d, resolution), d) for d in dimensions],
+            resolution,
+        )
+
+    @classmethod
+    def compressed(cls, dimensions: Sequence[int], boxes: List[Tuple]) -> "OccupancyGrid":
+        """
+        Creates a grid whose edges are the coordinates of the given boxes and of the ULD,
+        on which occupancy of these boxes is exact.
+
+        :param dimensions: Dimensions of the ULD.
+        :param boxes: Boxes as (x, y, z, length, width, height).
+        :return: The grid.
+        """
+        edges = []
+        for axis in range(3):
+            coordinates = [0, dimensions[axis]]
+            for box in boxes:
+                coordinates.append(box[axis])
+                coordinates.append(box[axis] + box[axis + 3])
+            edges.append(np.unique(coordinates))
+        return cls(edges)
+
+    @staticmethod
+    def n_cells(dimensions: Sequence[int], boxes: List[Tuple]) -> int:
+        """
+        :return: Number of cells of the compressed grid of the given boxes, without building it.
+        """
+        n = 1
+        for axis in range(3):
+            coordinates = {0, dimensions[axis]}
+            for box in boxes:
+                coordinates.add(box[axis])
+                coordinates.add(box[axis] + box[axis + 3])
+            n *= len(coordinates) - 1
+        return n
+
+    def _slices(self, x, y, z, length, width, height) -> Tuple[slice, slice, slice]:
+        """
+        Cells overlapped by a box.
+        """
+        slices = []
+        for edges, start, size in zip(self.edges, (x, y, z), (length, width, height)):
+            first = max(int(np.searchsorted(edges, start, side="right")) - 1, 0)
+            last = int(np.searchsorted(edges, start + size, side="left"))
+            slices.append(slice(first, last))
+        return tuple(slices)
+
+    def is_free(self, x, y, z, length, width, height) -> bool:
+        """
+        Checks if no box covers any cell overlapped by a box, and the box is inside the grid.
+
+        :return: True if free.
+        """
+        for edges, start, size in zip(self.edges, (x, y, z), (length, width, height)):
+            if start < edges[0] or start + size > edges[-1]:
+                return False
+        return not self.cells[self._slices(x, y, z, length, width, height)].any()
+
+    def occupy(self, x, y, z, length, width, height):
+        """
+        Marks the cells overlapped by a box.
+        """
+        cells = self._slices(x, y, z, length, width, height)
+        self.cells[cells] = np.minimum(self.cells[cells] + 1, 2)
+
+    def is_overlapping(self, x, y, z, length, width, height) -> bool:
+        """
+        Checks if a cell overlapped by a box is covered by more than one box.
+
+        :return: True if it is.
+        """
+        return bool((self.cells[self._slices(x, y, z, length, width, height)] > 1).any())
+
+    def find_free(self, length, width, height) -> Optional[Tuple]:
+        """
+        Finds the lowest free position of a box on a uniform grid, then the closest to the back
+        and left. Positions are on cell edges, and all the free positions are found at once from
+        a 3D summed-area table of the occupied cells.
+
+        :param length: Length of the box.
+        :param width: Width of the box.
+        :param height: Height of the box.
+        :return: The position (x, y, z), or None if the box fits nowhere.
+        """
+        if self.resolution is None:
+            raise RuntimeError("Free positions can only be searched on a uniform grid")
+
+        r = self.resolution
+        windows = [-(-int(size) // r) for size in (length, width, height)]
+        # Positions whose box stays inside the ULD (the last cells may be thinner)
+        n_positions = [
+            min(int((edges[-1] - size) // r) + 1, len(edges) - window)
+            for edges, size, window in zip(self.edges, (length, width, height), windows)
+        ]
+        if min(n_positions) <= 0:
+            return None
+
+        table = np.zeros(tuple(n + 1 for n in self.cells.shape), dtype=np.int64)
+        table[1:, 1:, 1:] = (self.cells > 0).cumsum(axis=0).cumsum(axis=1).cumsum(axis=2)
+
+        a, b, c = windows
+        p, q, s = n_positions
+        occupied = (
+            table[a:a + p, b:b + q, c:c + s] - table[:p, b:b + q, c:c + s]
+            - table[a:a + p, :q, c:c + s] - table[a:a + p, b:b + q, :s]
+            + table[:p, :q, c:c + s] + table[:p, b:b + q, :s] + table[a:a + p, :q, :s]
+            - table[:p, :q, :s]
+        )
+        free = np.transpose(occupied == 0, (2, 1, 0))
+        if not free.any():
+            return None
+        k, j, i = np.unravel_index(np.argmax(free), free.shape)
+        return self.edges[0][i], self.edges[1][j], self.edges[2][k]
@@ -0,0 +1,157 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple
+
+
+class PrefixNode:
+    """
+    A node of the PrefixCache trie, standing for the prefix spelled by the keys from the root.
+
+    Attributes:
+        key (Hashable): Last step of the prefix.
+        parent (Optional[PrefixNode]): Node of the prefix one step shorter, None for the root.
+        children (Dict[Hashable, PrefixNode]): Nodes of the prefixes one step longer.
+        state (Any): State cached after the prefix, None if not cached.
+        size (int): Estimated size of the state in bytes.
+        seconds (float): Time taken to reach the state from the empty one.
+    """
+
+    __slots__ = ("key", "parent", "children", "state", "size", "seconds")
+
+    def __init__(self, key: Hashable = None, parent: Optional["PrefixNode"] = None):
+        self.key = key
+        self.parent = parent
+        self.children: Dict[Hashable, PrefixNode] = {}
+        self.state = None
+        self.size = 0
+        self.seconds = 0.0
+
+
+class PrefixCache:
+    """
+    States of a sequential decoder cached at checkpoints along step sequences.
+
+    A decoder that applies steps one by one (e.g. packs packages in a given
+    order) reaches the same state after the same prefix of steps. The cache is
+    a trie keyed by the steps. Its nodes at checkpoints hold the state reached
+    there, so that decoding a sequence can resume from the state of its longest
+    cached prefix instead of starting empty.
+
+    Checkpoints are `interval` seconds of decoding apart rather than a number
+    of steps, so they are denser where steps are expensive, and resuming never
+    repeats more than `interval` seconds of work past a cached prefix.
+
+    The states are evicted least recently used first when their estimated total
+    size exceeds `max_bytes`, and the trie is pruned of branches left without
+    states.
+
+    Attributes:
+        interval (float): Decoding time between checkpoints, in seconds.
+        max_bytes (int): Maximum estimated size of the cached states.
+        n_bytes (int): Estimated size of the cached states.
+        hits (int): Number of lookups that found a cached prefix.
+        misses (int): Number of lookups that did not.
+        reused_steps (int): Number of steps skipped by resuming from cached prefixes.
+        saved_seconds (float): Decoding time of the steps skipped, as measured when they were decoded.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, interval: float = 0.02):
+        """
+        Initializes an empty PrefixCache.
+
+        :param max_bytes: Maximum estimated size of the cached states.
+        :param interval: Decoding time between checkpoints, in seconds.
+        """
+        if interval <= 0:
+            raise RuntimeError(f"Invalid checkpoint interval {interval}")
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.n_bytes = 0
+        self.root = PrefixNode()
+        self._lru: "OrderedDict[int, PrefixNode]" = OrderedDict()  # Nodes holding a state
+        self.hits = 0
+        self.misses = 0
+        self.reused_steps = 0
+        self.saved_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def lookup(self, steps: Sequence[Hashable]) -> Tuple[int, Any]:
+        """
+        Finds the state of the longest cached prefix of a sequence.
+
+        :param steps: The sequence of steps.
+        :return: Length of the prefix and its state, or (0, None) if no prefix is cached.
+        """
+        node = self.root
+        depth, found = 0, None
+        for i, step in enumerate(steps):
+            node = node.children.get(step)
+            if node is None:
+                break
+            if node.state is not None:
+                depth, found = i + 1, node
+        if found is None:
+            self.misses += 1
+            return 0, None
+        self._lru.move_to_end(id(found))
+        self.hits += 1
+        self.reused_steps += depth
+        self.saved_seconds += found.seconds
+        return depth, found.state
+
+    def is_checkpoint(self, seconds: float) -> bool:
+        """
+        :param seconds: Decoding time since the last checkpoint, or the start.
+        :return: True if the state reached is to be cached.
+        """
+        return seconds >= self.interval
+
+    def store(self, steps: Sequence[Hashable], depth: int, state: Any, size: int, seconds: float = 0.0):
+        """
+        Caches the state reached after the first `depth` steps of a sequence.
+
+        :param steps: The sequence of steps.
+        :param depth: Length of the prefix.
+        :param state: The state after the prefix.
+        :param size: Estimated size of the state in bytes.
+        :param seconds: Time taken to reach the state from the empty one.
+        """
+        if size > self.max_bytes:
+            return
+        node = self.root
+        for step in steps[:depth]:
+            child = node.children.get(step)
+            if child is None:
+                child = PrefixNode(step, node)
+                node.children[step] = child
+            node = child
+
+        if node.state is not None:
+            self.n_bytes -= node.size
+        node.state, node.size, node.seconds = state, size, seconds
+        self.n_bytes += size
+        self._lru[id(node)] = node
+        self._lru.move_to_end(id(node))
+
+        while self.n_bytes > self.max_bytes:
+            _, evicted = self._lru.popitem(last=False)
+            self.n_bytes -= evicted.size
+            evicted.state, evicted.size = None, 0
+            self._prune(evicted)
+
+    def _prune(self, node: PrefixNode):
+        """
+        Removes a node without state nor children, then its ancestors left in the same case.
+        """
+        while node.parent is not None and node.state is None and not node.children:
+            del node.parent.children[node.key]
+            node = node.parent
+
+    def clear(self):
+        """
+        Forgets all states.
+        """
+        self.root = PrefixNode()
+        self._lru.clear()
+        self.n_bytes = 0
@@ -1,6 +1,9 @@
+import logging
 from typing import List, Tuple
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
 class SpaceNode:
     """
     Represents a 3D space node for spatial subdivision and overlap management.
@@ -99,7 +102,6 @@ class SpaceNode:
 
 
         self.overlaps = new_overlap_list
-        print(f"{self.node_id} removed links to {other.node_id}")
 
 
 
@@ -190,15 +192,15 @@ class SpaceNode:
         """
         # Check if 'other' is completely inside 'self'
         if other.is_completely_inside(self):
-            print("Other is completely inside self. No changes made.")
+            logger.debug("Other is completely inside self. No changes made.")
             return
 
         overlap = self.get_overlap(other)
         if not overlap:
-            print("No overlap detected.")
+            logger.debug("No overlap detected.")
             return
 
-        print("Overlap detected. Shrinking both spaces.")
+        logger.debug("Overlap detected. Shrinking both spaces.")
 
         # Shrink logic for both self and other based on the overlap region
         # Update end_corner for both nodes
@@ -1,31 +1,44 @@
 from dataclass.Package import Package
 from dataclass.ULD import ULD
+from helpers.counters import Counters
+from helpers.tracing import DEBUG, Tracer
+from .NegativeFitCache import NegativeFitCache
 from .SpaceNode import SpaceNode
 import numpy as np
 from itertools import permutations
-
-global_node_id = 0
+from typing import List, Tuple
 
 class SpaceTree:
     """
     Represents a hierarchical tree structure for managing spatial divisions within a container.
     """
 
-    def __init__(self, uld: ULD, minimum_dimension: int):
+    def __init__(self, uld: ULD, minimum_dimension: int, tracer: Tracer = None, counters: Counters = None):
         """
         Initializes the SpaceTree.
 
         :param uld: The ULD (Unit Load Device) associated with the space tree.
         :param minimum_dimension: The smallest allowable dimension for subdivisions.
+        :param tracer: Tracer receiving the tree events. Defaults to a disabled tracer.
+        :param counters: Counters receiving the search and split counts. Defaults to disabled counters.
+                         Trees searched concurrently must not share their counters.
         """
         self.uld_no = uld.id
         self.uld_dimensions = uld.dimensions
         self.minimum_dimension = minimum_dimension
         self.root = SpaceNode(np.zeros(3), uld.dimensions, minimum_dimension)
         self.root.node_id = 0
+        # Node ids are allocated per tree, so several trees can be built
+        # side by side (e.g. from different threads) without sharing state
+        self.next_node_id = 1
         self.unidirectional_signalling_list = {}
         self.bidirectional_signalling_list = []
         self.n_links = 0
+        self.n_leaves = 1
+        self.tracer = tracer if tracer is not None else Tracer()
+        self.counters = counters if counters is not None else Counters(enabled=False)
+        # Boxes that fit in no leaf, leaves only shrink so they never will
+        self.negative_fits = NegativeFitCache()
 
     def _add_link(self, node1: SpaceNode, node2: SpaceNode):
         """
@@ -38,12 +51,14 @@ class SpaceTree:
         if overlap is not None:
             if (node2, overlap) not in node1.overlaps:
                 node1.overlaps.append((node2, overlap))
-                print(f"Added link {node1.node_id} -> {node2.node_id}")
+                if __debug__ and self.tracer.debug:
+                    self.tracer.emit(DEBUG, "link_added", src=node1.node_id, dst=node2.node_id)
                 self.n_links += 1
 
             if (node1, overlap) not in node2.overlaps:
                 node2.overlaps.append((node1, overlap))
-                print(f"Added link {node2.node_id} -> {node1.node_id}")
+                if __debug__ and self.tracer.debug:
+                    self.tracer.emit(DEBUG, "link_added", src=node2.node_id, dst=node1.node_id)
                 self.n_links += 1
 
 
@@ -54,11 +69,13 @@ class SpaceTree:
         :param child: The child node to update.
         :param parent: The parent node.
         """
-        global global_node_id
         child.parent = parent
-        child.node_id = global_node_id
-        print(f"Assigned ID {child.node_id} to child of {child.parent.node_id}")
-        global_node_id += 1
+        child.node_id = self.next_node_id
+        if self.counters.enabled:
+            self.counters.add("spaces_created")
+        if __debug__ and self.tracer.debug:
+            self.tracer.emit(DEBUG, "node_assigned", node=child.node_id, parent=parent.node_id)
+        self.next_node_id += 1
 
     def _remove_unnecessary_children(self, node: SpaceNode):
         """
@@ -80,7 +97,10 @@ class SpaceTree:
 
         for not_child in not_children:
             node.children.remove(not_child)
-            print(f"Removed {not_child.node_id}")
+            if self.counters.enabled:
+                self.counters.add("spaces_pruned")
+            if __debug__ and self.tracer.debug:
+                self.tracer.emit(DEBUG, "child_removed", node=not_child.node_id, parent=node.node_id)
 
     def _set_internal_links(self, node: SpaceNode):
         """
@@ -107,10 +127,12 @@ class SpaceTree:
                 if (node, neighbour) not in self.bidirectional_signalling_list and \
                    (neighbour, node) not in self.bidirectional_signalling_list:
                     self.bidirectional_signalling_list.append((node, neighbour))
-                    print(f"Signalling {node.node_id} - {neighbour.node_id} in BIDIR")
+                    if __debug__ and self.tracer.debug:
+                        self.tracer.emit(DEBUG, "signal_bidir", src=node.node_id, dst=neighbour.node_id)
             elif neighbour not in self.unidirectional_signalling_list[node]:
                 self.unidirectional_signalling_list[node].append(neighbour)
-                print(f"Signalling {node.node_id} -> {neighbour.node_id} in UNIDIR")
+                if __debug__ and self.tracer.debug:
+                    self.tracer.emit(DEBUG, "signal_unidir", src=node.node_id, dst=neighbour.node_id)
 
     def _perform_link_updates(self):
         """
@@ -123,11 +145,15 @@ class SpaceTree:
                 nodeB.remove_links_to(nodeA)
                 nodeA.remove_links_to(nodeB)
                 self.n_links += 2
+                if __debug__ and self.tracer.debug:
+                    self.tracer.emit(DEBUG, "links_removed", src=nodeA.node_id, dst=nodeB.node_id)
 
         for nodeA, nodeB in self.bidirectional_signalling_list:
             nodeA.remove_links_to(nodeB)
             nodeB.remove_links_to(nodeA)
             self.n_links += 2
+            if __debug__ and self.tracer.debug:
+                self.tracer.emit(DEBUG, "links_removed", src=nodeA.node_id, dst=nodeB.node_id)
             for childA in nodeA.children:
                 for childB in nodeB.children:
                     self._add_link(childA, childB)
@@ -145,7 +171,8 @@ class SpaceTree:
         if not node_to_divide.is_leaf:
             raise RuntimeError(f"Dividing non leaf node {node_to_divide.node_id}")
 
-        print(f" --- Dividing {node_to_divide.node_id} ---")
+        if __debug__ and self.tracer.debug:
+            self.tracer.emit(DEBUG, "dividing", node=node_to_divide.node_id, package=package.id)
 
         package_start_corner = node_to_divide.start_corner
         packed_space = SpaceNode(
@@ -179,12 +206,15 @@ class SpaceTree:
                     # print(f"{node.node_id} is now not a leaf")
                     node.children = children
                     node.is_leaf = False
+                    self.n_leaves -= 1
 
                     # Remove unnecessary children of node
                     # print(f"        --- Removing children from {node.node_id} ---)
                     if remove_unnecessary:
                         self._remove_unnecessary_children(node)
 
+                    self.n_leaves += len(node.children)
+
                     # Set internal overlaps (between children of node)
                     # print(f"        --- Setting int_overlaps of {node.node_id} ---")
                     self._set_internal_links(node)
@@ -203,6 +233,10 @@ class SpaceTree:
 
             # Perform the link updates from node to node
             self._perform_link_updates()
+
+            if self.counters.enabled:
+                self.counters.add("placements")
+                self.counters.peak("peak_free_spaces", self.uld_no, self.n_leaves)
         else:
             raise RuntimeError(
                 f"Package {package.id} does not fit in {node_to_divide.node_id}"
@@ -234,29 +268,91 @@ class SpaceTree:
 
         return None
 
+    def create_list_of_spaces(self) -> List[Tuple]:
+        """
+        Lists the free spaces of the tree (its leaves).
+
+        :return: List of (x, y, z, length, width, height) tuples.
+        """
+        spaces = []
+        visited = set()
+        to_search = [self.root]
+        while to_search:
+            node = to_search.pop()
+            if id(node) in visited:
+                continue
+            visited.add(id(node))
+            if node.is_leaf:
+                spaces.append((*node.start_corner, *node.dimensions))
+            else:
+                to_search.extend(node.children)
+        return spaces
+
+    def _count_search(self, visited: int, fit_checks: int):
+        """
+        Adds the work done by one search to the counters.
+
+        :param visited: Number of nodes visited.
+        :param fit_checks: Number of orientations tested against leaves.
+        """
+        if self.counters.enabled:
+            self.counters.add("spaces_scanned", visited)
+            self.counters.add("fit_checks", fit_checks)
+            self.counters.add("orientation_attempts", fit_checks)
+
     def search(self, package: Package,
                search_policy: str = "bfs",
                space_choose_policy: str = "first_find") -> SpaceNode:
         """
         Searches for a suitable node to place the package.
+        Sets the rotation of the package to the chosen orientation.
 
         :param package: The package to place.
         :param search_policy: The search policy ('bfs', 'dfs').
         :param space_choose_policy: The space choosing policy ('first_find', 'min_volume').
         :return: The node where the package can be placed, or None.
         """
+        best_node, best_rot, _ = self.find_space(package, search_policy, space_choose_policy)
+        if best_node is not None:
+            package.rotation = best_rot
+        return best_node
+
+    def find_space(self, package: Package,
+                   search_policy: str = "bfs",
+                   space_choose_policy: str = "first_find") -> Tuple[SpaceNode, Tuple, float]:
+        """
+        Searches for a suitable node to place the package without modifying the package.
+        Scores are comparable between trees (lower is better), so the results of
+        several trees can be ranked against each other. 'first_find' always scores 0.
+
+        :param package: The package to place.
+        :param search_policy: The search policy ('bfs', 'dfs').
+        :param space_choose_policy: The space choosing policy ('first_find', 'min_volume',
+                                    'least_diff_in_sides', 'side_diff_vol_combo').
+        :return: The node where the package can be placed (or None), its orientation and its score.
+        """
+        if self.negative_fits.rejects_all_rotations(package.dimensions):
+            if self.counters.enabled:
+                self.counters.add("negative_fit_hits")
+            return None, None, np.inf
+
         if search_policy.lower() == "bfs":
             to_search = [self.root]
             best_node = None
-            best_diff = np.inf
+            best_rot = None
+            best_score = np.inf
+            visited = 0
+            fit_checks = 0
 
             while to_search:
                 searching_node = to_search.pop(0)
+                visited += 1
                 if np.prod(searching_node.dimensions) < package.volume:
                     continue
                 if searching_node.is_leaf:
                     if np.prod(searching_node.dimensions) >= package.volume:
                         for rot in permutations(package.dimensions):
+                            fit_checks += 1
                             if (
                                 (
                                     searching_node.start_corner[0] + rot[0]
@@ -272,38 +368,47 @@ class SpaceTree:
                                 )
                             ):
                                 if space_choose_policy == "first_find":
-                                    package.rotation = rot
-                                    return searching_node
+                                    self._count_search(visited, fit_checks)
+                                    return searching_node, rot, 0
                                 elif space_choose_policy == "min_volume":
-                                    if best_node is None or np.prod(searching_node.dimensions) < np.prod(best_node.dimensions):
-                                        package.rotation = rot
-                                        best_node = searching_node
+                                    score = np.prod(searching_node.dimensions)
                                 elif space_choose_policy == "least_diff_in_sides":
-                                    diff = np.sum(searching_node.dimensions - rot)
-                                    if best_node is None or diff < best_diff:
-                                        package.rotation = rot
-                                        best_node = searching_node
-                                        best_diff = diff
+                                    score = np.sum(searching_node.dimensions - rot)
+                                elif space_choose_policy == "side_diff_vol_combo":
+                                    score = (np.sum(searching_node.dimensions - rot) +
+                                            np.prod(searching_node.dimensions) - package.volume)
                                 else:
                                     raise RuntimeError(f"Invalid space choose policy {space_choose_policy}")
 
+                                if best_node is None or score < best_score:
+                                    best_rot = rot
+                                    best_node = searching_node
+                                    best_score = score
+
                 to_search.extend(searching_node.children)
 
-            return best_node
+            self._count_search(visited, fit_checks)
+            if best_node is None:
+                self.negative_fits.add_all_rotations(package.dimensions)
+            return best_node, best_rot, best_score
 
         elif search_policy.lower() == "dfs":
             stack = [self.root]
             best_node = None
-            best_diff = np.inf
+            best_rot = None
             best_score = np.inf
+            visited = 0
+            fit_checks = 0
 
             while stack:
                 searching_node = stack.pop()
+                visited += 1
                 if np.prod(searching_node.dimensions) < package.volume:
                     continue
                 if searching_node.is_leaf:
                     if np.prod(searching_node.dimensions) >= package.volume:
                         for rot in permutations(package.dimensions):
+                            fit_checks += 1
                             if (
                                 (
                                     searching_node.start_corner[0] + rot[0]
@@ -319,33 +424,29 @@ class SpaceTree:
                                 )
                             ):
                                 if space_choose_policy == "first_find":
-                                    package.rotation = rot
-                                    return searching_node
+                                    self._count_search(visited, fit_checks)
+                                    return searching_node, rot, 0
                                 elif space_choose_policy == "min_volume":
-                                    if best_node is None or np.prod(searching_node.dimensions) < np.prod(best_node.dimensions):
-                                        package.rotation = rot
-                                        best_node = searching_node
+                                    score = np.prod(searching_node.dimensions)
                                 elif space_choose_policy == "least_diff_in_sides":
-                                    diff = np.sum(searching_node.dimensions - rot)
-                                    if best_node is None or diff < best_diff:
-                                        package.rotation = rot
-                                        best_node = searching_node
-                                        best_diff = diff
+                                    score = np.sum(searching_node.dimensions - rot)
                                 elif space_choose_policy == "side_diff_vol_combo":
                                     score = (np.sum(searching_node.dimensions - rot) +
                                             np.prod(searching_node.dimensions) - package.volume)
-                                    if best_node is None or score < best_score:
-                                        package.rotation = rot
-                                        best_node = searching_node
-                                        best_score = score
                                 else:
                                     raise RuntimeError(f"Invalid space choose policy {space_choose_policy}")
 
+                                if best_node is None or score < best_score:
+                                    best_rot = rot
+                                    best_node = searching_node
+                                    best_score = score
+
                 # Add children to the stack in reverse order to maintain the correct order of processing
                 stack.extend(reversed(searching_node.children))
 
-            return best_node
+            self._count_search(visited, fit_checks)
+            if best_node is None:
+                self.negative_fits.add_all_rotations(package.dimensions)
+            return best_node, best_rot, best_score
         else:
             raise RuntimeError(f"Invalid search policy {search_policy}")
-
-        return None
\ No newline at end of file
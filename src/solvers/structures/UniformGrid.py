@@ -0,0 +1,127 @@
+from typing import Dict, List, Tuple
+
+
+class UniformGrid:
+    """
+    Spatial index of the boxes placed in a ULD, on a uniform grid of cubic cells.
+
+    Every box is registered in the cells it overlaps, so collision, point and
+    projection queries only look at the boxes near the queried position instead
+    of every placed box. Boxes are (x, y, z, length, width, height) with integer
+    coordinates and occupy [x, x + length) x [y, y + width) x [z, z + height).
+
+    Attributes:
+        cell_size (int): Side of a cell.
+        cells (Dict[Tuple, List[Tuple]]): Boxes, as (x1, y1, z1, x2, y2, z2), per cell index.
+        n_boxes (int): Number of boxes inserted.
+    """
+
+    def __init__(self, cell_size: int):
+        """
+        Initializes an empty UniformGrid.
+
+        :param cell_size: Side of a cell, about the size of a typical box.
+        """
+        if cell_size <= 0:
+            raise RuntimeError(f"Invalid cell size {cell_size}")
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple, List[Tuple]] = {}
+        self.n_boxes = 0
+
+    def _cell_range(self, start, end) -> range:
+        """
+        Cells overlapped by [start, end) along one axis.
+        """
+        return range(int(start // self.cell_size), int((end - 1) // self.cell_size) + 1)
+
+    def insert(self, x, y, z, length, width, height):
+        """
+        Adds a box.
+        """
+        box = (x, y, z, x + length, y + width, z + height)
+        for i in self._cell_range(x, x + length):
+            for j in self._cell_range(y, y + width):
+                for k in self._cell_range(z, z + height):
+                    self.cells.setdefault((i, j, k), []).append(box)
+        self.n_boxes += 1
+
+    def collides(self, x, y, z, length, width, height) -> bool:
+        """
+        Checks if a box overlaps any inserted box.
+
+        :return: True if it overlaps.
+        """
+        x2, y2, z2 = x + length, y + width, z + height
+        cells = self.cells
+        for i in self._cell_range(x, x2):
+            for j in self._cell_range(y, y2):
+                for k in self._cell_range(z, z2):
+                    for bx1, by1, bz1, bx2, by2, bz2 in cells.get((i, j, k), ()):
+                        if x < bx2 and bx1 < x2 and y < by2 and by1 < y2 and z < bz2 and bz1 < z2:
+                            return True
+        return False
+
+    def contains_point(self, x, y, z) -> bool:
+        """
+        Checks if a point lies inside an inserted box (faces at the far end excluded).
+
+        :return: True if it does.
+        """
+        cell = (int(x // self.cell_size), int(y // self.cell_size), int(z // self.cell_size))
+        for bx1, by1, bz1, bx2, by2, bz2 in self.cells.get(cell, ()):
+            if bx1 <= x < bx2 and by1 <= y < by2 and bz1 <= z < bz2:
+                return True
+        return False
+
+    def project(self, point: Tuple, axis: int):
+        """
+        Projects a point towards the origin along an axis, onto the nearest box face or the wall.
+
+        :param point: The point (x, y, z).
+        :param axis: The axis to project along (0, 1 or 2).
+        :return: The coordinate along the axis where the projection stops.
+        """
+        a, b = [ax for ax in range(3) if ax != axis]
+        cell = [int(c // self.cell_size) for c in point]
+        best = 0
+        for c in range(cell[axis], -1, -1):
+            cell[axis] = c
+            for box in self.cells.get(tuple(cell), ()):
+                end = box[axis + 3]
+                if (
+                    best < end <= point[axis]
+                    and box[a] <= point[a] < box[a + 3]
+                    and box[b] <= point[b] < box[b + 3]
+                ):
+                    best = end
+            # Boxes not seen yet end in lower cells, so before this one
+            if best >= c * self.cell_size:
+                break
+        return best
+
+    def project_forward(self, point: Tuple, axis: int, limit):
+        """
+        Projects a point away from the origin along an axis, onto the nearest box face or the wall.
+
+        :param point: The point (x, y, z).
+        :param axis: The axis to project along (0, 1 or 2).
+        :param limit: Coordinate of the wall along the axis.
+        :return: The coordinate along the axis where the projection stops.
+        """
+        a, b = [ax for ax in range(3) if ax != axis]
+        cell = [int(c // self.cell_size) for c in point]
+        best = limit
+        for c in range(cell[axis], int((limit - 1) // self.cell_size) + 1):
+            cell[axis] = c
+            for box in self.cells.get(tuple(cell), ()):
+                start = box[axis]
+                if (
+                    point[axis] <= start < best
+                    and box[a] <= point[a] < box[a + 3]
+                    and box[b] <= point[b] < box[b + 3]
+                ):
+                    best = start
+            # Boxes not seen yet start in higher cells, so after this one
+            if best <= (c + 1) * self.cell_size:
+                break
+        return best